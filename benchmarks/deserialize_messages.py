@@ -0,0 +1,59 @@
+"""Benchmark of creating the messages from the body of the request sending statuses.
+
+Run from the repository root:
+
+    python -m benchmarks.deserialize_messages
+
+The parsed JSON bodies are converted to the messages as in the `send_statuses`, once by the
+generated `Message.from_dict` and once by the compiled deserializer.
+"""
+
+import argparse
+import time
+from typing import Any, Callable
+
+from server.fleetv2_http_api.impl.deserializer import model_deserializer
+from server.fleetv2_http_api.models import Message
+
+
+BODY_SIZES = (1, 100, 10000)
+MIN_DESERIALIZED_MESSAGES = 100000
+DESERIALIZERS: dict[str, Callable[[Any], Message]] = {
+    "generic": Message.from_dict,
+    "compiled": model_deserializer(Message),
+}
+
+
+def _status(k: int) -> dict:
+    return {
+        "timestamp": 1700000000000 + k,
+        "device_id": {"module_id": k % 8, "type": 1, "role": "role", "name": "device"},
+        "payload": {
+            "message_type": "STATUS",
+            "encoding": "JSON",
+            "data": {"message": f"Status number {k}", "values": [k, k + 1, k + 2]},
+        },
+    }
+
+
+def _deserialize(deserializer: Callable[[Any], Message], body: list[dict]) -> float:
+    """Deserialize the body repeatedly and return the number of messages deserialized per second."""
+    n_repeats = max(1, MIN_DESERIALIZED_MESSAGES // len(body))
+    start = time.perf_counter()
+    for _ in range(n_repeats):
+        [deserializer(item) for item in body]
+    return n_repeats * len(body) / (time.perf_counter() - start)
+
+
+def main() -> None:
+    argparse.ArgumentParser(description=__doc__.split("\n")[0]).parse_args()
+    print(f"{'deserializer':>12} {'messages':>10} {'messages/s':>12}")
+    for size in BODY_SIZES:
+        body = [_status(k) for k in range(size)]
+        for name, deserializer in DESERIALIZERS.items():
+            rate = _deserialize(deserializer, body)
+            print(f"{name:>12} {size:>10} {rate:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
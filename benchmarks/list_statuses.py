@@ -0,0 +1,112 @@
+"""Benchmark of listing the statuses of a car, from the database query to the response body.
+
+Run from the repository root:
+
+    python -m benchmarks.list_statuses
+
+The statuses are listed once through the ORM, the intermediate `MessageDB` and `Message` objects
+and the generated `JSONEncoder`, and once by the `list_statuses`, building the JSON objects
+directly from the selected rows. The small responses are returned as lists of the objects, the large
+ones are streamed. An SQLite database in memory is used.
+"""
+
+import argparse
+import json
+import time
+
+from server.database.connection import set_test_db_connection
+from server.database.database_controller import (
+    MessageDB,
+    list_messages,
+    send_messages_to_database,
+)
+from server.enums import EncodingType, MessageType
+from server.fleetv2_http_api.encoder import JSONEncoder
+from server.fleetv2_http_api.impl.controllers import list_statuses, set_streaming_batch_size
+from server.fleetv2_http_api.models import DeviceId, Message, Payload
+
+
+RESPONSE_SIZES = (10, 100, 1000, 10000, 100000)
+MIN_LISTED_MESSAGES = 200000
+STATUS_TYPES = (MessageType.STATUS, MessageType.STATUS_ERROR)
+
+
+def _status(k: int) -> MessageDB:
+    return MessageDB(
+        timestamp=k,
+        serialized_device_id=f"{k % 8}_1_role",
+        module_id=k % 8,
+        device_type=1,
+        device_role="role",
+        device_name="device",
+        message_type=MessageType.STATUS,
+        payload_encoding=EncodingType.JSON,
+        payload_data={"message": f"Status number {k}", "values": [k, k + 1, k + 2]},
+    )
+
+
+def _store_statuses(car_name: str, n: int) -> None:
+    for start in range(0, n, 1000):
+        statuses = [_status(k) for k in range(start, min(n, start + 1000))]
+        send_messages_to_database("company", car_name, *statuses)
+
+
+def _message_from_db(message_db: MessageDB) -> Message:
+    return Message(
+        timestamp=message_db.timestamp,
+        device_id=DeviceId(
+            message_db.module_id,
+            message_db.device_type,
+            message_db.device_role,
+            message_db.device_name,
+        ),
+        payload=Payload(
+            message_type=message_db.message_type,
+            encoding=message_db.payload_encoding,
+            data=message_db.payload_data,
+        ),
+    )
+
+
+def _dumps(messages: list) -> bytes:
+    return json.dumps(messages, cls=JSONEncoder, indent=2, sort_keys=True).encode()
+
+
+def _list_through_orm(car_name: str) -> bytes:
+    return _dumps([_message_from_db(m) for m in list_messages("company", car_name, STATUS_TYPES)])
+
+
+def _list_from_rows(car_name: str) -> bytes:
+    response = list_statuses("company", car_name, since=0)
+    if isinstance(response, tuple):
+        return _dumps(response[0])
+    return b"".join(response.response)
+
+
+def _list(list_func, car_name: str, n: int) -> float:
+    """List the statuses repeatedly and return the number of messages listed per second."""
+    n_repeats = max(1, MIN_LISTED_MESSAGES // n)
+    start = time.perf_counter()
+    for _ in range(n_repeats):
+        list_func(car_name)
+    return n_repeats * n / (time.perf_counter() - start)
+
+
+def main() -> None:
+    argparse.ArgumentParser(description=__doc__.split("\n")[0]).parse_args()
+    set_test_db_connection("/:memory:")
+    set_streaming_batch_size(1000)
+    print(f"{'path':>6} {'messages':>10} {'messages/s':>12}")
+    for size in RESPONSE_SIZES:
+        car_name = f"car_{size}"
+        _store_statuses(car_name, size)
+        orm_body, rows_body = _list_through_orm(car_name), _list_from_rows(car_name)
+        if json.loads(orm_body) != json.loads(rows_body):
+            raise RuntimeError("The statuses are listed differently.")
+        for path, list_func in (("orm", _list_through_orm), ("rows", _list_from_rows)):
+            rate = _list(list_func, car_name, size)
+            print(f"{path:>6} {size:>10} {rate:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
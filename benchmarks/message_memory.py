@@ -0,0 +1,80 @@
+"""Benchmark of the memory taken by the messages kept in the buffer of the most recent messages.
+
+Run from the repository root:
+
+    python -m benchmarks.message_memory [-n NUMBER_OF_MESSAGES]
+
+The memory allocated for the messages is measured by tracemalloc, once for the API's messages
+(composed of `Message`, `DeviceId` and `Payload` models) and once for the buffered `MessageDB`
+objects. The payload data are not included, as they are referenced by both representations.
+"""
+
+import argparse
+import json
+import tracemalloc
+from typing import Callable
+
+from server.database.database_controller import MessageDB
+from server.database.message_buffer import buffered_messages, set_buffer_size, store_messages
+from server.enums import MessageType
+from server.fleetv2_http_api.impl.controllers import _message_db_list
+from server.fleetv2_http_api.impl.deserializer import model_deserializer
+from server.fleetv2_http_api.models import Message
+
+
+STATUS_TYPES = (MessageType.STATUS, MessageType.STATUS_ERROR)
+_message_from_dict = model_deserializer(Message)
+
+
+def _statuses(n: int) -> list[dict]:
+    """Return the statuses as parsed from the body of the request."""
+    statuses = [
+        {
+            "timestamp": 1700000000000 + k,
+            "device_id": {"module_id": k % 8, "type": 1, "role": "role", "name": "device"},
+            "payload": {"message_type": "STATUS", "encoding": "JSON", "data": {"k": k}},
+        }
+        for k in range(n)
+    ]
+    return json.loads(json.dumps(statuses))
+
+
+def _api_messages(statuses: list[dict]) -> list[Message]:
+    return [_message_from_dict(status) for status in statuses]
+
+
+def _buffered_messages(statuses: list[dict]) -> list[MessageDB]:
+    # the messages are stored in batches of 100, as sent in separate requests
+    for start in range(0, len(statuses), 100):
+        messages = _message_db_list(_api_messages(statuses[start : start + 100]))
+        store_messages("company", "car", STATUS_TYPES, messages)
+    return buffered_messages("company", "car", STATUS_TYPES, statuses[0]["timestamp"]) or []
+
+
+def _allocated_bytes(create: Callable[[list[dict]], list], statuses: list[dict]) -> int:
+    """Return the number of bytes allocated for the created messages and kept after creation."""
+    tracemalloc.start()
+    start, _ = tracemalloc.get_traced_memory()
+    messages = create(statuses)
+    end, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    if len(messages) != len(statuses):
+        raise RuntimeError("Not all the messages have been created.")
+    return end - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("-n", "--number-of-messages", type=int, default=100000)
+    args = parser.parse_args()
+
+    n = args.number_of_messages
+    set_buffer_size(n)
+    print(f"{'representation':>16} {'messages':>10} {'MiB':>10} {'bytes/message':>14}")
+    for name, create in (("api models", _api_messages), ("buffered", _buffered_messages)):
+        size = _allocated_bytes(create, _statuses(n))
+        print(f"{name:>16} {n:>10} {size / 2**20:>10.1f} {size / n:>14.0f}")
+
+
+if __name__ == "__main__":
+    main()
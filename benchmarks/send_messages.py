@@ -0,0 +1,81 @@
+"""Benchmark of storing batches of statuses in the database.
+
+Run from the repository root:
+
+    python -m benchmarks.send_messages
+    python -m benchmarks.send_messages -l localhost -p 5432 -usr postgres -pwd 1234 -db protocol_api
+
+Without the database location, an SQLite database in memory is used. The PostgreSQL database
+must not contain messages of the benchmark company.
+"""
+
+import argparse
+import time
+
+import server.database.database_controller as database_controller
+from server.database.connection import set_db_connection, set_test_db_connection
+from server.database.database_controller import MessageDB, send_messages_to_database
+from server.enums import EncodingType, MessageType
+
+
+BATCH_SIZES = (1, 10, 100, 1000)
+MESSAGES_PER_BATCH_SIZE = 10000
+COMPANY_NAME = "benchmark_company"
+
+
+def _message(k: int) -> MessageDB:
+    return MessageDB(
+        timestamp=0,
+        serialized_device_id=f"{k % 8}_1_role",
+        module_id=k % 8,
+        device_type=1,
+        device_role="role",
+        device_name="device",
+        message_type=MessageType.STATUS,
+        payload_encoding=EncodingType.JSON,
+        payload_data={"message": f"Status number {k}", "values": [k, k + 1, k + 2]},
+    )
+
+
+def _send_in_batches(batch_size: int, car_name: str) -> float:
+    """Send the messages in batches and return the number of messages sent per second."""
+    n_batches = max(1, MESSAGES_PER_BATCH_SIZE // batch_size)
+    batch = [_message(k) for k in range(batch_size)]
+    start = time.perf_counter()
+    for timestamp in range(n_batches):
+        for message in batch:
+            message.timestamp = timestamp
+        _, code = send_messages_to_database(COMPANY_NAME, car_name, *batch)
+        if code != 200:
+            raise RuntimeError(f"Sending messages failed with code {code}.")
+    return n_batches * batch_size / (time.perf_counter() - start)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("-l", "--location", type=str, default="")
+    parser.add_argument("-p", "--port", type=str, default="5432")
+    parser.add_argument("-usr", "--username", type=str, default="")
+    parser.add_argument("-pwd", "--password", type=str, default="")
+    parser.add_argument("-db", "--database-name", type=str, default="")
+    args = parser.parse_args()
+
+    if args.location:
+        set_db_connection(
+            args.location, args.port, args.username, args.password, args.database_name
+        )
+        paths = {"insert": 10**9, "copy": 1}
+    else:
+        set_test_db_connection("/:memory:")
+        paths = {"insert": 10**9}
+
+    print(f"{'path':>8} {'batch size':>12} {'messages/s':>12}")
+    for path, copy_min_batch_size in paths.items():
+        database_controller.COPY_MIN_BATCH_SIZE = copy_min_batch_size
+        for batch_size in BATCH_SIZES:
+            rate = _send_in_batches(batch_size, car_name=f"car_{path}_{batch_size}")
+            print(f"{path:>8} {batch_size:>12} {rate:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
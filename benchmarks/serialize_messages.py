@@ -0,0 +1,60 @@
+"""Benchmark of serializing the listed messages to the JSON response body.
+
+Run from the repository root:
+
+    python -m benchmarks.serialize_messages
+
+The messages are serialized with the same arguments as used by the server for the responses.
+"""
+
+import argparse
+import json
+import time
+
+from server.enums import EncodingType, MessageType
+from server.fleetv2_http_api.encoder import JSONEncoder
+from server.fleetv2_http_api.impl.serializer import FastJSONEncoder
+from server.fleetv2_http_api.models import DeviceId, Message, Payload
+
+
+RESPONSE_SIZES = (1000, 100000)
+MIN_SERIALIZED_MESSAGES = 200000
+ENCODERS = {"json": JSONEncoder, "orjson": FastJSONEncoder}
+
+
+def _message(k: int) -> Message:
+    return Message(
+        timestamp=1700000000000 + k,
+        device_id=DeviceId(module_id=k % 8, type=1, role="role", name="device"),
+        payload=Payload(
+            message_type=MessageType.STATUS,
+            encoding=EncodingType.JSON,
+            data={"message": f"Status number {k}", "values": [k, k + 1, k + 2]},
+        ),
+    )
+
+
+def _serialize(encoder: type[json.JSONEncoder], messages: list[Message]) -> float:
+    """Serialize the messages repeatedly and return the number of messages serialized per second."""
+    n_repeats = max(1, MIN_SERIALIZED_MESSAGES // len(messages))
+    start = time.perf_counter()
+    for _ in range(n_repeats):
+        json.dumps(messages, cls=encoder, indent=2, sort_keys=True)
+    return n_repeats * len(messages) / (time.perf_counter() - start)
+
+
+def main() -> None:
+    argparse.ArgumentParser(description=__doc__.split("\n")[0]).parse_args()
+    print(f"{'encoder':>8} {'messages':>10} {'messages/s':>12}")
+    for size in RESPONSE_SIZES:
+        messages = [_message(k) for k in range(size)]
+        expected = json.dumps(messages, cls=JSONEncoder, indent=2, sort_keys=True)
+        if json.loads(json.dumps(messages, cls=FastJSONEncoder)) != json.loads(expected):
+            raise RuntimeError("The encoders serialize the messages differently.")
+        for name, encoder in ENCODERS.items():
+            rate = _serialize(encoder, messages)
+            print(f"{name:>8} {size:>10} {rate:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1 +0,0 @@
-from server.__main__ import main
\ No newline at end of file
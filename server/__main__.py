@@ -1,24 +1,63 @@
+# The standard library must be patched for the gevent server before any other module is imported.
+if __name__ == "__main__":
+    import sys
+
+    from server.cooperative import make_blocking_calls_cooperative
+
+    make_blocking_calls_cooperative(sys.argv[1:])
+
+from typing import Any
+import atexit
 import logging
 
-import requests  # type: ignore
 import connexion  # type: ignore
+import flask
+from flask_sock import Sock  # type: ignore
 from apscheduler.schedulers.background import BackgroundScheduler  # type: ignore
 from sqlalchemy.orm import Session
 from importlib.resources import files as importlib_files
 from yaml import safe_load as load_yaml  # type: ignore
 
-from server.fleetv2_http_api import encoder  # type: ignore
-from server.config import CleanupTiming, DBFile
-from server.database.database_controller import remove_old_messages, set_message_retention_period  # type: ignore
-from server.database.cache import clear_connected_cars  # type: ignore
+from server.fleetv2_http_api.impl.serializer import FastJSONEncoder  # type: ignore
+from server.cooperative import blocking_calls_are_cooperative
+from server.config import (
+    ApiKeyCache,
+    CacheSnapshot,
+    ConnectionPool,
+    Database,
+    DBFile,
+    DBServer,
+    Partitioning,
+    SecurityConfig,
+    WriteBehind,
+)
+from server.database.database_controller import (  # type: ignore
+    remove_old_messages,
+    set_message_retention_period,
+    set_message_deletion_batching,
+    create_message_partitions,
+    load_available_devices_from_database,
+)
+from server.database.partitioning import set_partitioning  # type: ignore
+from server.database.cache import clear_connected_cars, set_admin_cache  # type: ignore
+from server.database.cache_snapshot import load_connected_cars_snapshot, save_connected_cars_snapshot  # type: ignore
+from server.database.message_buffer import set_buffer_size as set_message_buffer_size  # type: ignore
 from server.database.connection import set_db_connection, set_test_db_connection, get_test_db_connection  # type: ignore
+from server.database.connection import check_database_health, set_connection_pool  # type: ignore
 from server.database.time import timestamp  # type: ignore
+from server.database.write_behind import flush_queued_messages, start_write_behind, stop_write_behind  # type: ignore
 from server.database.security import _AdminBase
 
 # The import here should be left as it is without the server. part. It must match the paths in the openapi.yaml file
 # to prevent duplicit imports.
 import server.fleetv2_http_api.impl.controllers as api_controllers  # type: ignore
-from server.fleetv2_http_api.controllers.security_controller import set_auth_params  # type: ignore
+from server.fleetv2_http_api.controllers.security_controller import (  # type: ignore
+    clear_verified_tokens,
+    set_auth_params,
+    set_key_store,
+    set_max_verified_tokens,
+)
+from server.fleetv2_http_api.impl.jwks import JWKSKeyStore, keycloak_jwks_url  # type: ignore
 import server.database.script_args as script_args  # type: ignore
 from server.logs import configure_logging, LOGGER_NAME
 import server.fleetv2_http_api as server_package
@@ -33,12 +72,27 @@ logger = logging.getLogger(LOGGER_NAME)
 
 def _clean_up_messages() -> None:
     """Clean up messages from the database."""
+    # the queued statuses must be stored before looking for the devices without any status
+    flush_queued_messages()
     remove_old_messages(current_timestamp=timestamp())
 
 
+def _create_message_partitions() -> None:
+    """Create the message table partitions for the current and the upcoming time periods."""
+    create_message_partitions(current_timestamp=timestamp())
+
+
+def _set_up_partitioning(config: Partitioning) -> None:
+    """Set the time-based partitioning of the messages. Only applied to PostgreSQL databases."""
+    if config.use:
+        logger.info(f"Using message partitions spanning {config.period_in_seconds} s.")
+        set_partitioning(config.period_in_seconds, config.premade_partitions)
+
+
 def _connect_to_database(vals: script_args.ScriptArgs) -> None:
     """Clear previously stored available devices and connect to the database."""
     clear_connected_cars()
+    _set_up_partitioning(vals.config.database.partitioning)
 
     if isinstance(vals.config.database.server, DBFile):
         set_test_db_connection(db_name=vals.config.database.server.path)
@@ -50,6 +104,7 @@ def _connect_to_database(vals: script_args.ScriptArgs) -> None:
             session.add(admin)
             session.commit()
     else:
+        _set_up_connection_pool(vals.config.database.server.pool)
         set_db_connection(
             dblocation=vals.argvals["location"],
             port=vals.argvals["port"],
@@ -59,41 +114,156 @@ def _connect_to_database(vals: script_args.ScriptArgs) -> None:
         )
 
 
-def _set_up_database_jobs(config: CleanupTiming) -> None:
+def _load_connected_cars(config: Database) -> None:
+    """Load the connected cars from the snapshot, if used, and from the statuses stored after it.
+
+    Without a valid snapshot, the connected cars are loaded from all the stored statuses.
+    """
+    since = 0
+    if config.cache_snapshot.use:
+        retention_period_ms = config.cleanup.timing_in_seconds.retention_period * 1000
+        stamp = load_connected_cars_snapshot(
+            config.cache_snapshot.path, min_timestamp=timestamp() - retention_period_ms
+        )
+        if stamp is not None:
+            since = stamp
+    load_available_devices_from_database(since)
+
+
+def _save_connected_cars_snapshot(config: CacheSnapshot) -> None:
+    try:
+        save_connected_cars_snapshot(config.path)
+    except Exception as e:
+        logger.error(f"Cannot save snapshot of connected cars. Error: {e}")
+
+
+def _set_up_api_key_cache(config: ApiKeyCache) -> None:
+    """Set for how long the valid and invalid API keys are cached."""
+    set_admin_cache(
+        config.ttl_in_seconds, config.invalid_key_ttl_in_seconds, config.max_invalid_keys
+    )
+
+
+def _set_up_write_behind(config: WriteBehind) -> None:
+    """Start queueing the sent statuses, if required by the config."""
+    if config.use:
+        logger.info(
+            f"Queueing up to {config.max_queued_messages} statuses, stored in batches of up to "
+            f"{config.max_batch_size} every {config.flush_period_in_ms} ms."
+        )
+        start_write_behind(
+            config.max_queued_messages, config.max_batch_size, config.flush_period_in_ms
+        )
+        atexit.register(stop_write_behind)
+
+
+def _set_up_connection_pool(config: ConnectionPool) -> None:
+    """Set the connection pool options used for the PostgreSQL database."""
+    set_connection_pool(
+        size=config.size,
+        max_overflow=config.max_overflow,
+        recycle_in_seconds=config.recycle_in_seconds,
+        pre_ping=config.pre_ping,
+        statement_timeout_in_ms=config.statement_timeout_in_ms,
+    )
+
+
+def _set_up_database_jobs(config: Database) -> None:
     """Set message cleanup job and other customary jobs defined by the example method."""
-    set_message_retention_period(config.retention_period)
+    cleanup = config.cleanup
+    timing = cleanup.timing_in_seconds
+    set_message_retention_period(timing.retention_period)
+    set_message_deletion_batching(cleanup.delete_batch_size, cleanup.max_delete_batches)
     scheduler = BackgroundScheduler()
+    if isinstance(config.server, DBServer):
+        scheduler.add_job(
+            func=check_database_health,
+            trigger="interval",
+            seconds=config.server.pool.health_check_period_in_seconds,
+            replace_existing=True,
+        )
     scheduler.add_job(
         func=_clean_up_messages,
         trigger="interval",
-        seconds=config.cleanup_period,
+        seconds=timing.cleanup_period,
         replace_existing=True,
     )
+    scheduler.add_job(
+        func=_create_message_partitions,
+        trigger="interval",
+        seconds=timing.cleanup_period,
+        replace_existing=True,
+    )
+    if config.cache_snapshot.use:
+        scheduler.add_job(
+            func=_save_connected_cars_snapshot,
+            args=(config.cache_snapshot,),
+            trigger="interval",
+            seconds=config.cache_snapshot.period_in_seconds,
+            replace_existing=True,
+        )
+        atexit.register(_save_connected_cars_snapshot, config.cache_snapshot)
     scheduler.start()
 
 
-def _retrieve_keycloak_public_key(keycloak_url: str, realm: str) -> str:
-    """Retrieve the public key from the Keycloak server."""
-    try:
-        response = requests.get(keycloak_url.rstrip("/") + "/realms/" + realm)
-        response.raise_for_status()
-        logger.info("Retrieved public key from Keycloak server.")
-        return response.json()["public_key"]
-    except Exception as e:
-        logger.warning("Failed to retrieve public key from Keycloak server. Error: %s", e)
-        return ""
+def _set_up_key_store(config: SecurityConfig) -> None:
+    """Start retrieving the keys for verifying the JWT tokens from the Keycloak server in the
+    background, so that the server starts without waiting for the Keycloak server."""
+    url = keycloak_jwks_url(str(config.keycloak_url), config.realm)
+    key_store = JWKSKeyStore(
+        url,
+        refresh_period_s=config.jwks_refresh_period_in_seconds,
+        timeout_s=config.jwks_timeout_in_seconds,
+        jitter_s=config.jwks_refresh_jitter_in_seconds,
+        on_keys_removed=clear_verified_tokens,
+    )
+    set_key_store(key_store)
+    key_store.start()
+    logger.info(f"Retrieving keys for verifying tokens from '{url}'.")
+
+
+def _log_cooperative_blocking_calls(server: str) -> None:
+    if server != "gevent":
+        return
+    if blocking_calls_are_cooperative():
+        logger.info("Using gevent server. Waiting requests do not occupy threads.")
+    else:
+        logger.warning(
+            "Using gevent server without patching the standard library. Waiting requests "
+            "block the server. Run the server as 'python -m server <config-file-path>'."
+        )
 
 
-def run_server(port: int = 8080) -> None:
+def run_server(
+    port: int = 8080, server: str = "flask", channel_ping_interval_s: float = 15.0
+) -> None:
     """Run the Fleet Protocol v2 HTTP API server."""
     app = connexion.App(APP_NAME.lower().replace(" ", "-"))
-    app.app.json_encoder = encoder.JSONEncoder
-    app.add_api(
+    app.app.json_encoder = FastJSONEncoder
+    api = app.add_api(
         load_yaml(importlib_files(server_package).joinpath("openapi/openapi.yaml").read_text()),
         arguments={"title": "Fleet Protocol v2 HTTP API"},
         pythonic_params=True,
     )
-    app.run(port=port)
+    _add_car_channel(app.app, api, channel_ping_interval_s)
+    app.run(port=port, server=server)
+
+
+def _add_car_channel(app: flask.Flask, api: Any, ping_interval_s: float) -> None:
+    """Add the WebSocket route of the car channel. It is not described by the API specification,
+    so the requests are authenticated and the statuses validated by the specification here.
+    """
+    send_statuses = api.specification["paths"]["/status/{company_name}/{car_name}"]["post"]
+    api_controllers.set_car_channel_schema(
+        send_statuses["requestBody"]["content"]["application/json"]["schema"]
+    )
+    app.config["SOCK_SERVER_OPTIONS"] = {"ping_interval": ping_interval_s}
+    channel = flask.Blueprint("car_channel", __name__)
+    channel.before_request(api_controllers.authorize_car_channel)
+    Sock(app).route(api.base_path + api_controllers.CAR_CHANNEL_PATH, bp=channel)(
+        api_controllers.car_channel
+    )
+    app.register_blueprint(channel)
 
 
 def main() -> None:
@@ -102,19 +272,30 @@ def main() -> None:
     )
     config = vals.config
     configure_logging(COMPONENT_NAME, config)
+    _log_cooperative_blocking_calls(config.http_server.server)
     _connect_to_database(vals)
-    _set_up_database_jobs(config.database.cleanup.timing_in_seconds)
+    _load_connected_cars(config.database)
+    _set_up_database_jobs(config.database)
+    _set_up_write_behind(config.database.write_behind)
+    _set_up_api_key_cache(config.database.api_key_cache)
     api_controllers.set_car_wait_timeout_s(config.request_for_messages.timeout_in_seconds)
     api_controllers.set_status_wait_timeout_s(config.request_for_messages.timeout_in_seconds)
     api_controllers.set_command_wait_timeout_s(config.request_for_messages.timeout_in_seconds)
+    set_message_buffer_size(config.request_for_messages.buffered_messages_per_car)
+    api_controllers.set_streaming_batch_size(config.request_for_messages.streaming_batch_size)
+    api_controllers.set_event_stream_params(
+        config.request_for_messages.event_stream_keepalive_in_seconds,
+        config.request_for_messages.event_stream_max_queued_messages,
+    )
     api_controllers.init_oauth(config.security, str(config.http_server.base_uri))
-    set_auth_params(
-        public_key=_retrieve_keycloak_public_key(
-            keycloak_url=str(config.security.keycloak_url), realm=config.security.realm
-        ),
-        client_id=config.security.client_id,
+    set_auth_params(public_key="", client_id=config.security.client_id)
+    _set_up_key_store(config.security)
+    set_max_verified_tokens(config.security.verified_token_cache_size)
+    run_server(
+        config.http_server.port,
+        config.http_server.server,
+        config.request_for_messages.event_stream_keepalive_in_seconds,
     )
-    run_server(config.http_server.port)
 
 
 if __name__ == "__main__":
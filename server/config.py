@@ -7,6 +7,7 @@ from server.fleetv2_http_api.impl.security import SecurityConfig as SecurityConf
 
 
 LoggingLevel = Literal["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
+WSGIServer = Literal["flask", "gevent"]
 
 
 class APIConfig(pydantic.BaseModel):
@@ -35,15 +36,58 @@ class Logging(pydantic.BaseModel):
 class HTTPServer(pydantic.BaseModel):
     base_uri: pydantic.AnyUrl
     port: pydantic.PositiveInt
+    server: WSGIServer = "flask"
 
 
 class MessageRequest(pydantic.BaseModel):
     timeout_in_seconds: pydantic.PositiveFloat
+    buffered_messages_per_car: pydantic.NonNegativeInt = 0
+    streaming_batch_size: pydantic.PositiveInt = 1000
+    event_stream_keepalive_in_seconds: pydantic.PositiveFloat = 15
+    event_stream_max_queued_messages: pydantic.PositiveInt = 10000
+
+
+class Partitioning(pydantic.BaseModel):
+    use: bool = False
+    period_in_seconds: pydantic.PositiveInt = 3600
+    premade_partitions: pydantic.NonNegativeInt = 2
+
+
+class WriteBehind(pydantic.BaseModel):
+    use: bool = False
+    max_queued_messages: pydantic.PositiveInt = 100000
+    max_batch_size: pydantic.PositiveInt = 1000
+    flush_period_in_ms: pydantic.PositiveInt = 100
+
+
+class CacheSnapshot(pydantic.BaseModel):
+    use: bool = False
+    path: str = "connected_cars.json"
+    period_in_seconds: pydantic.PositiveInt = 60
+
+
+class ApiKeyCache(pydantic.BaseModel):
+    ttl_in_seconds: pydantic.NonNegativeInt = 300
+    invalid_key_ttl_in_seconds: pydantic.NonNegativeInt = 30
+    max_invalid_keys: pydantic.NonNegativeInt = 10000
 
 
 class Database(pydantic.BaseModel):
     server: DBServer | DBFile
     cleanup: DatabaseCleanup
+    partitioning: Partitioning = Partitioning()
+    write_behind: WriteBehind = WriteBehind()
+    cache_snapshot: CacheSnapshot = CacheSnapshot()
+    api_key_cache: ApiKeyCache = ApiKeyCache()
+
+
+class ConnectionPool(pydantic.BaseModel):
+    size: pydantic.PositiveInt = 5
+    max_overflow: pydantic.NonNegativeInt = 10
+    recycle_in_seconds: pydantic.NonNegativeInt = 1800
+    pre_ping: bool = True
+    statement_timeout_in_ms: pydantic.NonNegativeInt = 0
+    health_check_period_in_seconds: pydantic.PositiveInt = 10
 
 
 class DBServer(pydantic.BaseModel):
@@ -52,6 +96,7 @@ class DBServer(pydantic.BaseModel):
     location: str
     port: int
     database_name: str
+    pool: ConnectionPool = ConnectionPool()
 
 
 class DBFile(pydantic.BaseModel):
@@ -60,6 +105,8 @@ class DBFile(pydantic.BaseModel):
 
 class DatabaseCleanup(pydantic.BaseModel):
     timing_in_seconds: CleanupTiming
+    delete_batch_size: pydantic.PositiveInt = 5000
+    max_delete_batches: pydantic.PositiveInt = 20
 
 
 class CleanupTiming(pydantic.BaseModel):
@@ -0,0 +1,56 @@
+"""Patching of the standard library for the gevent server.
+
+The patching must be done before any other module is imported, otherwise the modules keep the
+original blocking sockets, locks and events created at their import. Therefore, this module
+imports only the standard library and reads the server from the config file on its own.
+"""
+
+import json
+
+
+_patched: bool = False
+
+
+def configured_server(args: list[str]) -> str:
+    """Return the WSGI server set in the config file, which is the first positional argument
+    of the command line `args` (excluding the program name). Return 'flask' (the default server),
+    if the config file cannot be read or the server is not set.
+    """
+    try:
+        with open(_config_file_path(args)) as config_file:
+            server = json.load(config_file)["http_server"].get("server", "flask")
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return "flask"
+    return server if isinstance(server, str) else "flask"
+
+
+def make_blocking_calls_cooperative(args: list[str]) -> bool:
+    """Patch the standard library, including the ssl module, if the gevent server is configured,
+    so that a request waiting for messages or cars is parked as a greenlet instead of occupying
+    a whole thread. Return True, if the library has been patched.
+    """
+    global _patched
+    if not _patched and configured_server(args) == "gevent":
+        from gevent import monkey  # type: ignore
+
+        # the select.epoll is kept for the libraries referring to it at import (e.g. trio,
+        # imported by httpcore, if installed); select.select and selectors are patched
+        monkey.patch_all(aggressive=False)
+        _patched = True
+    return _patched
+
+
+def blocking_calls_are_cooperative() -> bool:
+    return _patched
+
+
+def _config_file_path(args: list[str]) -> str:
+    remaining = iter(args)
+    for arg in remaining:
+        if arg.startswith("-"):
+            # all the options of the server take a value
+            if "=" not in arg:
+                next(remaining, None)
+            continue
+        return arg
+    return "config.json"
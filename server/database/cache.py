@@ -1,31 +1,112 @@
 from __future__ import annotations
+from typing import Iterable
+import collections
 import dataclasses
-from collections import defaultdict
-from copy import deepcopy
+import threading
+import time
 
 from server.fleetv2_http_api.models.device_id import DeviceId  # type: ignore
 from server.database.models import AdminDB  # type: ignore
 
 
-_loaded_admins: list[AdminDB] = []
-_connected_cars: dict[str, dict[str, ConnectedCar]] = defaultdict(dict)
+# The loaded admins and the invalid API keys, each with the time of loading (in seconds).
+# The admins are loaded again from the database after the `_admin_ttl_s` elapses. At most
+# `_max_invalid_keys` most recently used invalid keys are kept for the `_invalid_key_ttl_s`.
+_loaded_admins: dict[str, tuple[AdminDB, float]] = dict()
+_invalid_keys: collections.OrderedDict[str, float] = collections.OrderedDict()
+_admins_lock = threading.Lock()
+_admin_ttl_s: float = 300.0
+_invalid_key_ttl_s: float = 30.0
+_max_invalid_keys: int = 10000
+
+# The connected cars are stored in nested dictionaries, that are never modified after being created.
+# Every change of the connected cars creates new dictionaries for the changed company and car
+# and replaces the whole structure, so that a reference obtained by a reader is a consistent snapshot.
+_connected_cars: dict[str, dict[str, ConnectedCar]] = dict()
+_connected_cars_lock = threading.Lock()
+
+
+def set_admin_cache(admin_ttl_s: float, invalid_key_ttl_s: float, max_invalid_keys: int) -> None:
+    """Set for how long the loaded admins and invalid API keys are cached and how many invalid keys
+    are cached at most. Setting the `max_invalid_keys` to zero disables caching of invalid keys.
+    """
+    global _admin_ttl_s, _invalid_key_ttl_s, _max_invalid_keys
+    if admin_ttl_s < 0 or invalid_key_ttl_s < 0 or max_invalid_keys < 0:
+        raise ValueError(
+            "Admin cache parameters must be non-negative, "
+            f"got {admin_ttl_s}, {invalid_key_ttl_s}, {max_invalid_keys}."
+        )
+    _admin_ttl_s, _invalid_key_ttl_s, _max_invalid_keys = (
+        admin_ttl_s,
+        invalid_key_ttl_s,
+        max_invalid_keys,
+    )
+    clear_loaded_admins()
 
 
 def clear_loaded_admins() -> None:
-    global _loaded_admins
-    _loaded_admins.clear()
+    with _admins_lock:
+        _loaded_admins.clear()
+        _invalid_keys.clear()
 
 
 def get_loaded_admins() -> list[AdminDB]:
-    return _loaded_admins.copy()
+    return [admin for admin, _ in _loaded_admins.values()]
+
+
+def loaded_admin(key: str) -> AdminDB | None:
+    """Return the admin with the API key, if it is loaded and its time to live has not elapsed."""
+    loaded = _loaded_admins.get(key)
+    if loaded is None or _now_s() - loaded[1] >= _admin_ttl_s:
+        return None
+    return loaded[0]
 
 
 def store_admin(admin: AdminDB) -> None:
-    _loaded_admins.append(admin)
+    with _admins_lock:
+        _loaded_admins[admin.key] = (admin, _now_s())
+        _invalid_keys.pop(admin.key, None)
+
+
+def is_key_invalid(key: str) -> bool:
+    """Check if the API key has been found invalid and its time to live has not elapsed."""
+    with _admins_lock:
+        stored_at = _invalid_keys.get(key)
+        if stored_at is None:
+            return False
+        if _now_s() - stored_at >= _invalid_key_ttl_s:
+            del _invalid_keys[key]
+            return False
+        _invalid_keys.move_to_end(key)
+        return True
+
+
+def forget_invalid_key(key: str) -> None:
+    with _admins_lock:
+        _invalid_keys.pop(key, None)
+
+
+def store_invalid_key(key: str) -> None:
+    """Store the API key not belonging to any admin. The least recently used key is removed,
+    if the maximum number of the invalid keys is exceeded."""
+    with _admins_lock:
+        if _max_invalid_keys == 0:
+            return
+        _invalid_keys[key] = _now_s()
+        _invalid_keys.move_to_end(key)
+        while len(_invalid_keys) > _max_invalid_keys:
+            _invalid_keys.popitem(last=False)
+        _loaded_admins.pop(key, None)
+
+
+def _now_s() -> float:
+    return time.monotonic()
 
 
 @dataclasses.dataclass(frozen=True)
 class ConnectedModule:
+    """Immutable module of a connected car. The `device_ids` must not be modified."""
+
     id: int
     device_ids: dict[str, DeviceId] = dataclasses.field(default_factory=dict)
 
@@ -33,139 +114,185 @@ class ConnectedModule:
     def sdevice_ids(self) -> list[str]:
         return [device_id for device_id in self.device_ids]
 
-    def add_device(self, device_id: DeviceId) -> bool:
-        """Add a device id to the device_ids list.
-
-        Returns True if the device id was stored, False otherwise.
-        """
-        sdevice_id = serialized_device_id(device_id)
-        if sdevice_id not in self.device_ids:
-            self.device_ids[sdevice_id] = device_id
-            return True
-        return False
-
     def is_connected(self, device_id: DeviceId) -> bool:
         """Check if a device id is connected to this module."""
         sdevice_id = serialized_device_id(device_id)
         return sdevice_id in self.device_ids
 
-    def remove_device(self, device_id: DeviceId) -> bool:
-        """Remove a device id from the device_ids list.
+    def with_device(self, device_id: DeviceId) -> ConnectedModule:
+        """Return a copy of the module with the device id added."""
+        device_ids = self.device_ids.copy()
+        device_ids[serialized_device_id(device_id)] = device_id
+        return ConnectedModule(id=self.id, device_ids=device_ids)
 
-        Returns True if the device id was removed, False otherwise.
-        """
-        sdevice_id = serialized_device_id(device_id)
-        if sdevice_id in self.device_ids:
-            del self.device_ids[sdevice_id]
-            return True
-        return False
+    def without_device(self, device_id: DeviceId) -> ConnectedModule:
+        """Return a copy of the module with the device id removed."""
+        device_ids = self.device_ids.copy()
+        device_ids.pop(serialized_device_id(device_id), None)
+        return ConnectedModule(id=self.id, device_ids=device_ids)
 
 
 @dataclasses.dataclass(frozen=True)
 class ConnectedCar:
+    """Immutable connected car. The `modules` must not be modified."""
+
     company_name: str
     car_name: str
     timestamp: int
     modules: dict[int, ConnectedModule] = dataclasses.field(default_factory=dict)
 
-    def add_device(self, device_id: DeviceId) -> bool:
-        """Add a device id to the device_ids dictionary.
-
-        Returns True if the device id was stored, False otherwise.
-        """
-        if not device_id.module_id in self.modules:
-            self.modules[device_id.module_id] = ConnectedModule(id=device_id.module_id)
-        return self.modules[device_id.module_id].add_device(device_id)
-
     def is_connected(self, device_id: DeviceId) -> bool:
         """Check if a device id is connected to this car."""
         return device_id.module_id in self.modules and self.modules[
             device_id.module_id
         ].is_connected(device_id)
 
-    def remove_device(self, device_id: DeviceId) -> bool:
-        """Remove a device id from its module dict in the device_ids dictionary.
+    def with_device(self, device_id: DeviceId) -> ConnectedCar:
+        """Return a copy of the car with the device id added to its module."""
+        module = self.modules.get(device_id.module_id, ConnectedModule(id=device_id.module_id))
+        modules = self.modules.copy()
+        modules[device_id.module_id] = module.with_device(device_id)
+        return dataclasses.replace(self, modules=modules)
+
+    def without_device(self, device_id: DeviceId) -> ConnectedCar:
+        """Return a copy of the car with the device id removed from its module.
 
-        Returns True if the device id was removed, False otherwise.
+        The module is removed if no other device is left in it.
         """
-        if device_id.module_id in self.modules:
-            self.modules[device_id.module_id].remove_device(device_id)
-            if not self.modules[device_id.module_id].device_ids:
-                self.modules.pop(device_id.module_id)
-            return True
-        return False
+        modules = self.modules.copy()
+        if device_id.module_id in modules:
+            module = modules[device_id.module_id].without_device(device_id)
+            if module.device_ids:
+                modules[device_id.module_id] = module
+            else:
+                modules.pop(device_id.module_id)
+        return dataclasses.replace(self, modules=modules)
 
 
 def add_car(company_name: str, car_name: str, timestamp: int) -> bool:
-    """Add a car to the device_ids dictionary if it is not already there.
+    """Add a car to the connected cars if it is not already there.
 
     Returns True if the car was added, False otherwise.
     """
-    if company_name not in _connected_cars:
-        _connected_cars[company_name] = {}
-    if car_name not in _connected_cars[company_name]:
-        _connected_cars[company_name][car_name] = ConnectedCar(
-            company_name=company_name, car_name=car_name, timestamp=timestamp
+    with _connected_cars_lock:
+        if is_car_connected(company_name, car_name):
+            return False
+        _replace_car(
+            company_name,
+            car_name,
+            ConnectedCar(company_name=company_name, car_name=car_name, timestamp=timestamp),
         )
         return True
-    return False
 
 
 def add_device(company_name: str, car_name: str, device_id: DeviceId) -> bool:
-    """Add a device id to the device_ids dictionary.
+    """Add a device id to a connected car.
 
     Returns True if the device id was stored, False otherwise.
     """
-    if not is_car_connected(company_name, car_name):
-        return False
-    return _connected_cars[company_name][car_name].add_device(device_id)
+    with _connected_cars_lock:
+        car = connected_car(company_name, car_name)
+        if car is None or car.is_connected(device_id):
+            return False
+        _replace_car(company_name, car_name, car.with_device(device_id))
+        return True
+
+
+def add_connected_cars(cars: Iterable[ConnectedCar]) -> None:
+    """Add the cars to the connected cars in a single change of the connected cars.
+
+    The devices of an already connected car are added to it, keeping its timestamp.
+    """
+    global _connected_cars
+    with _connected_cars_lock:
+        updated = _connected_cars.copy()
+        copied_companies: set[str] = set()
+        for car in cars:
+            if car.company_name not in copied_companies:
+                updated[car.company_name] = updated.get(car.company_name, {}).copy()
+                copied_companies.add(car.company_name)
+            company_cars = updated[car.company_name]
+            connected = company_cars.get(car.car_name)
+            if connected is not None:
+                for module in car.modules.values():
+                    for device_id in module.device_ids.values():
+                        if not connected.is_connected(device_id):
+                            connected = connected.with_device(device_id)
+                car = connected
+            company_cars[car.car_name] = car
+        _connected_cars = updated
 
 
 def connected_cars() -> dict[str, dict[str, ConnectedCar]]:
-    """Return a deep copy of the device_ids dictionary.""" ""
-    return deepcopy(_connected_cars)
+    """Return the current snapshot of the connected cars.
+
+    The snapshot is not affected by any later changes of the connected cars and must not be modified.
+    """
+    return _connected_cars
+
+
+def connected_car(company_name: str, car_name: str) -> ConnectedCar | None:
+    """Return the connected car or None, if the car is not connected."""
+    return _connected_cars.get(company_name, {}).get(car_name)
 
 
 def is_car_connected(company_name: str, car_name: str) -> bool:
     """Check if a car is connected."""
-    return company_name in _connected_cars and car_name in _connected_cars[company_name]
+    return connected_car(company_name, car_name) is not None
+
+
+def is_device_connected(company_name: str, car_name: str, device_id: DeviceId) -> bool:
+    """Check if a device is connected to a car."""
+    car = connected_car(company_name, car_name)
+    return car is not None and car.is_connected(device_id)
 
 
 def clear_connected_cars() -> None:
-    """Clear the whole device_ids dictionary.""" ""
-    _connected_cars.clear()
+    """Remove all the connected cars."""
+    global _connected_cars
+    with _connected_cars_lock:
+        _connected_cars = dict()
 
 
 def remove_connected_device(company_name: str, car_name: str, device_id: DeviceId) -> None:
-    """Remove a device id from its module dict in the device_ids dictionary."""
-    _connected_cars[company_name][car_name].remove_device(device_id)
+    """Remove a device id from its module of a connected car. The car is kept, even if empty."""
+    with _connected_cars_lock:
+        car = connected_car(company_name, car_name)
+        if car is not None:
+            _replace_car(company_name, car_name, car.without_device(device_id))
 
 
 def clean_up_disconnected_cars_and_modules() -> None:
-    """Remove empty modules, cars and companies from the device_ids dictionary."""
-    for company in _connected_cars:
-        for car in _connected_cars[company]:
-            empty_modules: list[ConnectedModule] = []
-            for module in _connected_cars[company][car].modules.values():
-                if not module.device_ids:
-                    empty_modules.append(module)
-            for module in empty_modules:
-                _connected_cars[company][car].modules.pop(module.id)
-
-        cars_without_modules = [
-            car
-            for car in _connected_cars[company].keys()
-            if not _connected_cars[company][car].modules
-        ]
-        for car in cars_without_modules:
-            _connected_cars[company].pop(car)
-
-    companies_without_cars = [
-        company for company in _connected_cars.keys() if not _connected_cars[company]
-    ]
-    for company in companies_without_cars:
-        _connected_cars.pop(company)
+    """Remove empty modules, cars and companies from the connected cars."""
+    global _connected_cars
+    with _connected_cars_lock:
+        cleaned: dict[str, dict[str, ConnectedCar]] = dict()
+        for company, cars in _connected_cars.items():
+            company_cars: dict[str, ConnectedCar] = dict()
+            for name, car in cars.items():
+                modules = {id: module for id, module in car.modules.items() if module.device_ids}
+                if not modules:
+                    continue
+                if len(modules) < len(car.modules):
+                    car = dataclasses.replace(car, modules=modules)
+                company_cars[name] = car
+            if company_cars:
+                cleaned[company] = company_cars
+        _connected_cars = cleaned
 
 
 def serialized_device_id(device_id: DeviceId) -> str:
     return f"{device_id.module_id}_{device_id.type}_{device_id.role}"
+
+
+def _replace_car(company_name: str, car_name: str, car: ConnectedCar) -> None:
+    """Replace the car in the connected cars by a new snapshot of the connected cars.
+
+    The lock of the connected cars has to be acquired by the caller.
+    """
+    global _connected_cars
+    company_cars = _connected_cars.get(company_name, {}).copy()
+    company_cars[car_name] = car
+    cars = _connected_cars.copy()
+    cars[company_name] = company_cars
+    _connected_cars = cars
@@ -0,0 +1,95 @@
+from __future__ import annotations
+from typing import Any
+import json
+import logging
+import os
+
+from server.logs import LOGGER_NAME
+from server.fleetv2_http_api.models.device_id import DeviceId  # type: ignore
+from server.database.cache import (  # type: ignore
+    ConnectedCar,
+    ConnectedModule,
+    add_connected_cars,
+    connected_cars,
+    serialized_device_id,
+)
+from server.database.database_controller import newest_status_timestamp  # type: ignore
+
+
+_logger = logging.getLogger(LOGGER_NAME)
+
+
+# Version of the snapshot format. Snapshots of other versions are ignored.
+SNAPSHOT_VERSION = 1
+
+
+def save_connected_cars_snapshot(path: str) -> None:
+    """Save the connected cars to the file, stamped with the timestamp of the newest status
+    stored in the database.
+
+    The stamp is read before the connected cars, so that every status not older than the stamp
+    is replayed when loading the snapshot. The file is replaced atomically.
+    """
+    stamp = newest_status_timestamp()
+    cars = [car for company_cars in connected_cars().values() for car in company_cars.values()]
+    snapshot = {
+        "version": SNAPSHOT_VERSION,
+        "max_timestamp": stamp,
+        "cars": [_serialized_car(car) for car in cars],
+    }
+    temporary_path = f"{path}.tmp"
+    with open(temporary_path, "w") as snapshot_file:
+        json.dump(snapshot, snapshot_file, separators=(",", ":"))
+    os.replace(temporary_path, path)
+    _logger.debug(f"Saved snapshot of {len(cars)} connected cars to '{path}'.")
+
+
+def load_connected_cars_snapshot(path: str, min_timestamp: int) -> int | None:
+    """Add the connected cars from the snapshot file and return the stamp of the snapshot.
+
+    Return None and leave the connected cars unchanged, if the file does not exist, is invalid,
+    has a different version or its stamp is older than `min_timestamp`.
+    """
+    try:
+        with open(path) as snapshot_file:
+            snapshot = json.load(snapshot_file)
+        if snapshot.get("version") != SNAPSHOT_VERSION:
+            _logger.info(f"Ignoring snapshot of connected cars '{path}' of different version.")
+            return None
+        stamp = snapshot["max_timestamp"]
+        if stamp is None or stamp < min_timestamp:
+            _logger.info(f"Ignoring outdated snapshot of connected cars '{path}'.")
+            return None
+        cars = [_deserialized_car(car) for car in snapshot["cars"]]
+    except FileNotFoundError:
+        _logger.info(f"No snapshot of connected cars found at '{path}'.")
+        return None
+    except (OSError, ValueError, KeyError, TypeError, AttributeError) as e:
+        _logger.warning(f"Cannot load snapshot of connected cars '{path}'. Error: {e}")
+        return None
+    add_connected_cars(cars)
+    _logger.info(f"Loaded snapshot of {len(cars)} connected cars from '{path}'.")
+    return stamp
+
+
+def _serialized_car(car: ConnectedCar) -> list[Any]:
+    devices = [
+        [device_id.module_id, device_id.type, device_id.role, device_id.name]
+        for module in car.modules.values()
+        for device_id in module.device_ids.values()
+    ]
+    return [car.company_name, car.car_name, car.timestamp, devices]
+
+
+def _deserialized_car(serialized: list[Any]) -> ConnectedCar:
+    company_name, car_name, timestamp, devices = serialized
+    modules: dict[int, dict[str, DeviceId]] = dict()
+    for module_id, device_type, role, name in devices:
+        device_id = DeviceId(module_id=module_id, type=device_type, role=role, name=name)
+        modules.setdefault(module_id, {})[serialized_device_id(device_id)] = device_id
+    return ConnectedCar(
+        company_name=company_name,
+        car_name=car_name,
+        timestamp=int(timestamp),
+        modules={id: ConnectedModule(id, device_ids) for id, device_ids in modules.items()},
+    )
@@ -1,12 +1,15 @@
-from typing import Optional, Callable
+from typing import Optional, Callable, Any
 import tenacity
 import logging
 
-from sqlalchemy import create_engine, Engine, Integer, String
+from sqlalchemy import create_engine, event, Engine, Integer, String
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 from sqlalchemy.exc import OperationalError
 
 from server.logs import LOGGER_NAME
+from server.database.time import timestamp as _timestamp
+import server.database.partitioning as _partitioning
+from server.database.message_buffer import clear_message_buffer as _clear_message_buffer
 
 
 N_RETRIES = 3
@@ -15,6 +18,7 @@ RETRY_DELAY_SECONDS = 2
 
 _connection_source: Optional[Engine] = None
 _database_accessible: bool = False
+_pool_options: dict[str, Any] = dict()
 _logger = logging.getLogger(LOGGER_NAME)
 
 
@@ -47,15 +51,80 @@ class AdminBase(Base):
 def get_connection_source() -> Engine:
     """Return the SQLAlchemy engine object used to connect to the database and
     raise exception if the engine object was not set yet.
+
+    The connection is tested only if the database has been found inaccessible. Otherwise, the
+    liveness of the connections is checked by the connection pool and the `check_database_health`.
     """
     global _connection_source
     if _connection_source is None:
         raise ConnectionSourceNotSet()
     else:
-        _test_connection_engine(_connection_source)
+        if not _database_accessible:
+            _test_connection_engine(_connection_source)
         return _connection_source
 
 
+def check_database_health() -> None:
+    """Test the connection to the database and store the result.
+
+    Meant to be called periodically in the background, so that the lost connection is detected
+    without testing it before every database access.
+    """
+    global _database_accessible
+    source = _connection_source
+    if source is None:
+        return
+    try:
+        with source.connect() as conn:
+            conn.exec_driver_sql("SELECT 1")
+        if not _database_accessible:
+            _logger.info("Connection to the database is available.")
+        _database_accessible = True
+    except OperationalError as e:
+        if _database_accessible:
+            _logger.error("Lost connection to the database. Operational error: %s", e)
+        _database_accessible = False
+
+
+def mark_database_inaccessible(error: BaseException) -> None:
+    """Make the next access to the database test the connection, after the current one was lost."""
+    global _database_accessible
+    if _database_accessible:
+        _logger.error("Lost connection to the database: %s", error)
+        _database_accessible = False
+
+
+def _mark_database_inaccessible_on_disconnect(context: Any) -> None:
+    """Make the next access to the database test the connection, if the current one was lost."""
+    # a connection failing the pre-ping is replaced by the pool without raising the error
+    if context.is_disconnect and not context.is_pre_ping:
+        mark_database_inaccessible(context.original_exception)
+
+
+def set_connection_pool(
+    size: int,
+    max_overflow: int,
+    recycle_in_seconds: int,
+    pre_ping: bool,
+    statement_timeout_in_ms: int,
+) -> None:
+    """Set the options of the connection pool used for the PostgreSQL database.
+
+    The connections are never recycled, if the `recycle_in_seconds` is zero.
+    No statement timeout is used, if the `statement_timeout_in_ms` is zero.
+    """
+    global _pool_options
+    options: dict[str, Any] = {
+        "pool_size": size,
+        "max_overflow": max_overflow,
+        "pool_recycle": recycle_in_seconds if recycle_in_seconds > 0 else -1,
+        "pool_pre_ping": pre_ping,
+    }
+    if statement_timeout_in_ms > 0:
+        options["connect_args"] = {"options": f"-c statement_timeout={statement_timeout_in_ms}"}
+    _pool_options = options
+
+
 @tenacity.retry(
     stop=tenacity.stop_after_attempt(N_RETRIES),
     wait=tenacity.wait_exponential_jitter(
@@ -97,7 +166,7 @@ def set_db_connection(
     """Create SQLAlchemy engine object used to connect to the database.
     Set module-level variable _connection_source to the new engine object."""
 
-    global _connection_source
+    global _connection_source, _database_accessible
     source = _new_connection_source(
         dialect="postgresql",
         dbapi="psycopg",
@@ -105,9 +174,13 @@ def set_db_connection(
         username=username,
         password=password,
         db_name=db_name,
+        **_pool_options,
     )
+    event.listen(source, "handle_error", _mark_database_inaccessible_on_disconnect)
     _connection_source = source
+    _database_accessible = True
     assert _connection_source is not None
+    _clear_message_buffer()
     create_all_tables(source)
     for foo in after_connect:
         foo()
@@ -117,12 +190,14 @@ def set_test_db_connection(dblocation: str = "", db_name: str = "") -> None:
     """Create test SQLAlchemy engine object used to connect to the database using SQLite.
     No username or password required.
     Set module-level variable _connection_source to the new engine object."""
-    global _connection_source
+    global _connection_source, _database_accessible
     source = _new_connection_source(
         dialect="sqlite", dbapi="pysqlite", dblocation=dblocation, db_name=db_name
     )
     _connection_source = source
+    _database_accessible = True
     assert _connection_source is not None
+    _clear_message_buffer()
     create_all_tables(source)
 
 
@@ -138,6 +213,7 @@ def get_db_connection(
         username=username,
         password=password,
         db_name=db_name,
+        **_pool_options,
     )
     return source
 
@@ -153,7 +229,13 @@ def get_test_db_connection(dblocation: str = "", db_name: str = "") -> Engine |
 
 
 def create_all_tables(source: Engine) -> None:
+    _partitioning.mark_tables_for_partitioning(source, Base.metadata)
     Base.metadata.create_all(source)
+    # Indexes added to already existing tables are not created by the create_all method.
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(source, checkfirst=True)
+    _partitioning.create_partitions(source, Base.metadata, _timestamp())
 
 
 def _new_connection_source(
@@ -1,21 +1,48 @@
 from __future__ import annotations
-from typing import ClassVar, Any
+from typing import ClassVar, Any, Iterator, Sequence
 import dataclasses
-import copy
 import logging as _logging
+import time as _time
 
 from sqlalchemy.orm import Mapped, mapped_column, Session
-from sqlalchemy import Integer, String, JSON, select, insert, delete, BigInteger, and_, or_
+from sqlalchemy import (
+    Connection,
+    Engine,
+    Integer,
+    String,
+    JSON,
+    Index,
+    select,
+    insert,
+    delete,
+    BigInteger,
+    Row,
+    TableClause,
+    and_,
+    func,
+    or_,
+    tuple_,
+)
 from sqlalchemy.exc import (
     IntegrityError as _IntegrityError,
     OperationalError as _OperationalError,
 )
 import psycopg
+from psycopg import sql as _sql
+from psycopg.types.json import Json as _Json
 
 from server.database.connection import (
     DatabaseNotAccessible as _DatabaseNotAccessible,
+    mark_database_inaccessible as _mark_database_inaccessible,
 )
 from server.enums import MessageType  # type: ignore
+from server.database.partitioning import (
+    PARTITION_BY_TIMESTAMP as _PARTITION_BY_TIMESTAMP,
+    create_partitions as _create_partitions,
+    default_partition as _default_partition,
+    drop_expired_partitions as _drop_expired_partitions,
+    is_partitioning_used as _is_partitioning_used,
+)
 from server.database.connection import (
     Base,
     get_connection_source as _get_connection_source,
@@ -23,18 +50,30 @@ from server.database.connection import (
     set_test_db_connection as _set_test_db_connection,
 )
 from server.database.cache import (  # type: ignore
+    ConnectedCar,
+    ConnectedModule,
     add_car,
     add_device,
+    add_connected_cars,
     connected_cars,
+    serialized_device_id,
     clean_up_disconnected_cars_and_modules,
     remove_connected_device,
     clear_connected_cars as _clear_connected_cars,
 )
+from server.database.message_buffer import (  # type: ignore
+    remove_buffered_messages as _remove_buffered_messages,
+    remove_buffered_messages_older_than as _remove_buffered_messages_older_than,
+)
 from server.fleetv2_http_api.models.device_id import DeviceId  # type: ignore
 from server.logs import LOGGER_NAME
 
 
 _logger = _logging.getLogger(LOGGER_NAME)
+_deletion_batch_size: int = 5000
+_max_deletion_batches: int = 20
+# Minimum number of messages sent in a single request to be inserted using the PostgreSQL COPY.
+COPY_MIN_BATCH_SIZE = 50
 
 
 @dataclasses.dataclass
@@ -43,7 +82,17 @@ class MessageBase(Base):
 
     __tablename__: ClassVar[str] = "message"  # type: ignore
     _data_retention_period_in_seconds: ClassVar[int] = 10000
-    __table_args__ = {"extend_existing": True}
+    __table_args__ = (
+        # Index for the queries of messages of a single car filtered by type and timestamp.
+        Index(
+            "ix_message_company_car_type_timestamp",
+            "company_name",
+            "car_name",
+            "message_type",
+            "timestamp",
+        ),
+        {"extend_existing": True, "info": {_PARTITION_BY_TIMESTAMP: True}},
+    )
 
     timestamp: Mapped[int] = mapped_column(BigInteger, primary_key=True)
     sent_order: Mapped[int] = mapped_column(Integer, primary_key=True, default=0)
@@ -71,34 +120,6 @@ class MessageBase(Base):
         if isinstance(seconds, int) and seconds > 0:
             cls._data_retention_period_in_seconds = seconds
 
-    @staticmethod
-    def from_message(
-        company_name: str, car_name: str, message: MessageDB, order: int = 0
-    ) -> MessageBase:
-        return MessageBase(
-            timestamp=message.timestamp,
-            sent_order=order,
-            company_name=company_name,
-            car_name=car_name,
-            serialized_device_id=message.serialized_device_id,
-            module_id=message.module_id,
-            device_type=message.device_type,
-            device_role=message.device_role,
-            device_name=message.device_name,
-            message_type=message.message_type,
-            payload_encoding=message.payload_encoding,
-            payload_data=message.payload_data,  # type: ignore
-        )
-
-    @staticmethod
-    def from_messages(company_name: str, car_name: str, *messages: MessageDB) -> list[MessageBase]:
-        bases: list[MessageBase] = list()
-        for k in range(len(messages)):
-            bases.append(
-                MessageBase.from_message(company_name, car_name, message=messages[k], order=k)
-            )
-        return bases
-
     def to_message(self) -> MessageDB:
         return MessageDB(
             timestamp=self.timestamp,
@@ -110,12 +131,20 @@ class MessageBase(Base):
             message_type=self.message_type,
             payload_encoding=self.payload_encoding,
             payload_data=self.payload_data,
+            sent_order=self.sent_order,
         )
 
 
-@dataclasses.dataclass
+@dataclasses.dataclass(slots=True)
 class MessageDB:
-    """Object defining the structure of messages sent to and retrieved from the database."""
+    """Object defining the structure of messages sent to and retrieved from the database.
+
+    The `sent_order` is the position of the message in the request it was sent in. It is ignored
+    when sending the message to the database.
+
+    The message is a single object without instance dictionary, unlike the API's `Message` composed
+    of three models, so it is also used to keep the messages in memory.
+    """
 
     timestamp: int
     serialized_device_id: str
@@ -126,12 +155,67 @@ class MessageDB:
     message_type: str
     payload_encoding: str
     payload_data: dict[str, str]
+    sent_order: int = 0
+
+
+@dataclasses.dataclass(frozen=True)
+class MessageCursor:
+    """Position of a message in the list of messages of a car.
+
+    The messages are ordered by their timestamp and the order in which they were sent. The device id
+    and the message type distinguish the messages sent at the same time in different requests.
+    """
+
+    timestamp: int
+    sent_order: int
+    serialized_device_id: str
+    message_type: str
+
+    @staticmethod
+    def at(message: MessageDB) -> MessageCursor:
+        """Return the cursor pointing to the given message."""
+        return MessageCursor(
+            timestamp=message.timestamp,
+            sent_order=message.sent_order,
+            serialized_device_id=message.serialized_device_id,
+            message_type=message.message_type,
+        )
+
+
+@dataclasses.dataclass(frozen=True)
+class EventCursor:
+    """Position of a message among the messages of multiple cars of a company, sent as the ID
+    of the event streaming the message.
+
+    The messages are ordered by their timestamp and the order in which they were sent. The car name,
+    the device id and the message type distinguish the messages sent at the same time in different
+    requests.
+    """
+
+    timestamp: int
+    sent_order: int
+    car_name: str
+    serialized_device_id: str
+    message_type: str
 
 
 def set_message_retention_period(seconds: int) -> None:
     MessageBase.set_data_retention_period(seconds)
 
 
+def set_message_deletion_batching(batch_size: int, max_batches: int) -> None:
+    """Set the maximum number of messages deleted in a single transaction during the cleanup
+    and the maximum number of such transactions in a single cleanup.
+    """
+    global _deletion_batch_size, _max_deletion_batches
+    if batch_size <= 0 or max_batches <= 0:
+        raise ValueError(
+            f"Batch size and number of batches must be positive, got {batch_size} and {max_batches}."
+        )
+    _deletion_batch_size = batch_size
+    _max_deletion_batches = max_batches
+
+
 def set_db_connection(dblocation: str, username: str = "", password: str = "") -> None:
     _set_db_connection(
         dblocation=dblocation,
@@ -153,15 +237,15 @@ def get_available_devices_from_database() -> None:
 def send_messages_to_database(
     company_name: str, car_name: str, *messages: MessageDB
 ) -> tuple[str, int]:
-    """Send a list of messages to the database, returns number of succesfully sent messages (int)."""
+    """Send a list of messages to the database, returns number of succesfully sent messages (int).
+
+    Large batches of messages are inserted using the COPY command, if the PostgreSQL is used.
+    """
     try:
         with _get_connection_source().begin() as conn:
-            stmt = insert(MessageBase.__table__)  # type: ignore
-            msg_base = MessageBase.from_messages(company_name, car_name, *messages)
-            data_list = [msg.__dict__ for msg in msg_base]
-            conn.execute(stmt, data_list)
+            _insert_rows(conn, _message_rows(company_name, car_name, messages))
             return _get_message_for_n_messages_succesfully_sent(len(messages)), 200
-    except _IntegrityError:
+    except (_IntegrityError, psycopg.errors.IntegrityError):
         return (
             "Some of the messages are identical to those sent previously, including their timestamps.",
             400,
@@ -172,6 +256,83 @@ def send_messages_to_database(
         return f"Internal server error : {e}.", 500
 
 
+def send_message_groups_to_database(groups: list[tuple[str, str, list[MessageDB]]]) -> None:
+    """Send groups of messages of possibly different cars to the database in a single transaction.
+
+    Each group is identified by company and car name and its messages are ordered in the same way
+    as by the `send_messages_to_database`. No messages are stored if any of the groups fails.
+    """
+    rows: list[dict[str, Any]] = list()
+    for company_name, car_name, messages in groups:
+        rows.extend(_message_rows(company_name, car_name, messages))
+    if not rows:
+        return
+    with _get_connection_source().begin() as conn:
+        _insert_rows(conn, rows)
+
+
+def _insert_rows(conn: Connection, rows: list[dict[str, Any]]) -> None:
+    if len(rows) >= COPY_MIN_BATCH_SIZE and conn.dialect.name == "postgresql":
+        _copy_rows(conn, rows)
+    else:
+        conn.execute(insert(MessageBase.__table__), rows)  # type: ignore
+
+
+def _message_rows(
+    company_name: str, car_name: str, messages: Sequence[MessageDB]
+) -> list[dict[str, Any]]:
+    """Return the rows of the message table, ordered by the columns of the table."""
+    return [
+        {
+            "timestamp": message.timestamp,
+            "sent_order": order,
+            "company_name": company_name,
+            "car_name": car_name,
+            "serialized_device_id": message.serialized_device_id,
+            "module_id": message.module_id,
+            "device_type": message.device_type,
+            "device_role": message.device_role,
+            "device_name": message.device_name,
+            "message_type": message.message_type,
+            "payload_encoding": message.payload_encoding,
+            "payload_data": message.payload_data,
+        }
+        for order, message in enumerate(messages)
+    ]
+
+
+def _copy_rows(conn: Connection, rows: list[dict[str, Any]]) -> None:
+    """Insert the rows into the message table using the PostgreSQL COPY command.
+
+    The rows are copied within the transaction of the connection. The operational errors raised
+    by the driver are handled as by the SQLAlchemy: the lost connection is invalidated and
+    the error is raised as the SQLAlchemy OperationalError.
+    """
+    columns = list(rows[0].keys())
+    stmt = _sql.SQL("COPY {} ({}) FROM STDIN").format(
+        _sql.Identifier(MessageBase.__tablename__),
+        _sql.SQL(", ").join(_sql.Identifier(column) for column in columns),
+    )
+    dbapi_connection = conn.connection.dbapi_connection
+    try:
+        with conn.connection.driver_connection.cursor() as cursor:  # type: ignore
+            with cursor.copy(stmt) as copy:
+                for row in rows:
+                    row["payload_data"] = _Json(row["payload_data"])
+                    copy.write_row(tuple(row.values()))
+    except psycopg.OperationalError as e:
+        is_disconnect = conn.dialect.is_disconnect(e, dbapi_connection, None)
+        if is_disconnect:
+            conn.invalidate(e)
+            _mark_database_inaccessible(e)
+        raise _OperationalError(
+            f"COPY {MessageBase.__tablename__} FROM STDIN",
+            None,
+            e,
+            connection_invalidated=is_disconnect,
+        ) from e
+
+
 def _get_message_for_n_messages_succesfully_sent(number_of_sent_messages: int) -> str:
     if number_of_sent_messages == 1:
         return "1 message has been sent."
@@ -180,18 +341,33 @@ def _get_message_for_n_messages_succesfully_sent(number_of_sent_messages: int) -
 
 
 def list_messages(
-    company_name: str, car_name: str, message_type: tuple[str, ...], since: int = 0
+    company_name: str,
+    car_name: str,
+    message_type: tuple[str, ...],
+    since: int = 0,
+    limit: int | None = None,
+    after: MessageCursor | None = None,
 ) -> list[MessageDB]:  # noqa:
     """Return a list of messages of the given type, optionally filtered by the given parameters.
     If all is not None, then all messages of the given type are returned.
 
     Otherwise, if since is not None, then all messages of the given type with a timestamp
     less or equal to since are returned. Otherwise, the newest message is returned.
+
+    The messages are ordered by their timestamp and the order they were sent in. If `after` is
+    given, only the messages following the cursor are returned. At most `limit` messages are
+    returned, if the limit is given.
     """
 
     statuses: list[MessageDB] = list()
     with Session(_get_connection_source()) as session:
         table = MessageBase.__table__
+        key = (
+            table.c.timestamp,
+            table.c.sent_order,
+            table.c.serialized_device_id,
+            table.c.message_type,
+        )
         selection = select(MessageBase)
         selection = selection.where(or_(*[table.c.message_type == type for type in message_type]))
         selection = selection.where(
@@ -200,7 +376,17 @@ def list_messages(
                 table.c.car_name == car_name,
                 table.c.timestamp >= since,
             )
-        ).order_by(table.c.timestamp.asc())
+        ).order_by(*(column.asc() for column in key))
+        if after is not None:
+            after_key = (
+                after.timestamp,
+                after.sent_order,
+                after.serialized_device_id,
+                after.message_type,
+            )
+            selection = selection.where(tuple_(*key) > after_key)
+        if limit is not None:
+            selection = selection.limit(limit)
         result = session.execute(selection)
         for row in result:
             base: MessageBase = row[0]
@@ -208,6 +394,154 @@ def list_messages(
         return statuses
 
 
+def stream_message_rows(
+    company_name: str, car_name: str, message_type: tuple[str, ...], since: int, batch_size: int
+) -> Iterator[Sequence[Row]]:
+    """Yield the messages of the given type with a timestamp greater or equal to `since`
+    in batches of at most `batch_size` messages, ordered in the same way as by the `list_messages`.
+
+    Each message is a row of the timestamp, module id, device type, device role, device name,
+    message type, payload encoding and payload data, selected without the ORM.
+
+    The rows are fetched from the database in batches, using a server-side cursor if supported.
+    The database connection is held until the generator is exhausted or closed.
+    """
+    table = MessageBase.__table__
+    selection = (
+        select(
+            table.c.timestamp,
+            table.c.module_id,
+            table.c.device_type,
+            table.c.device_role,
+            table.c.device_name,
+            table.c.message_type,
+            table.c.payload_encoding,
+            table.c.payload_data,
+        )
+        .where(
+            or_(*[table.c.message_type == type for type in message_type]),
+            table.c.company_name == company_name,
+            table.c.car_name == car_name,
+            table.c.timestamp >= since,
+        )
+        .order_by(
+            table.c.timestamp.asc(),
+            table.c.sent_order.asc(),
+            table.c.serialized_device_id.asc(),
+            table.c.message_type.asc(),
+        )
+    )
+    with _get_connection_source().connect() as conn:
+        result = conn.execution_options(yield_per=batch_size).execute(selection)
+        for partition in result.partitions():
+            yield partition
+
+
+def list_message_rows_of_cars(
+    company_name: str, since_by_car: dict[str, int], message_type: tuple[str, ...]
+) -> list[Row]:
+    """Return the messages of the given type of the cars of the company by a single query.
+
+    The messages of each car have a timestamp greater or equal to the car's value in the
+    `since_by_car`. Each message is a row of the car name followed by the columns selected
+    by the `stream_message_rows`. The rows are ordered by the car name and then in the same way
+    as by the `list_messages`.
+    """
+    if not since_by_car:
+        return []
+    table = MessageBase.__table__
+    cars_by_since: dict[int, list[str]] = dict()
+    for car_name, since in since_by_car.items():
+        cars_by_since.setdefault(since, []).append(car_name)
+    # the cars are grouped by their 'since', usually shared by all of them
+    car_conditions = [
+        and_(table.c.car_name.in_(car_names), table.c.timestamp >= since)
+        for since, car_names in cars_by_since.items()
+    ]
+    selection = (
+        select(
+            table.c.car_name,
+            table.c.timestamp,
+            table.c.module_id,
+            table.c.device_type,
+            table.c.device_role,
+            table.c.device_name,
+            table.c.message_type,
+            table.c.payload_encoding,
+            table.c.payload_data,
+        )
+        .where(
+            or_(*[table.c.message_type == type for type in message_type]),
+            table.c.company_name == company_name,
+            or_(*car_conditions),
+        )
+        .order_by(
+            table.c.car_name.asc(),
+            table.c.timestamp.asc(),
+            table.c.sent_order.asc(),
+            table.c.serialized_device_id.asc(),
+            table.c.message_type.asc(),
+        )
+    )
+    with _get_connection_source().connect() as conn:
+        return list(conn.execute(selection))
+
+
+def stream_event_rows(
+    company_name: str,
+    car_name: str | None,
+    message_type: tuple[str, ...],
+    since: int,
+    after: EventCursor | None,
+    batch_size: int,
+) -> Iterator[Sequence[Row]]:
+    """Yield the messages of the given type of the car, or of all the cars of the company if
+    `car_name` is None, in batches of at most `batch_size` messages.
+
+    The messages have a timestamp greater or equal to `since` and follow the `after` cursor,
+    if given. They are ordered in the same way as the cursors. Each message is a row of the car
+    name, the sent order and the serialized device id, followed by the columns selected
+    by the `stream_message_rows`.
+    """
+    table = MessageBase.__table__
+    key = (
+        table.c.timestamp,
+        table.c.sent_order,
+        table.c.car_name,
+        table.c.serialized_device_id,
+        table.c.message_type,
+    )
+    selection = (
+        select(
+            table.c.car_name,
+            table.c.sent_order,
+            table.c.serialized_device_id,
+            table.c.timestamp,
+            table.c.module_id,
+            table.c.device_type,
+            table.c.device_role,
+            table.c.device_name,
+            table.c.message_type,
+            table.c.payload_encoding,
+            table.c.payload_data,
+        )
+        .where(
+            or_(*[table.c.message_type == type for type in message_type]),
+            table.c.company_name == company_name,
+            table.c.timestamp >= since,
+        )
+        .order_by(*(column.asc() for column in key))
+    )
+    if car_name is not None:
+        selection = selection.where(table.c.car_name == car_name)
+    if after is not None:
+        selection = selection.where(tuple_(*key) > dataclasses.astuple(after))
+    with _get_connection_source().connect() as conn:
+        result = conn.execution_options(yield_per=batch_size).execute(selection)
+        for partition in result.partitions():
+            yield partition
+
+
 def cleanup_device_commands_and_warn_before_future_commands(
     current_timestamp: int, company_name: str, car_name: str, serialized_device_id: str
 ) -> list[str]:
@@ -251,7 +585,9 @@ def cleanup_device_commands_and_warn_before_future_commands(
                         payload_data=row[4],
                     )
                 )
-        return future_command_warnings
+    # the commands of the other devices are read from the database until new commands are buffered
+    _remove_buffered_messages(company_name, car_name, (MessageType.COMMAND,))
+    return future_command_warnings
 
 
 def future_command_warning(
@@ -271,14 +607,25 @@ def future_command_warning(
 def remove_old_messages(current_timestamp: int) -> None:
     """Remove all messages with a timestamp older than the current timestamp
     minus the data retention period.
+
+    If the partitioning is used, the expired partitions are dropped as a whole and only the messages
+    in the default partition are deleted one by one. The messages in a partition are therefore kept
+    until all of them expire.
+
+    The messages are deleted in batches of limited size. Messages exceeding the maximum number
+    of batches are left to be deleted in the next cleanup.
     """
     try:
-        with _get_connection_source().begin() as conn:
-            oldest_timestamp_to_be_kept = current_timestamp - MessageBase.data_retention_period_ms()
-            stmt = delete(MessageBase.__table__).where(  # type: ignore
-                MessageBase.__table__.c.timestamp < oldest_timestamp_to_be_kept
-            )
-            conn.execute(stmt)
+        source = _get_connection_source()
+        oldest_timestamp_to_be_kept = current_timestamp - MessageBase.data_retention_period_ms()
+        table: TableClause = MessageBase.__table__  # type: ignore
+        _remove_buffered_messages_older_than(oldest_timestamp_to_be_kept)
+        if _is_partitioning_used(source):
+            dropped = _drop_expired_partitions(source, Base.metadata, oldest_timestamp_to_be_kept)
+            if dropped:
+                _logger.info(f"Dropped expired message partitions: {', '.join(dropped)}.")
+            table = _default_partition(MessageBase.__table__)  # type: ignore
+        _delete_messages_in_batches(source, table, oldest_timestamp_to_be_kept)
         clean_up_disconnected_cars()
     except psycopg.errors.UndefinedTable:
         _logger.debug("The database table does not exist yet, no messages to clean up.")
@@ -288,35 +635,92 @@ def remove_old_messages(current_timestamp: int) -> None:
         _logger.error(f"Cannot clean up old messages. Error: {e}")
 
 
+def _delete_messages_in_batches(
+    source: Engine, table: TableClause, oldest_timestamp_to_be_kept: int
+) -> int:
+    """Delete messages older than the given timestamp, each batch in a separate transaction.
+
+    A batch contains all messages older than the timestamp of the n-th oldest message, n being
+    the batch size. Return the number of deleted messages.
+    """
+    deleted = 0
+    timestamp = table.c.timestamp
+    for _ in range(_max_deletion_batches):
+        with source.begin() as conn:
+            batch_last_timestamp = conn.execute(
+                select(timestamp)
+                .where(timestamp < oldest_timestamp_to_be_kept)
+                .order_by(timestamp.asc())
+                .offset(_deletion_batch_size - 1)
+                .limit(1)
+            ).scalar()
+            if batch_last_timestamp is None:
+                upper_bound = oldest_timestamp_to_be_kept
+            else:
+                upper_bound = batch_last_timestamp + 1
+            result = conn.execute(delete(table).where(timestamp < upper_bound))
+            deleted += result.rowcount
+        if batch_last_timestamp is None:
+            break
+    return deleted
+
+
+def create_message_partitions(current_timestamp: int) -> None:
+    """Create the message table partitions for the current and the upcoming time periods.
+
+    Has no effect if the partitioning is not used.
+    """
+    try:
+        _create_partitions(_get_connection_source(), Base.metadata, current_timestamp)
+    except _DatabaseNotAccessible:
+        _logger.warning("Cannot create message partitions. Database is not accessible.")
+    except Exception as e:
+        _logger.error(f"Cannot create message partitions. Error: {e}")
+
+
+def newest_status_timestamp() -> int | None:
+    """Return the timestamp of the newest stored status or None, if there is no status stored."""
+    table = MessageBase.__table__
+    stmt = select(func.max(table.c.timestamp)).where(table.c.message_type == MessageType.STATUS)
+    with _get_connection_source().connect() as conn:
+        return conn.execute(stmt).scalar()
+
+
 def clean_up_disconnected_cars() -> None:
-    """Remove all car keys from the device_ids dictionary that do not have any modules.
-    Then remove all companies that do not have any cars left.
+    """Remove all devices without any status stored in the database from the connected cars.
+    Then remove all modules, cars and companies left without any devices.
     """
-    device_dict = copy.deepcopy(connected_cars())
-    for company in device_dict:
-        for car in device_dict[company]:
-            for module_id in device_dict[company][car].modules:
-                _clean_up_disconnected_devices(company, car, module_id)
+    # a device connected after taking the snapshot may have its first status stored after the query
+    cars = connected_cars()
+    devices_with_statuses = _devices_with_statuses()
+    for company in cars:
+        for car in cars[company].values():
+            for module in car.modules.values():
+                for device_id in module.device_ids.values():
+                    key = (company, car.car_name, module.id, device_id.type, device_id.role)
+                    if key not in devices_with_statuses:
+                        remove_connected_device(company, car.car_name, device_id)
     clean_up_disconnected_cars_and_modules()
 
 
-def _clean_up_disconnected_devices(company: str, car: str, module_id: int) -> None:
-    """Remove all device ids from the device_ids dictionary that do not have any messages."""
-    module_devices = connected_cars()[company][car].modules[module_id].device_ids.values()
-    for device_id in module_devices:
-        with Session(_get_connection_source()) as session:
-            table = MessageBase.__table__
-            select_stmt = select(MessageBase).where(
-                table.c.message_type == MessageType.STATUS,
-                table.c.company_name == company,
-                table.c.car_name == car,
-                table.c.module_id == module_id,
-                table.c.device_type == device_id.type,
-                table.c.device_role == device_id.role,
-            )
-            selection = session.execute(select_stmt)
-            if selection.first() is None:
-                remove_connected_device(company, car, device_id)
+def _devices_with_statuses() -> set[tuple[str, str, int, int, str]]:
+    """Return company name, car name, module id, device type and role of every device
+    with at least one status stored in the database.
+    """
+    table = MessageBase.__table__
+    stmt = (
+        select(
+            table.c.company_name,
+            table.c.car_name,
+            table.c.module_id,
+            table.c.device_type,
+            table.c.device_role,
+        )
+        .where(table.c.message_type == MessageType.STATUS)
+        .distinct()
+    )
+    with _get_connection_source().connect() as conn:
+        return {tuple(row) for row in conn.execute(stmt)}  # type: ignore
 
 
 def deserialize_device_id(serialized_id: str) -> tuple[int, int, str]:
@@ -325,18 +729,47 @@ def deserialize_device_id(serialized_id: str) -> tuple[int, int, str]:
     return int(module_id), int(device_type), device_role
 
 
-def load_available_devices_from_database() -> None:
-    with Session(_get_connection_source()) as session:
-        stmt = select(MessageBase).where(MessageBase.message_type == MessageType.STATUS)
-        result = session.execute(stmt)
-        for row in result:
-            base: MessageBase = row[0]
-            device_id = DeviceId(
-                module_id=base.module_id,
-                type=base.device_type,
-                role=base.device_role,
-                name=base.device_name,
-            )
-            timestamp = base.timestamp
-            add_car(base.company_name, base.car_name, timestamp)
-            add_device(base.company_name, base.car_name, device_id)
+def load_available_devices_from_database(since: int = 0) -> None:
+    """Add the cars and devices, that have sent statuses stored in the database, to the connected
+    cars. Only the statuses with a timestamp greater or equal to `since` are considered.
+    The timestamp of a car not yet connected is the timestamp of its oldest such status.
+
+    The devices are read by a single aggregate query, returning a single row per device.
+    """
+    start = _time.perf_counter()
+    table = MessageBase.__table__
+    device_columns = (
+        table.c.company_name,
+        table.c.car_name,
+        table.c.module_id,
+        table.c.device_type,
+        table.c.device_role,
+    )
+    stmt = (
+        select(*device_columns, func.min(table.c.device_name), func.min(table.c.timestamp))
+        .where(table.c.message_type == MessageType.STATUS, table.c.timestamp >= since)
+        .group_by(*device_columns)
+    )
+    timestamps: dict[tuple[str, str], int] = dict()
+    devices: dict[tuple[str, str], dict[int, dict[str, DeviceId]]] = dict()
+    with _get_connection_source().connect() as conn:
+        rows = conn.execute(stmt).all()
+    for company, car, module_id, device_type, role, name, timestamp in rows:
+        key = (company, car)
+        timestamps[key] = min(timestamp, timestamps.get(key, timestamp))
+        device_id = DeviceId(module_id=module_id, type=device_type, role=role, name=name)
+        module = devices.setdefault(key, {}).setdefault(module_id, {})
+        module[serialized_device_id(device_id)] = device_id
+    add_connected_cars(
+        ConnectedCar(
+            company_name=company,
+            car_name=car,
+            timestamp=timestamps[(company, car)],
+            modules={id: ConnectedModule(id, device_ids) for id, device_ids in modules.items()},
+        )
+        for (company, car), modules in devices.items()
+    )
+    _logger.info(
+        f"Loaded {len(devices)} cars with {len(rows)} devices from the database "
+        f"in {_time.perf_counter() - start:.3f} s."
+    )
@@ -0,0 +1,138 @@
+from __future__ import annotations
+from typing import TYPE_CHECKING
+import bisect
+import sys
+import threading
+
+if TYPE_CHECKING:  # pragma: no cover
+    # the database controller imports this module
+    from server.database.database_controller import MessageDB
+
+
+# Buffers of the most recent messages, identified by company name, car name and message types.
+_buffers: dict[tuple[str, str, tuple[str, ...]], _MessageBuffer] = dict()
+_buffers_lock = threading.Lock()
+_buffer_size: int = 0
+
+
+class _MessageBuffer:
+    """The most recent messages of a single car, ordered by their timestamps.
+
+    The buffer contains all the stored messages with a timestamp not less than `covered_from`.
+    """
+
+    __slots__ = ("lock", "messages", "covered_from")
+
+    def __init__(self, covered_from: int) -> None:
+        self.lock = threading.Lock()
+        self.messages: list[MessageDB] = list()
+        self.covered_from = covered_from
+
+    def add(self, messages: list[MessageDB], max_size: int) -> None:
+        with self.lock:
+            for message in messages:
+                bisect.insort(self.messages, message, key=lambda m: m.timestamp)
+            n_removed = len(self.messages) - max_size
+            if n_removed > 0:
+                self.covered_from = self.messages[n_removed - 1].timestamp + 1
+                del self.messages[:n_removed]
+
+    def since(self, since: int) -> list[MessageDB] | None:
+        with self.lock:
+            if since < self.covered_from:
+                return None
+            start = bisect.bisect_left(self.messages, since, key=lambda m: m.timestamp)
+            return self.messages[start:]
+
+    def remove_older_than(self, timestamp: int) -> bool:
+        """Remove messages older than the timestamp. Return True if the buffer is left empty."""
+        with self.lock:
+            start = bisect.bisect_left(self.messages, timestamp, key=lambda m: m.timestamp)
+            del self.messages[:start]
+            self.covered_from = max(self.covered_from, timestamp)
+            return not self.messages
+
+
+def set_buffer_size(messages_per_car: int) -> None:
+    """Set the maximum number of buffered messages of each type for a single car.
+
+    Setting the size to zero disables the buffering.
+    """
+    global _buffer_size
+    if messages_per_car < 0:
+        raise ValueError(f"Buffer size must be non-negative, got {messages_per_car}.")
+    _buffer_size = messages_per_car
+    clear_message_buffer()
+
+
+def buffer_size() -> int:
+    return _buffer_size
+
+
+def store_messages(
+    company_name: str, car_name: str, message_types: tuple[str, ...], messages: list[MessageDB]
+) -> None:
+    """Store the messages, that have been already stored in the database, in the buffer.
+
+    The messages must have their timestamps set. The strings repeated across the messages are
+    interned, so that the buffered messages share them.
+    """
+    if _buffer_size == 0 or not messages:
+        return
+    for message in messages:
+        _intern_strings(message)
+    key = (company_name, car_name, message_types)
+    with _buffers_lock:
+        if key not in _buffers:
+            _buffers[key] = _MessageBuffer(covered_from=min(m.timestamp for m in messages))
+        buffer = _buffers[key]
+    buffer.add(messages, _buffer_size)
+
+
+def _intern_strings(message: MessageDB) -> None:
+    message.serialized_device_id = _interned(message.serialized_device_id)
+    message.device_role = _interned(message.device_role)
+    message.device_name = _interned(message.device_name)
+    message.message_type = _interned(message.message_type)
+    message.payload_encoding = _interned(message.payload_encoding)
+
+
+def _interned(value: str) -> str:
+    # subclasses of str (e.g., the enums) cannot be interned, but they are shared already
+    return sys.intern(value) if type(value) is str else value
+
+
+def buffered_messages(
+    company_name: str, car_name: str, message_types: tuple[str, ...], since: int
+) -> list[MessageDB] | None:
+    """Return buffered messages with timestamp greater than or equal to `since`.
+
+    Return None if the buffer does not cover all the messages since the given timestamp.
+    """
+    buffer = _buffers.get((company_name, car_name, message_types))
+    if buffer is None:
+        return None
+    return buffer.since(since)
+
+
+def remove_buffered_messages_older_than(timestamp: int) -> None:
+    with _buffers_lock:
+        for key, buffer in list(_buffers.items()):
+            if buffer.remove_older_than(timestamp):
+                _buffers.pop(key)
+
+
+def remove_buffered_messages(
+    company_name: str, car_name: str, message_types: tuple[str, ...]
+) -> None:
+    """Remove the buffer of the messages of the given car and types.
+
+    The messages are then read from the database until new messages are stored in the buffer.
+    """
+    with _buffers_lock:
+        _buffers.pop((company_name, car_name, message_types), None)
+
+
+def clear_message_buffer() -> None:
+    with _buffers_lock:
+        _buffers.clear()
@@ -0,0 +1,165 @@
+from __future__ import annotations
+import logging
+import re
+
+from sqlalchemy import Engine, MetaData, Table, TableClause, text, table as _table, column as _column
+
+from server.logs import LOGGER_NAME
+
+
+PARTITION_BY_TIMESTAMP = "partition_by_timestamp"
+"""Key in the `info` dictionary of a table marking the table as partitioned by the timestamp."""
+
+DEFAULT_PARTITION_SUFFIX = "_default"
+
+
+_partition_period_ms: int = 0
+_premade_partitions: int = 2
+_logger = logging.getLogger(LOGGER_NAME)
+
+
+def set_partitioning(period_in_seconds: int, premade_partitions: int = 2) -> None:
+    """Enable the time-based partitioning of the tables marked by `PARTITION_BY_TIMESTAMP`.
+
+    Each partition holds rows with timestamps from an interval of `period_in_seconds` length.
+    The `premade_partitions` is the number of partitions created in advance for future timestamps.
+
+    The partitioning is applied only for PostgreSQL databases. Setting the period to zero disables it.
+    """
+    global _partition_period_ms, _premade_partitions
+    if period_in_seconds < 0:
+        raise ValueError(f"Partition period must be non-negative, got {period_in_seconds}.")
+    if premade_partitions < 0:
+        raise ValueError(
+            f"Number of premade partitions must be non-negative, got {premade_partitions}."
+        )
+    _partition_period_ms = period_in_seconds * 1000
+    _premade_partitions = premade_partitions
+
+
+def unset_partitioning() -> None:
+    set_partitioning(0)
+
+
+def partition_period_ms() -> int:
+    return _partition_period_ms
+
+
+def is_partitioning_used(source: Engine) -> bool:
+    """Check if the partitioning is enabled and supported by the database behind the engine."""
+    return _partition_period_ms > 0 and source.dialect.name == "postgresql"
+
+
+def partitioned_tables(metadata: MetaData) -> list[Table]:
+    return [table for table in metadata.sorted_tables if table.info.get(PARTITION_BY_TIMESTAMP)]
+
+
+def partition_bounds(timestamp: int, period_ms: int) -> tuple[int, int]:
+    """Return the lower (inclusive) and upper (exclusive) bound of a partition containing the timestamp."""
+    lower = timestamp - timestamp % period_ms
+    return lower, lower + period_ms
+
+
+def partition_name(table_name: str, lower_bound: int) -> str:
+    return f"{table_name}_p{lower_bound}"
+
+
+def mark_tables_for_partitioning(source: Engine, metadata: MetaData) -> None:
+    """Make the tables marked for the partitioning to be created as partitioned by range of timestamps.
+
+    Must be called before creating the tables. Tables already existing in the database are not modified.
+    """
+    partition_by = "RANGE (timestamp)" if is_partitioning_used(source) else None
+    for table in partitioned_tables(metadata):
+        table.dialect_kwargs["postgresql_partition_by"] = partition_by
+
+
+def create_partitions(source: Engine, metadata: MetaData, current_timestamp: int) -> None:
+    """Create the partition for the current timestamp and the premade partitions for the future timestamps.
+
+    A default partition is created for each table too, catching the rows outside the created partitions.
+    """
+    if not is_partitioning_used(source):
+        return
+    lower, _ = partition_bounds(current_timestamp, _partition_period_ms)
+    for table in partitioned_tables(metadata):
+        with source.connect() as conn:
+            if not _is_partitioned(conn, table.name):
+                _logger.warning(
+                    f"Table '{table.name}' was created without partitioning. "
+                    "Partitioning will not be applied for this table."
+                )
+                continue
+        for k in range(_premade_partitions + 1):
+            start = lower + k * _partition_period_ms
+            _create_partition(
+                source,
+                f'"{partition_name(table.name, start)}" PARTITION OF "{table.name}" '
+                f"FOR VALUES FROM ({start}) TO ({start + _partition_period_ms})",
+            )
+        _create_partition(
+            source, f'"{table.name}{DEFAULT_PARTITION_SUFFIX}" PARTITION OF "{table.name}" DEFAULT'
+        )
+
+
+def drop_expired_partitions(
+    source: Engine, metadata: MetaData, oldest_timestamp_to_be_kept: int
+) -> list[str]:
+    """Drop all partitions containing only rows with timestamps older than the given timestamp.
+
+    The default partitions are never dropped. Return names of the dropped partitions.
+    """
+    if not is_partitioning_used(source):
+        return []
+    dropped: list[str] = list()
+    for table in partitioned_tables(metadata):
+        with source.connect() as conn:
+            partitions = _range_partitions(conn, table.name)
+        for name, upper_bound in partitions:
+            if upper_bound <= oldest_timestamp_to_be_kept:
+                with source.begin() as conn:
+                    conn.execute(text(f'DROP TABLE IF EXISTS "{name}"'))
+                dropped.append(name)
+    return dropped
+
+
+def default_partition(table: Table) -> TableClause:
+    """Return the default partition of the table, containing rows outside all the range partitions."""
+    return _table(table.name + DEFAULT_PARTITION_SUFFIX, _column("timestamp"))
+
+
+def _range_partitions(conn, table_name: str) -> list[tuple[str, int]]:
+    """Return names and upper bounds of all range partitions of the table."""
+    result = conn.execute(
+        text(
+            "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = :name"
+        ),
+        {"name": table_name},
+    )
+    partitions: list[tuple[str, int]] = list()
+    for name, bound in result:
+        upper_bound = re.search(r"TO \('?(-?\d+)'?\)", bound)
+        if upper_bound is not None:
+            partitions.append((name, int(upper_bound.group(1))))
+    return partitions
+
+
+def _create_partition(source: Engine, definition: str) -> None:
+    try:
+        with source.begin() as conn:
+            conn.execute(text(f"CREATE TABLE IF NOT EXISTS {definition}"))
+    except Exception as e:
+        _logger.error(f"Cannot create partition {definition}. Error: {e}")
+
+
+def _is_partitioned(conn, table_name: str) -> bool:
+    result = conn.execute(
+        text(
+            "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+            "WHERE c.relname = :name"
+        ),
+        {"name": table_name},
+    )
+    return result.first() is not None
@@ -14,6 +14,9 @@ from server.database.cache import (
     clear_loaded_admins as _clear_loaded_admins,
     clear_connected_cars as _clear_connected_cars,
 )
+from server.database.database_controller import (
+    load_available_devices_from_database as _load_available_devices_from_database,
+)
 
 
 _logger = _logging.getLogger(LOGGER_NAME)
@@ -70,4 +73,5 @@ def restart_connection_source() -> None:
             username=username,
             password=password,
             db_name=db_name,
+            after_connect=(_load_available_devices_from_database,),
         )
@@ -13,7 +13,13 @@ from server.database.connection import (
     get_connection_source as _get_connection_source,
 )
 from server.database.restart_connection import db_access_method as _db_access_method
-from server.database.cache import get_loaded_admins, store_admin
+from server.database.cache import (
+    forget_invalid_key,
+    is_key_invalid,
+    loaded_admin,
+    store_admin,
+    store_invalid_key,
+)
 from server.database.models import AdminDB
 from server.logs import LOGGER_NAME
 
@@ -36,21 +42,33 @@ def add_admin_key(name: str, connection_source: Optional[Engine] = None) -> str:
             admin = _AdminBase(name=name, key=key)
             session.add(admin)
             session.commit()
+            # a random key is practically never cached as invalid, but the key may have been used
+            # before it was added, if the key generation is replaced (e.g., in tests), and it would
+            # be rejected by this process until the invalid key expires
+            forget_invalid_key(key)
             return _admin_added_msg(name, key)
 
 
 @_db_access_method
 def get_admin(key: str) -> AdminDB | None:
-    loaded_admins = get_loaded_admins()
-    for admin in loaded_admins:
-        if admin.key == key:
-            return admin
+    """Return the admin with the API key or None, if there is no such admin.
+
+    The admins and the invalid keys are cached, so that the database is queried only when the key
+    has not been used recently.
+    """
+    admin = loaded_admin(key)
+    if admin is not None:
+        return admin
+    if is_key_invalid(key):
+        _logger.debug("API key not found.")
+        return None
 
     with Session(_get_connection_source()) as session:
         try:
             result = session.execute(select(_AdminBase).where(_AdminBase.key == key)).first()
             if result is None:
                 _logger.debug("API key not found.")
+                store_invalid_key(key)
                 return None
             else:
                 admin_base: _AdminBase = result[0]
@@ -0,0 +1,200 @@
+from __future__ import annotations
+from typing import Callable, Optional
+import collections
+import logging
+import threading
+
+from sqlalchemy.exc import OperationalError
+
+from server.logs import LOGGER_NAME
+from server.database.connection import DatabaseNotAccessible
+from server.database.database_controller import (  # type: ignore
+    MessageDB,
+    send_messages_to_database,
+    send_message_groups_to_database,
+)
+
+
+_logger = logging.getLogger(LOGGER_NAME)
+_queue: Optional[WriteBehindQueue] = None
+
+
+# Messages sent in a single request, identified by the company and car name.
+_MessageGroup = tuple[str, str, list[MessageDB]]
+
+
+class WriteBehindQueue:
+    """Bounded in-memory queue of messages stored to the database by a background thread.
+
+    The queued messages are stored in group commits, each containing at most `max_batch_size`
+    messages, after the `max_batch_size` messages are queued or after the `flush_period_ms` elapses.
+    The queued messages are lost if the server process is terminated before storing them.
+    """
+
+    def __init__(
+        self,
+        max_queued_messages: int,
+        max_batch_size: int,
+        flush_period_ms: int,
+        store: Callable[[list[_MessageGroup]], None] = send_message_groups_to_database,
+    ) -> None:
+        if max_queued_messages <= 0 or max_batch_size <= 0 or flush_period_ms <= 0:
+            raise ValueError(
+                "Maximum number of queued messages, batch size and flush period must be positive, "
+                f"got {max_queued_messages}, {max_batch_size}, {flush_period_ms}."
+            )
+        self._max_queued_messages = max_queued_messages
+        self._max_batch_size = max_batch_size
+        self._flush_period_s = flush_period_ms / 1000
+        self._store = store
+        self._groups: collections.deque[_MessageGroup] = collections.deque()
+        self._n_queued = 0
+        self._condition = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background thread and store all the queued messages."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        if self._thread.is_alive():
+            self._thread.join()
+        self.flush()
+
+    def n_queued(self) -> int:
+        """Return the number of queued messages."""
+        with self._condition:
+            return self._n_queued
+
+    def put(self, company_name: str, car_name: str, messages: list[MessageDB]) -> bool:
+        """Queue the messages. Return False if they do not fit into the queue."""
+        with self._condition:
+            if self._stopped or self._n_queued + len(messages) > self._max_queued_messages:
+                return False
+            self._groups.append((company_name, car_name, messages))
+            self._n_queued += len(messages)
+            if self._n_queued >= self._max_batch_size:
+                self._condition.notify()
+            return True
+
+    def flush(self) -> None:
+        """Store all the queued messages, unless the database is not accessible."""
+        with self._flush_lock:
+            while self._flush_batch():
+                pass
+
+    def _run(self) -> None:
+        stored = True
+        while True:
+            with self._condition:
+                # the failed batch is retried after the flush period
+                if not self._stopped and (not stored or self._n_queued < self._max_batch_size):
+                    self._condition.wait(timeout=self._flush_period_s)
+                if self._stopped:
+                    return
+            with self._flush_lock:
+                stored = self._flush_batch() or self.n_queued() == 0
+
+    def _flush_batch(self) -> bool:
+        """Store a single batch of the queued messages. Return True if the batch was not empty
+        and the database is accessible."""
+        batch = self._take_batch()
+        if not batch:
+            return False
+        try:
+            self._store(batch)
+            return True
+        except (DatabaseNotAccessible, OperationalError) as e:
+            _logger.warning(f"Cannot store queued messages, database is not accessible: {e}")
+            self._return_batch(batch)
+            return False
+        except Exception as e:
+            _logger.warning(f"Cannot store queued messages in a single transaction: {e}")
+            return self._store_groups_separately(batch)
+
+    def _store_groups_separately(self, batch: list[_MessageGroup]) -> bool:
+        not_stored: list[_MessageGroup] = list()
+        for group in batch:
+            msg, code = send_messages_to_database(*group[:2], *group[2])
+            if code == 503:
+                not_stored.append(group)
+            elif code != 200:
+                # the client was already responded to with the messages accepted
+                _logger.error(
+                    f"Dropping {len(group[2])} queued messages of car '{group[1]}' "
+                    f"of '{group[0]}', already accepted by the API. {msg}"
+                )
+        self._return_batch(not_stored)
+        return not not_stored
+
+    def _take_batch(self) -> list[_MessageGroup]:
+        batch: list[_MessageGroup] = list()
+        n_messages = 0
+        with self._condition:
+            # a single group exceeding the batch size is stored as a whole
+            while self._groups and (
+                not batch or n_messages + len(self._groups[0][2]) <= self._max_batch_size
+            ):
+                group = self._groups.popleft()
+                batch.append(group)
+                n_messages += len(group[2])
+            self._n_queued -= n_messages
+        return batch
+
+    def _return_batch(self, batch: list[_MessageGroup]) -> None:
+        """Return the messages to the front of the queue, so that they are stored later."""
+        with self._condition:
+            self._groups.extendleft(reversed(batch))
+            self._n_queued += sum(len(group[2]) for group in batch)
+
+
+def start_write_behind(max_queued_messages: int, max_batch_size: int, flush_period_ms: int) -> None:
+    """Queue the sent messages and store them to the database in the background."""
+    global _queue
+    stop_write_behind()
+    _queue = WriteBehindQueue(max_queued_messages, max_batch_size, flush_period_ms)
+    _queue.start()
+
+
+def stop_write_behind() -> None:
+    """Store all the queued messages and stop queueing the sent messages."""
+    global _queue
+    if _queue is not None:
+        queue, _queue = _queue, None
+        queue.stop()
+
+
+def is_write_behind_used() -> bool:
+    return _queue is not None
+
+
+def queue_messages(company_name: str, car_name: str, messages: list[MessageDB]) -> bool:
+    """Queue the messages to be stored in the database.
+
+    Return False if the messages were not queued, because the queue is not used or it is full.
+    """
+    queue = _queue
+    return queue is not None and queue.put(company_name, car_name, messages)
+
+
+def send_or_queue_messages(
+    company_name: str, car_name: str, *messages: MessageDB
+) -> tuple[str, int]:
+    """Queue the messages, if the queue is used and not full. Otherwise, store them directly."""
+    if queue_messages(company_name, car_name, list(messages)):
+        if len(messages) == 1:
+            return "1 message has been queued.", 200
+        return f"{len(messages)} messages have been queued.", 200
+    return send_messages_to_database(company_name, car_name, *messages)
+
+
+def flush_queued_messages() -> None:
+    """Store all the queued messages to the database."""
+    queue = _queue
+    if queue is not None:
+        queue.flush()
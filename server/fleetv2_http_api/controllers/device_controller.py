@@ -7,7 +7,7 @@ from server.fleetv2_http_api.models.message import Message  # noqa: E501
 from server.fleetv2_http_api import util
 
 
-def list_commands(company_name, car_name, since=None, wait=None):  # noqa: E501
+def list_commands(company_name, car_name, since=None, wait=None, limit=None, cursor=None):  # noqa: E501
     """list_commands
 
     Returns list of the Device Commands. # noqa: E501
@@ -20,13 +20,36 @@ def list_commands(company_name, car_name, since=None, wait=None):  # noqa: E501
     :type since: int
     :param wait: An empty parameter. If specified, the method waits for predefined period of time, until some data to be sent in response are available.
     :type wait: bool
+    :param limit: Maximum number of returned messages. If the limit is reached, the response contains the &#39;X-Next-Cursor&#39; header.
+    :type limit: int
+    :param cursor: The value of the &#39;X-Next-Cursor&#39; header of the previous response. If specified, the method returns the messages following the last message of the previous response.
+    :type cursor: str
 
     :rtype: Union[List[Message], Tuple[List[Message], int], Tuple[List[Message], int, Dict[str, str]]
     """
     return 'do some magic!'
 
 
-def list_statuses(company_name, car_name, since=None, wait=None):  # noqa: E501
+def list_company_statuses(company_name, car_name=None, since=None, wait=None):  # noqa: E501
+    """list_company_statuses
+
+    It returns lists of the Device Statuses of multiple cars of the company, by the name of the car. \\ Only the available cars are contained in the response. # noqa: E501
+
+    :param company_name: Name of the company, following a pattern ^[0-9a-z_]+$.
+    :type company_name: str
+    :param car_name: Names of the cars. If not specified, all the available cars of the company are used.
+    :type car_name: List[str]
+    :param since: A Unix timestamp for all the cars or one timestamp for each car in the &#39;car_name&#39;, in the same order; if specified, the method returns all messages of the car inclusivelly newer than its timestamp.
+    :type since: List[int]
+    :param wait: An empty parameter. If specified, the method waits for predefined period of time, until some data to be sent in response are available.
+    :type wait: bool
+
+    :rtype: Union[Dict[str, List[Message]], Tuple[Dict[str, List[Message]], int], Tuple[Dict[str, List[Message]], int, Dict[str, str]]
+    """
+    return 'do some magic!'
+
+
+def list_statuses(company_name, car_name, since=None, wait=None, limit=None, cursor=None):  # noqa: E501
     """list_statuses
 
     It returns list of the Device Statuses. # noqa: E501
@@ -39,6 +62,10 @@ def list_statuses(company_name, car_name, since=None, wait=None):  # noqa: E501
     :type since: int
     :param wait: An empty parameter. If specified, the method waits for predefined period of time, until some data to be sent in response are available.
     :type wait: bool
+    :param limit: Maximum number of returned messages. If the limit is reached, the response contains the &#39;X-Next-Cursor&#39; header.
+    :type limit: int
+    :param cursor: The value of the &#39;X-Next-Cursor&#39; header of the previous response. If specified, the method returns the messages following the last message of the previous response.
+    :type cursor: str
 
     :rtype: Union[List[Message], Tuple[List[Message], int], Tuple[List[Message], int, Dict[str, str]]
     """
@@ -81,3 +108,35 @@ def send_statuses(company_name, car_name, message=None):  # noqa: E501
     if connexion.request.is_json:
         message = [Message.from_dict(d) for d in connexion.request.get_json()]  # noqa: E501
     return 'do some magic!'
+
+
+def stream_car_messages(company_name, car_name, since=None):  # noqa: E501
+    """stream_car_messages
+
+    It streams the Device Statuses and Commands of the car as server-sent events, as they are received. \\ Each event contains the name of the car and the message and its ID can be sent in the &#39;Last-Event-ID&#39; header to resume the stream after the event. # noqa: E501
+
+    :param company_name: Name of the company, following a pattern ^[0-9a-z_]+$.
+    :type company_name: str
+    :param car_name: Name of the Car, following a pattern ^[0-9a-z_]+$.
+    :type car_name: str
+    :param since: A Unix timestamp; if specified, the stream starts with all messages inclusivelly newer than the specified timestamp. \\ Ignored, if the &#39;Last-Event-ID&#39; header is specified.
+    :type since: int
+
+    :rtype: Union[str, Tuple[str, int], Tuple[str, int, Dict[str, str]]
+    """
+    return 'do some magic!'
+
+
+def stream_company_messages(company_name, since=None):  # noqa: E501
+    """stream_company_messages
+
+    It streams the Device Statuses and Commands of all the cars of the company as server-sent events, as they are received. \\ Each event contains the name of the car and the message and its ID can be sent in the &#39;Last-Event-ID&#39; header to resume the stream after the event. # noqa: E501
+
+    :param company_name: Name of the company, following a pattern ^[0-9a-z_]+$.
+    :type company_name: str
+    :param since: A Unix timestamp; if specified, the stream starts with all messages inclusivelly newer than the specified timestamp. \\ Ignored, if the &#39;Last-Event-ID&#39; header is specified.
+    :type since: int
+
+    :rtype: Union[str, Tuple[str, int], Tuple[str, int, Dict[str, str]]
+    """
+    return 'do some magic!'
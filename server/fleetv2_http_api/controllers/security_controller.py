@@ -1,13 +1,30 @@
-from typing import Dict
+from typing import Any, Dict
+import collections
+import hashlib
+import threading
+import time
 
 import jwt
 import connexion as _connexion
 
 from server.database.security import get_admin
+from server.fleetv2_http_api.impl.jwks import JWKSKeyStore
 
 
 _public_key: str
 _client_id: str
+_key_store: JWKSKeyStore | None = None
+
+# The tokens already verified, keyed by the token's digest, with the token information and
+# the expiration time of the token. At most `_max_verified_tokens` most recently used tokens
+# are kept.
+_verified_tokens: collections.OrderedDict[bytes, tuple[Dict | None, float]] = (
+    collections.OrderedDict()
+)
+_verified_tokens_lock = threading.Lock()
+_max_verified_tokens: int = 1000
+_verified_token_hits: int = 0
+_verified_token_misses: int = 0
 
 
 def set_auth_params(public_key: str, client_id: str) -> None:
@@ -15,6 +32,42 @@ def set_auth_params(public_key: str, client_id: str) -> None:
     _public_key = "-----BEGIN PUBLIC KEY-----\n" + public_key + "\n-----END PUBLIC KEY-----"
     global _client_id
     _client_id = client_id
+    clear_verified_tokens()
+
+
+def set_key_store(key_store: JWKSKeyStore | None) -> None:
+    """Set the store of the keys for verifying the tokens by their key ID. The public key set by
+    the `set_auth_params` is used for the tokens without a key ID or with a key ID not found."""
+    global _key_store
+    _key_store = key_store
+    clear_verified_tokens()
+
+
+def set_max_verified_tokens(max_tokens: int) -> None:
+    """Set the maximum number of cached verified tokens. Zero disables the caching."""
+    global _max_verified_tokens
+    if max_tokens < 0:
+        raise ValueError(
+            f"Maximum number of verified tokens must be non-negative, got {max_tokens}."
+        )
+    _max_verified_tokens = max_tokens
+    clear_verified_tokens()
+
+
+def clear_verified_tokens() -> None:
+    global _verified_token_hits, _verified_token_misses
+    with _verified_tokens_lock:
+        _verified_tokens.clear()
+        _verified_token_hits, _verified_token_misses = 0, 0
+
+
+def verified_token_cache_stats() -> Dict[str, int]:
+    """Return the number of hits and misses of the verified tokens cache and its size."""
+    return {
+        "hits": _verified_token_hits,
+        "misses": _verified_token_misses,
+        "size": len(_verified_tokens),
+    }
 
 
 def _raise_for_simultaneous_jwt_and_api_key() -> None:
@@ -68,16 +121,89 @@ def info_from_oAuth2AuthCode(token) -> Dict | None:
 
     _raise_for_simultaneous_jwt_and_api_key()
 
+    digest = hashlib.sha256(token.encode()).digest()
+    verified, token_info = _verified_token_info(digest)
+    if verified:
+        return token_info
+
     try:
-        decoded_token = jwt.decode(token, _public_key, algorithms=["RS256"], audience="account")
+        decoded_token = jwt.decode(
+            token, _verification_key(token), algorithms=["RS256"], audience="account"
+        )
     except:
         return None
 
+    token_info = None
     for origin in decoded_token["allowed-origins"]:
         if origin == _client_id:
-            return {"scopes": {}, "uid": ""}
+            token_info = {"scopes": {}, "uid": ""}
+            break
+
+    if "exp" in decoded_token:
+        _store_verified_token(digest, token_info, float(decoded_token["exp"]))
+    return token_info  # type: ignore
+
+
+def info_from_request() -> Dict | None:
+    """
+    Authenticate the current request by the API key or the JWT token in the same way as the
+    requests to the operations of the API specification. It is used for the routes not described
+    by the specification.
 
-    return None  # type: ignore
+    :return: Information attached to the API key or the decoded token information or None
+    if the request is not authenticated
+    :rtype: dict | None
+    """
+    request = _connexion.request
+    api_key = request.args.get("api_key")
+    authorization = request.headers.get("Authorization", "")
+    try:
+        if api_key is not None:
+            return info_from_AdminAuth(api_key)
+        if authorization.startswith("Bearer "):
+            return info_from_oAuth2AuthCode(authorization[len("Bearer ") :])
+    except _connexion.exceptions.AuthenticationProblem:
+        pass
+    return None
+
+
+def _verification_key(token: str) -> Any:
+    if _key_store is not None:
+        kid = jwt.get_unverified_header(token).get("kid")
+        if kid is not None:
+            key = _key_store.key(kid)
+            if key is not None:
+                return key
+    return _public_key
+
+
+def _verified_token_info(digest: bytes) -> tuple[bool, Dict | None]:
+    """Return True and the token information, if the token has been verified and is not expired.
+    Otherwise, return False and None."""
+    global _verified_token_hits, _verified_token_misses
+    with _verified_tokens_lock:
+        verified = _verified_tokens.get(digest)
+        if verified is None:
+            _verified_token_misses += 1
+            return False, None
+        token_info, expires_at = verified
+        if time.time() >= expires_at:
+            del _verified_tokens[digest]
+            _verified_token_misses += 1
+            return False, None
+        _verified_tokens.move_to_end(digest)
+        _verified_token_hits += 1
+        return True, (None if token_info is None else token_info.copy())
+
+
+def _store_verified_token(digest: bytes, token_info: Dict | None, expires_at: float) -> None:
+    with _verified_tokens_lock:
+        if _max_verified_tokens == 0:
+            return
+        _verified_tokens[digest] = (token_info, expires_at)
+        _verified_tokens.move_to_end(digest)
+        while len(_verified_tokens) > _max_verified_tokens:
+            _verified_tokens.popitem(last=False)
 
 
 def validate_scope_oAuth2AuthCode(required_scopes, token_scopes):
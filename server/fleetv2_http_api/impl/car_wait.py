@@ -18,21 +18,37 @@ class CarWaitObjManager:
         _logger.debug(f"Creating CarWaitObjManager with timeout {timeout_ms} ms.")
         CarWaitObjManager._check_nonnegative_timeout(timeout_ms)
         self._timeout_ms = timeout_ms
-        self._wait_list: list[CarWaitObj] = list()
+        # dictionary used as an ordered set, allowing for removal of a wait object in constant time
+        self._wait_objs: dict[CarWaitObj, None] = dict()
+        self._lock = threading.Lock()
 
     @property
     def timeout_ms(self) -> int:
         return self._timeout_ms
 
     def add_response_content_and_stop_waiting(self, reponse_content: list[Any]) -> None:
-        for obj in self._wait_list:
+        """Make all the wait objects respond with the 'reponse_content' and remove them from the queue."""
+        with self._lock:
+            wait_objs, self._wait_objs = self._wait_objs, dict()
+        for obj in wait_objs:
             obj.add_reponse_content_and_stop_waiting(reponse_content)
 
     def new_wait_obj(self) -> CarWaitObj:
         wait_obj = CarWaitObj(self._timeout_ms)
-        self._wait_list.append(wait_obj)
+        with self._lock:
+            self._wait_objs[wait_obj] = None
         return wait_obj
 
+    def remove_wait_obj(self, wait_obj: CarWaitObj) -> None:
+        """Remove the wait object from the queue."""
+        with self._lock:
+            self._wait_objs.pop(wait_obj, None)
+
+    def n_waiting(self) -> int:
+        """Return the number of wait objects in the queue."""
+        with self._lock:
+            return len(self._wait_objs)
+
     def set_timeout(self, timeout_ms: int) -> None:
         """Set the timeout for wait objects in milliseconds."""
         self._check_nonnegative_timeout(timeout_ms)
@@ -41,9 +57,10 @@ class CarWaitObjManager:
 
     def wait_and_get_reponse(self) -> list[Any]:
         wait_obj = self.new_wait_obj()
-        reponse = wait_obj.wait_and_get_response()
-        self._wait_list.remove(wait_obj)
-        return reponse
+        try:
+            return wait_obj.wait_and_get_response()
+        finally:
+            self.remove_wait_obj(wait_obj)
 
     @staticmethod
     def _check_nonnegative_timeout(timeout_ms: int) -> None:
@@ -52,23 +69,26 @@ class CarWaitObjManager:
 
 
 class CarWaitObj:
-    """A wait object that waits for a response to be set and then returns it."""
+    """A wait object that waits for a response to be set and then returns it.
+
+    The response set before the waiting has started is not lost; the waiting then ends immediately.
+    """
+
+    __slots__ = ("_response_content", "_timeout_ms", "_responded")
 
     def __init__(self, timeout_ms: int) -> None:
         self._response_content: list[Any] = list()
         self._timeout_ms = timeout_ms
-        self._condition = threading.Condition()
+        self._responded = threading.Event()
 
     def add_reponse_content_and_stop_waiting(self, content: list[Any]) -> None:
         """Set the response content of this wait object and stop waiting."""
         self._response_content = content.copy()
-        with self._condition:
-            self._condition.notify()
+        self._responded.set()
 
     def wait_and_get_response(self) -> list[Any]:
         """Wait for the response object to be set and then return it."""
-        with self._condition:
-            self._condition.wait(timeout=self._timeout_ms / 1000)
+        self._responded.wait(timeout=self._timeout_ms / 1000)
         return self._response_content
 
     @staticmethod
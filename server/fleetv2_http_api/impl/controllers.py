@@ -1,9 +1,19 @@
 from __future__ import annotations
-from typing import Optional, Any, Iterable, Collection
+from typing import Optional, Any, Iterable, Iterator, Collection, Sequence
+import base64
+import binascii
+import itertools
+import json
 import logging
 import re
-
-from flask import redirect, Response  # type: ignore
+import threading
+
+from flask import redirect, request, Response  # type: ignore
+from jsonschema import Draft4Validator  # type: ignore
+from jsonschema.exceptions import best_match  # type: ignore
+from simple_websocket import ConnectionClosed  # type: ignore
+from sqlalchemy import Row
+from sqlalchemy.exc import OperationalError as _OperationalError
 from werkzeug import Response as WerkzeugResponse  # type: ignore
 from keycloak import KeycloakOpenID  # type: ignore
 
@@ -12,22 +22,46 @@ from server.fleetv2_http_api.models import Payload, DeviceId, Message, Module, C
 from server.database.database_controller import (  # type: ignore
     send_messages_to_database,
     MessageDB,
+    MessageCursor,
+    EventCursor,
     cleanup_device_commands_and_warn_before_future_commands,
 )
 from server.database.database_controller import list_messages as _list_messages
+from server.database.database_controller import stream_message_rows as _stream_message_rows
+from server.database.database_controller import (
+    list_message_rows_of_cars as _list_message_rows_of_cars,
+    stream_event_rows as _stream_event_rows,
+)
 from server.database.restart_connection import db_access_method as _db_access_method
+from server.database.connection import mark_database_inaccessible as _mark_database_inaccessible
 from server.database.cache import (  # type: ignore
     add_car as _add_car,
     add_device as _add_device,
     connected_cars as _connected_cars,
+    connected_car as _connected_car,
     serialized_device_id as _serialized_device_id,
     is_car_connected as _is_car_connected,
+    ConnectedModule as _ConnectedModule,
+)
+from server.database.message_buffer import (  # type: ignore
+    buffered_messages as _buffered_messages,
+    store_messages as _store_buffered_messages,
 )
 from server.database.time import timestamp as _timestamp  # type: ignore
+from server.database.write_behind import send_or_queue_messages as _send_or_queue_messages  # type: ignore
 from server.fleetv2_http_api.impl.message_wait import MessageWaitObjManager as _MessageWaitObjManager  # type: ignore
 from server.fleetv2_http_api.impl.car_wait import CarWaitObjManager as _CarWaitObjManager  # type: ignore
+from server.fleetv2_http_api.impl.message_stream import (  # type: ignore
+    MessageStreamManager as _MessageStreamManager,
+    MessageSubscription as _MessageSubscription,
+)
+from server.fleetv2_http_api.impl.serializer import dumps as _dumps  # type: ignore
+from server.fleetv2_http_api.impl.deserializer import model_deserializer as _model_deserializer  # type: ignore
 
 import server.fleetv2_http_api.impl.security as _msecurity  # type: ignore
+from server.fleetv2_http_api.controllers.security_controller import (  # type: ignore
+    info_from_request as _info_from_request,
+)
 from server.logs import LOGGER_NAME as _LOGGER_NAME
 from server.config import SecurityConfig as _SecurityConfig
 
@@ -36,11 +70,32 @@ logger = logging.getLogger(_LOGGER_NAME)
 
 
 _NAME_PATTERN = "^[0-9a-z_]+$"
+_STREAMED_MESSAGE_TYPES = (MessageType.STATUS, MessageType.STATUS_ERROR, MessageType.COMMAND)
+# The JSON objects of the listed messages read from the database, or the awaited messages.
+_ListedMessages = list[dict[str, Any]] | list[Message]
+# Response header with the cursor to the next page of the listed messages.
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+# The route of the WebSocket channel of a car, relative to the base path of the API.
+CAR_CHANNEL_PATH = "/channel/<company_name>/<car_name>"
+
+
+# Listed messages are read from the database and sent in the response in batches of this size.
+_streaming_batch_size: int = 1000
+# Period of the comments sent in the event streams, if there are no messages to be sent.
+_event_stream_keepalive_s: float = 15.0
+# The longest expected time between setting the timestamp of a sent message and publishing it.
+_max_publishing_delay_ms: int = 10000
+# Validator of the statuses received over the car channel, if set by `set_car_channel_schema`.
+_channel_statuses_validator: Optional[Draft4Validator] = None
+
+
+_message_from_dict = _model_deserializer(Message)
 
 
 _status_wait_manager = _MessageWaitObjManager()
 _cmd_wait_manager = _MessageWaitObjManager()
 _car_wait_manager = _CarWaitObjManager()
+_message_stream_manager = _MessageStreamManager()
 
 
 def set_status_wait_timeout_s(timeout_s: float) -> None:
@@ -88,6 +143,33 @@ def get_car_wait_timeout_s() -> float:
     return _car_wait_manager.timeout_ms * 0.001
 
 
+def set_streaming_batch_size(batch_size: int) -> None:
+    """Set the number of messages, above which the listed messages are streamed in the response."""
+    global _streaming_batch_size
+    if batch_size <= 0:
+        raise ValueError(f"Streaming batch size must be positive, got {batch_size}.")
+    _streaming_batch_size = batch_size
+
+
+def set_event_stream_params(keepalive_s: float, max_queued_messages: int) -> None:
+    """Set the period of the keep-alive comments of the event streams and the maximum number
+    of messages queued for a single stream."""
+    global _event_stream_keepalive_s
+    if keepalive_s <= 0:
+        raise ValueError(f"Keep-alive period must be positive, got {keepalive_s}.")
+    _message_stream_manager.set_max_queued_messages(max_queued_messages)
+    _event_stream_keepalive_s = keepalive_s
+
+
+def set_car_channel_schema(statuses_schema: dict[str, Any]) -> None:
+    """Set the JSON schema the statuses received over the car channel are validated against,
+    i.e., the resolved schema of the body of the `send_statuses` request."""
+    global _channel_statuses_validator
+    _channel_statuses_validator = Draft4Validator(
+        statuses_schema, format_checker=Draft4Validator.FORMAT_CHECKER
+    )
+
+
 def login(device: Optional[str] = None) -> WerkzeugResponse | Response | tuple[dict | str, int]:
     """login
 
@@ -260,21 +342,21 @@ def available_devices(
             empty_response_body, 404, f"No car named '{car_name}' is registered."
         )
 
+    car_modules = cars_dict[company_name][car_name].modules
     if module_id is None:
-        car_modules = cars_dict[company_name][car_name].modules
-        modules = [_available_module(company_name, car_name, id) for id in car_modules]
+        modules = [_available_module(module) for module in car_modules.values()]
         return _log_info_and_respond(
             modules, 200, f"listing available modules ({company_and_car_name})"
         )
     else:
-        if module_id not in cars_dict[company_name][car_name].modules:
+        if module_id not in car_modules:
             return _log_info_and_respond(
                 empty_response_body,
                 404,
                 f"No module with id '{module_id}' is available ({company_and_car_name}).",
             )
         else:
-            module = _available_module(company_name, car_name, module_id)
+            module = _available_module(car_modules[module_id])
             return _log_info_and_respond(
                 module,
                 200,
@@ -284,8 +366,17 @@ def available_devices(
 
 @_db_access_method
 def list_commands(
-    company_name: str, car_name: str, since: int = 0, wait: bool = False
-) -> tuple[list[Message], int]:  # noqa: E501
+    company_name: str,
+    car_name: str,
+    since: int = 0,
+    wait: bool = False,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+) -> (
+    Response
+    | tuple[_ListedMessages, int]
+    | tuple[list[dict[str, Any]], int, dict[str, str]]
+):
     """list_commands
 
     Returns list of the Device Commands. # noqa: E501
@@ -301,14 +392,21 @@ def list_commands(
     :param wait: An empty parameter. If specified, the method waits for predefined period of time,
     until some data to be sent in response are available.
     :type wait: bool
+    :param limit: Maximum number of returned commands.
+    :type limit: int
+    :param cursor: Value of the 'X-Next-Cursor' header of the previous response.
+    :type cursor: str
 
-    :rtype: Union[list[Message], tuple[list[Message], int], tuple[list[Message], int, dict[str, str]]
+    :rtype: Union[Response, tuple[list[dict] | list[Message], int], tuple[list[dict], int, dict]]
     """
+    after = _decode_cursor(cursor)
+    if after is None and cursor is not None:
+        return _log_info_and_respond([], 400, f"Invalid cursor '{cursor}'.")
     _, code = _car_availability(company_name, car_name)
     car_available = code == 200
     if car_available:
         return _response_for_request_for_connected_cars_commands(
-            company_name, car_name, since, wait
+            company_name, car_name, since, wait, limit, after
         )
     else:
         return _response_for_request_for_disconnected_cars_commands(
@@ -318,8 +416,17 @@ def list_commands(
 
 @_db_access_method
 def list_statuses(
-    company_name: str, car_name: str, since: int = 0, wait: bool = False
-) -> tuple[list[Message], int]:  # noqa: E501
+    company_name: str,
+    car_name: str,
+    since: int = 0,
+    wait: bool = False,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+) -> (
+    Response
+    | tuple[_ListedMessages, int]
+    | tuple[list[dict[str, Any]], int, dict[str, str]]
+):
     """Return list of the device statuses.
 
     :param company_name: Name of the company, following a pattern ^[0-9a-z_]+$.
@@ -333,14 +440,27 @@ def list_statuses(
     :param wait: An empty parameter. If specified, the method waits for predefined period of time,
     until some data to be sent in response are available.
     :type wait: bool
+    :param limit: Maximum number of returned statuses.
+    :type limit: int
+    :param cursor: Value of the 'X-Next-Cursor' header of the previous response.
+    :type cursor: str
     """
     car = f"Company='{company_name}', car='{car_name}'"
-    db_statuses = _list_messages(
-        company_name, car_name, (MessageType.STATUS, MessageType.STATUS_ERROR), since
+    after = _decode_cursor(cursor)
+    if after is None and cursor is not None:
+        return _log_info_and_respond([], 400, f"Invalid cursor '{cursor}' ({car}).")
+    if after is not None:
+        since = max(since, after.timestamp)
+    statuses, headers = _list_car_messages(
+        company_name, car_name, (MessageType.STATUS, MessageType.STATUS_ERROR), since, limit, after
     )
-    if db_statuses:
-        statuses = [_message_from_db(m) for m in db_statuses]
-        return _log_info_and_respond(statuses, 200, f"Returning statuses for car ({car}).")
+    if isinstance(statuses, Response):
+        logger.info(f"Streaming statuses for car ({car}).")
+        return statuses
+    if statuses:
+        return _log_info_and_respond(
+            statuses, 200, f"Returning statuses for car ({car}).", headers
+        )
     elif not wait:
         if _car_availability(company_name, car_name)[1] == 200:
             return _log_info_and_respond([], 200, f"No statuses are available ({car}).")
@@ -363,6 +483,92 @@ def list_statuses(
             return _log_info_and_respond([], 404, f"No statuses available before timeout ({car}).")
 
 
+@_db_access_method
+def list_company_statuses(
+    company_name: str,
+    car_name: Optional[list[str]] = None,
+    since: Optional[list[int]] = None,
+    wait: bool = False,
+) -> tuple[dict[str, _ListedMessages], int]:
+    """Return lists of the device statuses of multiple cars of the company, by the car name.
+
+    The statuses of all the cars are read from the database by a single query. Only the available
+    cars are contained in the response. If none of them is available, 404 is returned.
+
+    If there are no such statuses and the 'wait' is True, a single request waits for statuses
+    of any of the cars, or of any car of the company, if no car name is specified. Only the cars
+    whose statuses ended the waiting are then contained in the response.
+
+    :param company_name: Name of the company, following a pattern ^[0-9a-z_]+$.
+    :type company_name: str
+    :param car_name: Names of the cars. If not specified, all the available cars of the company
+    are used.
+    :type car_name: list[str]
+    :param since: A Unix timestamp for all the cars or one timestamp for each car in the
+    'car_name', in the same order.
+    :type since: list[int]
+    :param wait: An empty parameter. If specified, the method waits for predefined period of time,
+    until some data to be sent in response are available.
+    :type wait: bool
+    """
+    company = f"Company='{company_name}'"
+    available_cars = _connected_cars().get(company_name, {})
+    since = since or [0]
+    if len(since) == 1:
+        requested_since = dict.fromkeys(car_name or [], since[0])
+    elif car_name is not None and len(since) == len(car_name):
+        requested_since = dict(zip(car_name, since))
+    else:
+        return _log_info_and_respond(
+            {}, 400, f"The number of 'since' timestamps does not match the cars ({company})."
+        )
+    if car_name is None:
+        since_by_car = dict.fromkeys(available_cars, since[0])
+    else:
+        since_by_car = {name: s for name, s in requested_since.items() if name in available_cars}
+
+    rows = _list_message_rows_of_cars(
+        company_name, since_by_car, (MessageType.STATUS, MessageType.STATUS_ERROR)
+    )
+    statuses: dict[str, list[dict[str, Any]]] = {name: [] for name in since_by_car}
+    for name, car_rows in itertools.groupby(rows, key=lambda row: row[0]):
+        statuses[name] = [_message_json_from_row(row[1:]) for row in car_rows]
+    if rows or (not wait and since_by_car):
+        return _log_info_and_respond(
+            statuses, 200, f"Returning statuses of {len(statuses)} cars ({company})."
+        )
+    elif not wait:
+        if car_name is None:
+            msg = f"No car is available under a company ({company})."
+        else:
+            msg = f"None of the requested cars is available ({company})."
+        return _log_info_and_respond({}, 404, msg)
+
+    if car_name is None:
+        awaited_cars: list[tuple[str, Optional[str]]] = [(company_name, None)]
+    else:
+        awaited_cars = [(company_name, name) for name in requested_since]
+    awaited = _status_wait_manager.wait_for_cars_and_get_response(awaited_cars)
+    awaited_statuses: dict[str, list[Message]] = dict()
+    for (_, name), messages in awaited.items():
+        car_since = requested_since.get(name, since[0])
+        newer = [message for message in messages if message.timestamp >= car_since]
+        if newer:
+            awaited_statuses[name] = newer
+    if awaited_statuses:
+        return _log_info_and_respond(
+            awaited_statuses,
+            200,
+            f"Returning awaited statuses of {len(awaited_statuses)} cars ({company}).",
+        )
+    elif awaited:
+        return _log_info_and_respond(
+            {}, 200, f"Found only statuses older than 'since' ({company})."
+        )
+    else:
+        return _log_info_and_respond({}, 404, f"No statuses available before timeout ({company}).")
+
+
 def send_commands(
     company_name: str, car_name: str, body: list[dict | Message]
 ) -> tuple[str, int]:  # noqa: E501
@@ -395,6 +601,9 @@ def send_commands(
     _cmd_wait_manager.add_response_content_and_stop_waiting(company_name, car_name, messages)
     commands_to_db = _message_db_list(messages)
     msg, code = send_messages_to_database(company_name, car_name, *commands_to_db)
+    if code == 200:
+        _store_buffered_messages(company_name, car_name, (MessageType.COMMAND,), commands_to_db)
+        _message_stream_manager.publish(company_name, car_name, commands_to_db)
     return _log_info_and_respond(msg, code, msg)
 
 
@@ -430,32 +639,119 @@ def send_statuses(
     _update_messages_timestamp(messages)
     _status_wait_manager.add_response_content_and_stop_waiting(company_name, car_name, messages)
     _car_wait_manager.add_response_content_and_stop_waiting([Car(company_name, car_name)])
-    response_msg = send_messages_to_database(company_name, car_name, *_message_db_list(messages))
+    statuses_to_db = _message_db_list(messages)
+    response_msg = _send_or_queue_messages(company_name, car_name, *statuses_to_db)
+    if response_msg[1] == 200:
+        _store_buffered_messages(
+            company_name, car_name, (MessageType.STATUS, MessageType.STATUS_ERROR), statuses_to_db
+        )
+        _message_stream_manager.publish(company_name, car_name, statuses_to_db)
     cmd_warnings = _check_and_handle_first_status(company_name, car_name, messages)
     msg, code = response_msg[0] + cmd_warnings, response_msg[1]
     return _log_info_and_respond(msg, code, msg)
 
 
+def stream_car_messages(
+    company_name: str, car_name: str, since: Optional[int] = None
+) -> Response | tuple[str, int]:
+    """Stream the statuses and commands of the car as server-sent events.
+
+    :param company_name: Name of the company, following a pattern ^[0-9a-z_]+$.
+    :type company_name: str
+    :param car_name: Name of the Car, following a pattern ^[0-9a-z_]+$.
+    :type car_name: str
+    :param since: A Unix timestamp; if specified, the stream starts with all the messages
+    inclusivelly newer than the specified timestamp.
+    :type since: int
+    """
+    return _event_stream_response(company_name, car_name, since)
+
+
+def stream_company_messages(
+    company_name: str, since: Optional[int] = None
+) -> Response | tuple[str, int]:
+    """Stream the statuses and commands of all the cars of the company as server-sent events.
+
+    :param company_name: Name of the company, following a pattern ^[0-9a-z_]+$.
+    :type company_name: str
+    :param since: A Unix timestamp; if specified, the stream starts with all the messages
+    inclusivelly newer than the specified timestamp.
+    :type since: int
+    """
+    return _event_stream_response(company_name, None, since)
+
+
+def authorize_car_channel() -> Optional[tuple[str, int]]:
+    """Reject the request opening the car channel, if the names of the company or the car are
+    invalid or if the request is not authenticated. Called before the request is handled.
+    """
+    view_args = request.view_args or dict()
+    for name, label in (("company_name", "Company name"), ("car_name", "Car name")):
+        value = view_args.get(name, "")
+        if not re.match(_NAME_PATTERN, value):
+            msg = f"{label} '{value}' does not match pattern '{_NAME_PATTERN}'."
+            return _log_info_and_respond(msg, 400, msg)
+    if _info_from_request() is None:
+        msg = "The car channel cannot be opened. The request is not authenticated."
+        return _log_info_and_respond(msg, 401, msg)
+    return None
+
+
+def car_channel(ws: Any, company_name: str, car_name: str) -> None:
+    """Exchange the statuses and commands with the car over the WebSocket connection `ws`.
+
+    Each text message received from the car is a list of statuses, handled in the same way as the
+    body of the `send_statuses`. It is answered by the message
+    {"type": "status_response", "code": <status code>, "body": <response body>}.
+
+    The commands are pushed to the car as they are sent by the `send_commands` in the message
+    {"type": "commands", "messages": [<commands>]}. If the 'since' query parameter is given,
+    the stored commands inclusivelly newer than the timestamp are pushed first. The connection
+    is closed, if the car does not take the commands fast enough.
+    """
+    since = request.args.get("since", type=int)
+    send_lock = threading.Lock()
+    # the commands published during reading the database are queued by the subscription
+    subscribed_at = _timestamp()
+    subscription = _message_stream_manager.subscribe(company_name, car_name)
+    pusher = threading.Thread(
+        target=_push_commands,
+        args=(ws, send_lock, subscription, subscribed_at, since),
+        daemon=True,
+    )
+    pusher.start()
+    logger.info(f"Car channel opened (company='{company_name}', car='{car_name}').")
+    try:
+        while True:
+            body, code = _send_statuses_from_channel(company_name, car_name, ws.receive())
+            response = {"type": "status_response", "code": code, "body": body}
+            with send_lock:
+                ws.send(_dumps(response).decode())
+    finally:
+        # the pusher waiting for the commands is woken up and stops
+        _message_stream_manager.unsubscribe(subscription)
+        logger.info(f"Car channel closed (company='{company_name}', car='{car_name}').")
+
+
 def _message_list_from_request_body(body: list[dict | Message]) -> list[Message]:
     messages: list[Message] = list()
     for item in body:
-        messages.append(Message.from_dict(item) if isinstance(item, dict) else item)
+        messages.append(_message_from_dict(item) if isinstance(item, dict) else item)
     return messages
 
 
-def _available_module(company_name: str, car_name: str, module_id: int) -> Module:
-    device_id_list = list(
-        _connected_cars()[company_name][car_name].modules[module_id].device_ids.values()
-    )
-    return Module(module_id, device_id_list)
+def _available_module(module: _ConnectedModule) -> Module:
+    return Module(module.id, list(module.device_ids.values()))
 
 
 def _check_and_handle_first_status(company: str, car: str, messages: list[Message]) -> str:
     command_removal_warnings = ""
     if not _is_car_connected(company, car):
-        response = list_statuses(company, car, wait=False, since=0)
-        if response[1] == 200:
-            timestamp = min([msg.timestamp for msg in response[0]])
+        first_status = _list_messages(
+            company, car, (MessageType.STATUS, MessageType.STATUS_ERROR), 0, limit=1
+        )
+        if first_status:
+            timestamp = first_status[0].timestamp
         else:
             timestamp = min([msg.timestamp for msg in messages])
         _add_car(company, car, timestamp)
@@ -511,17 +807,16 @@ def _check_message_types(expected_message_types: tuple[str, ...], *messages: Mes
 def _check_device_availability(
     company: str, car: str, module_id: int, device_id: DeviceId
 ) -> tuple[str, int]:
-    connected_cars_dict = _connected_cars()
-    msg, code = _car_availability(company, car)
-    if code != 200:
-        return msg, code
-    elif module_id not in connected_cars_dict[company][car].modules:
+    connected_car = _connected_car(company, car)
+    if connected_car is None:
+        return _car_availability(company, car)
+    elif module_id not in connected_car.modules:
         return (
             f"No module with id '{module_id}' is available in car "
             f"'{car}' under the company '{company}'",
             404,
         )
-    elif not connected_cars_dict[company][car].is_connected(device_id):
+    elif not connected_car.is_connected(device_id):
         return (
             f"No device with id '{_serialized_device_id(device_id)}' is available in module "
             f"'{module_id}' in car '{car}' under the company '{company}'",
@@ -556,21 +851,338 @@ def _handle_first_status_and_return_warnings(
     )
 
 
-def _message_from_db(message_db: MessageDB) -> Message:
-    """Convert Message_DB to Message."""
-    return Message(
-        timestamp=message_db.timestamp,
-        device_id=DeviceId(
+def _list_car_messages(
+    company: str,
+    car_name: str,
+    message_types: tuple[str, ...],
+    since: int,
+    limit: Optional[int] = None,
+    after: Optional[MessageCursor] = None,
+) -> tuple[list[dict[str, Any]] | Response, dict[str, str]]:
+    """Return JSON objects of the car messages newer than or equal to 'since' and response headers.
+
+    The messages are taken from the buffer of the most recent messages if it contains all of them,
+    otherwise they are read from the database. The paginated messages are always read from the
+    database. The headers contain the cursor to the next page, if the page is full.
+
+    If the messages are not paginated and there are more of them than the streaming batch size,
+    a response streaming the messages read from the database is returned instead.
+    """
+    if limit is None and after is None:
+        buffered = _buffered_messages(company, car_name, message_types, since)
+        if buffered is not None:
+            return [_message_json_from_db(m) for m in buffered], {}
+        batches = _stream_message_rows(
+            company, car_name, message_types, since, _streaming_batch_size
+        )
+        first_batch = next(batches, [])
+        if len(first_batch) < _streaming_batch_size:
+            batches.close()
+            return [_message_json_from_row(row) for row in first_batch], {}
+        return _streamed_messages_response(first_batch, batches), {}
+    messages_db = _list_messages(company, car_name, message_types, since, limit, after)
+    headers: dict[str, str] = {}
+    if limit is not None and len(messages_db) == limit:
+        headers[NEXT_CURSOR_HEADER] = _encode_cursor(MessageCursor.at(messages_db[-1]))
+    return [_message_json_from_db(m) for m in messages_db], headers
+
+
+def _streamed_messages_response(
+    first_batch: Sequence[Row], batches: Iterator[Sequence[Row]]
+) -> Response:
+    """Return a response sending the messages as a JSON array in chunks, one per batch.
+
+    The rows are serialized directly, without creating the messages. The batches are read from
+    the database while the response is sent, i.e., after the method accessing the database
+    returned, so a lost connection is reported here and the response is cut off.
+    """
+
+    def generate() -> Iterator[bytes]:
+        try:
+            separator = b"["
+            for batch in itertools.chain((first_batch,), batches):
+                if batch:
+                    # the brackets of the serialized batch are replaced by the separator
+                    yield separator + _dumps([_message_json_from_row(row) for row in batch])[1:-1]
+                    separator = b","
+            yield b"]\n"
+        except _OperationalError as e:
+            if e.connection_invalidated:
+                _mark_database_inaccessible(e)
+            logger.error(f"Streaming of the listed messages failed: {e.orig}")
+            raise
+        finally:
+            batches.close()  # type: ignore
+
+    return Response(generate(), status=200, mimetype="application/json")
+
+
+def _event_stream_response(
+    company: str, car_name: Optional[str], since: Optional[int]
+) -> Response | tuple[str, int]:
+    """Return a response streaming the messages of the car, or of the company if the car name is
+    None, as server-sent events with IDs of the encoded event cursors.
+
+    The stream is resumed after the event in the 'Last-Event-ID' header, or starts with the messages
+    not older than the `since`, if given. These messages are read from the database. Then, the
+    messages are sent as they are published by the `send_statuses` and `send_commands`. The stream
+    is closed, if the client does not take the published messages fast enough.
+    """
+    cars = f"Company='{company}'" + (f", car='{car_name}'" if car_name is not None else "")
+    last_event_id = request.headers.get("Last-Event-ID")
+    after = _decode_event_id(last_event_id)
+    if after is None and last_event_id is not None:
+        return _log_info_and_respond("", 400, f"Invalid Last-Event-ID '{last_event_id}' ({cars}).")
+
+    def generate() -> Iterator[bytes]:
+        # the messages published during reading the database are queued by the subscription
+        subscribed_at = _timestamp()
+        subscription = _message_stream_manager.subscribe(company, car_name)
+        messages = _stored_and_published_messages(
+            subscription, subscribed_at, _STREAMED_MESSAGE_TYPES, since, after
+        )
+        try:
+            yield b": stream started\n\n"
+            for batch in messages:
+                if batch:
+                    yield b"".join(_event(key, message_json) for key, message_json in batch)
+                else:
+                    yield b": keep-alive\n\n"
+            _log_debug(f"Closing event stream not taking published messages ({cars}).")
+        finally:
+            messages.close()
+            _message_stream_manager.unsubscribe(subscription)
+
+    logger.info(f"Streaming messages as events ({cars}).")
+    return Response(
+        generate(),
+        status=200,
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _send_statuses_from_channel(
+    company: str, car_name: str, data: str | bytes
+) -> tuple[str | list[str], int]:
+    """Validate the statuses received over the car channel and send them as the `send_statuses`."""
+    try:
+        body = json.loads(data)
+    except ValueError:
+        msg = "The statuses received over the car channel are not a valid JSON."
+        return _log_info_and_respond(msg, 400, msg)
+    if _channel_statuses_validator is not None:
+        error = best_match(_channel_statuses_validator.iter_errors(body))
+        if error is not None:
+            msg = f"Invalid statuses received over the car channel: {error.message}"
+            return _log_info_and_respond(msg, 400, msg)
+    response = send_statuses(company, car_name, body)
+    if not isinstance(response, tuple):
+        # the database is not accessible even after restarting the connection
+        msg = "The statuses received over the car channel could not be stored."
+        return _log_info_and_respond(msg, 503, msg)
+    return response[0], response[1]
+
+
+def _push_commands(
+    ws: Any,
+    send_lock: threading.Lock,
+    subscription: _MessageSubscription,
+    subscribed_at: int,
+    since: Optional[int],
+) -> None:
+    """Send the commands published to the subscription over the car channel, until the
+    subscription is closed."""
+    commands = _stored_and_published_messages(
+        subscription, subscribed_at, (MessageType.COMMAND,), since, None
+    )
+    try:
+        for batch in commands:
+            if subscription.closed:
+                return
+            if batch:
+                message = {"type": "commands", "messages": [command for _, command in batch]}
+                with send_lock:
+                    ws.send(_dumps(message).decode())
+        if subscription.overflowed:
+            # the car resumes the channel with the 'since' set to the timestamp of the last command
+            ws.close(reason=1013, message="The commands were not taken fast enough.")
+    except ConnectionClosed:
+        pass
+    finally:
+        commands.close()
+
+
+def _stored_and_published_messages(
+    subscription: _MessageSubscription,
+    subscribed_at: int,
+    message_types: tuple[str, ...],
+    since: Optional[int],
+    after: Optional[EventCursor],
+) -> Iterator[list[tuple[EventCursor, dict[str, Any]]]]:
+    """Yield batches of the messages of the given types of the subscribed car or company, together
+    with their cursors.
+
+    If the `after` or the `since` is given, the messages stored in the database are yielded first.
+    Then the messages are yielded as they are published to the subscription. An empty batch is
+    yielded, if no message is published during the keep-alive period. The iteration stops, when
+    the subscription overflows or is closed.
+    """
+    # the messages published after subscribing may be read from the database too, including
+    # those with timestamps set shortly before subscribing, which were being stored at that time;
+    # only their keys are kept and only until all of them must have been published
+    sent_keys: set[EventCursor] = set()
+    replayed_at = subscribed_at
+    if after is not None or since is not None:
+        start = after.timestamp if after is not None else since
+        batches = _stream_event_rows(
+            subscription.company,
+            subscription.car_name,
+            message_types,
+            start,
+            after,
+            _streaming_batch_size,
+        )
+        try:
+            for rows in batches:
+                batch = []
+                for row in rows:
+                    key = EventCursor(row[3], row[1], row[0], row[2], row[8])
+                    if key.timestamp >= subscribed_at - _max_publishing_delay_ms:
+                        sent_keys.add(key)
+                    batch.append((key, _message_json_from_row(row[3:])))
+                yield batch
+        finally:
+            batches.close()
+        replayed_at = _timestamp()
+    while True:
+        published = subscription.take(_event_stream_keepalive_s)
+        if subscription.overflowed or subscription.closed:
+            return
+        if sent_keys and _timestamp() > replayed_at + _max_publishing_delay_ms:
+            sent_keys.clear()
+        if not published:
+            yield []
+            continue
+        batch = []
+        for car_name, sent_order, message in published:
+            key = _event_cursor(car_name, sent_order, message)
+            if key in sent_keys:
+                # each message is published once, so its key is not needed anymore
+                sent_keys.discard(key)
+            elif key.message_type in message_types:
+                batch.append((key, _message_json_from_db(message)))
+        if batch:
+            yield batch
+
+
+def _event(key: EventCursor, message_json: dict[str, Any]) -> bytes:
+    """Return the server-sent event with the message of the car."""
+    event_type = b"command" if key.message_type == MessageType.COMMAND else b"status"
+    data = _dumps({"car_name": key.car_name, "message": message_json})
+    return b"id: %s\nevent: %s\ndata: %s\n\n" % (
+        _encode_event_id(key).encode(),
+        event_type,
+        data,
+    )
+
+
+def _event_cursor(car_name: str, sent_order: int, message: MessageDB) -> EventCursor:
+    return EventCursor(
+        timestamp=message.timestamp,
+        sent_order=sent_order,
+        car_name=car_name,
+        serialized_device_id=message.serialized_device_id,
+        message_type=message.message_type,
+    )
+
+
+def _encode_event_id(cursor: EventCursor) -> str:
+    """Encode the cursor into an opaque URL-safe string."""
+    values = [
+        cursor.timestamp,
+        cursor.sent_order,
+        cursor.car_name,
+        cursor.serialized_device_id,
+        cursor.message_type,
+    ]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def _decode_event_id(event_id: Optional[str]) -> Optional[EventCursor]:
+    """Decode the cursor created by the `_encode_event_id`. Return None if the ID is invalid."""
+    if event_id is None:
+        return None
+    try:
+        timestamp, sent_order, car_name, serialized_device_id, message_type = json.loads(
+            base64.urlsafe_b64decode(event_id.encode())
+        )
+    except (ValueError, TypeError, binascii.Error):
+        return None
+    if not (
+        isinstance(timestamp, int)
+        and isinstance(sent_order, int)
+        and isinstance(car_name, str)
+        and isinstance(serialized_device_id, str)
+        and isinstance(message_type, str)
+    ):
+        return None
+    return EventCursor(timestamp, sent_order, car_name, serialized_device_id, message_type)
+
+
+def _encode_cursor(cursor: MessageCursor) -> str:
+    """Encode the cursor into an opaque URL-safe string."""
+    values = [cursor.timestamp, cursor.sent_order, cursor.serialized_device_id, cursor.message_type]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def _decode_cursor(cursor: Optional[str]) -> Optional[MessageCursor]:
+    """Decode the cursor created by the `_encode_cursor`. Return None if the cursor is invalid."""
+    if cursor is None:
+        return None
+    try:
+        timestamp, sent_order, serialized_device_id, message_type = json.loads(
+            base64.urlsafe_b64decode(cursor.encode())
+        )
+    except (ValueError, TypeError, binascii.Error):
+        return None
+    if not (
+        isinstance(timestamp, int)
+        and isinstance(sent_order, int)
+        and isinstance(serialized_device_id, str)
+        and isinstance(message_type, str)
+    ):
+        return None
+    return MessageCursor(timestamp, sent_order, serialized_device_id, message_type)
+
+
+def _message_json_from_row(row: Row) -> dict[str, Any]:
+    """Convert the row selected by the `stream_message_rows` to the JSON object of Message."""
+    timestamp, module_id, device_type, role, name, message_type, encoding, data = row
+    payload = {"message_type": message_type, "encoding": encoding, "data": data}
+    if data is None:
+        # the attributes equal to None are omitted, as by the JSONEncoder
+        del payload["data"]
+    return {
+        "timestamp": timestamp,
+        "device_id": {"module_id": module_id, "type": device_type, "role": role, "name": name},
+        "payload": payload,
+    }
+
+
+def _message_json_from_db(message_db: MessageDB) -> dict[str, Any]:
+    """Convert Message_DB to the JSON object of Message."""
+    return _message_json_from_row(
+        (
+            message_db.timestamp,
             message_db.module_id,
             message_db.device_type,
             message_db.device_role,
             message_db.device_name,
-        ),
-        payload=Payload(
-            message_type=message_db.message_type,
-            encoding=message_db.payload_encoding,
-            data=message_db.payload_data,
-        ),
+            message_db.message_type,
+            message_db.payload_encoding,
+            message_db.payload_data,
+        )
     )
 
 
@@ -596,14 +1208,29 @@ def _message_db_list(messages: list[Message]) -> list[MessageDB]:
 
 
 def _response_for_request_for_connected_cars_commands(
-    company: str, car_name: str, since: int, wait: bool
-) -> tuple[list[Message], int]:
+    company: str,
+    car_name: str,
+    since: int,
+    wait: bool,
+    limit: Optional[int] = None,
+    after: Optional[MessageCursor] = None,
+) -> (
+    Response
+    | tuple[_ListedMessages, int]
+    | tuple[list[dict[str, Any]], int, dict[str, str]]
+):
 
     car = f"car '{car_name}' of '{company}'"
-    db_commands = _list_messages(company, car_name, (MessageType.COMMAND,), since)
-    if db_commands:
-        cmds = [_message_from_db(m) for m in db_commands]
-        return _log_info_and_respond(body=cmds, code=200, log_msg=f"Commands for {car}")
+    if after is not None:
+        since = max(since, after.timestamp)
+    cmds, headers = _list_car_messages(
+        company, car_name, (MessageType.COMMAND,), since, limit, after
+    )
+    if isinstance(cmds, Response):
+        logger.info(f"Streaming commands for {car}")
+        return cmds
+    if cmds:
+        return _log_info_and_respond(cmds, 200, f"Commands for {car}", headers)
     elif wait:
         cmds = _cmd_wait_manager.wait_and_get_reponse(company, car_name)
         if cmds and cmds[-1].timestamp >= since:
@@ -633,9 +1260,13 @@ def _update_messages_timestamp(messages: Iterable[MessageDB]) -> int:
     return timestamp_now
 
 
-def _log_info_and_respond(body: Any, code: int, log_msg: str = "") -> tuple[Any, int]:
+def _log_info_and_respond(
+    body: Any, code: int, log_msg: str = "", headers: Optional[dict[str, str]] = None
+) -> tuple[Any, int] | tuple[Any, int, dict[str, str]]:
     if log_msg.strip() != "":
         logger.info(log_msg)
+    if headers:
+        return body, code, headers
     return body, code  # type: ignore
 
 
@@ -0,0 +1,76 @@
+from __future__ import annotations
+from typing import Any, Callable, TypeVar
+
+from server.fleetv2_http_api import util, typing_utils
+from server.fleetv2_http_api.models.base_model import Model
+
+
+T = TypeVar("T", bound=Model)
+_Converter = Callable[[Any], Any]
+
+
+# Functions creating a model from a dictionary, one for each model class.
+_model_deserializers: dict[type, _Converter] = dict()
+
+
+def model_deserializer(model_class: type[T]) -> Callable[[Any], T]:
+    """Return a function creating the model of the given class from the deserialized JSON.
+
+    The function behaves as the `util.deserialize_model`, including the validation done by the
+    model's setters, but the attributes, their JSON keys and the conversions of their values are
+    looked up only once, when the function is created.
+    """
+    deserializer = _model_deserializers.get(model_class)
+    if deserializer is None:
+        deserializer = _compile_model_deserializer(model_class)
+        _model_deserializers[model_class] = deserializer
+    return deserializer
+
+
+def _compile_model_deserializer(model_class: type[Model]) -> _Converter:
+    # the attribute types and names are set by the model's constructor
+    model = model_class()
+    if not model.openapi_types:
+        return lambda data: data
+
+    fields: list[tuple[str, _Converter, Callable[[Model, Any], None]]] = list()
+    for attr, attr_type in model.openapi_types.items():
+        setter = getattr(model_class, attr).fset
+        fields.append((model.attribute_map[attr], _converter(attr_type), setter))
+
+    def deserialize(data: Any) -> Model:
+        if not isinstance(data, dict):
+            return util.deserialize_model(data, model_class)
+        instance = model_class()
+        for key, convert, setter in fields:
+            if key in data:
+                value = data[key]
+                setter(instance, None if value is None else convert(value))
+        return instance
+
+    return deserialize
+
+
+def _converter(klass: Any) -> _Converter:
+    """Return a function converting a not-None value to the given type as `util._deserialize`."""
+    if klass in (int, float, str, bool, bytearray):
+
+        def convert_primitive(data: Any) -> Any:
+            try:
+                return klass(data)
+            except (UnicodeEncodeError, TypeError):
+                return data
+
+        return convert_primitive
+    elif klass == object:
+        return lambda data: data
+    elif isinstance(klass, type) and issubclass(klass, Model):
+        return model_deserializer(klass)
+    elif typing_utils.is_generic(klass) and typing_utils.is_list(klass):
+        convert_item = _converter(klass.__args__[0])
+        return lambda data: [None if item is None else convert_item(item) for item in data]
+    elif typing_utils.is_generic(klass) and typing_utils.is_dict(klass):
+        convert_value = _converter(klass.__args__[1])
+        return lambda data: {k: None if v is None else convert_value(v) for k, v in data.items()}
+    # dates and other types are rare and left to the generic deserialization
+    return lambda data: util._deserialize(data, klass)
@@ -0,0 +1,144 @@
+from __future__ import annotations
+from typing import Any, Callable
+import logging
+import random
+import threading
+import time
+
+import jwt
+import requests  # type: ignore
+
+from server.logs import LOGGER_NAME
+
+
+_logger = logging.getLogger(LOGGER_NAME)
+
+
+def keycloak_jwks_url(keycloak_url: str, realm: str) -> str:
+    """Return the URL of the JWKS endpoint of the Keycloak realm."""
+    return keycloak_url.rstrip("/") + "/realms/" + realm + "/protocol/openid-connect/certs"
+
+
+class JWKSKeyStore:
+    """Keys for verifying the JWT tokens, fetched from the JWKS endpoint and cached by their key ID.
+
+    The keys are refreshed by a background thread every `refresh_period_s`, randomly shifted by up
+    to `jitter_s`. A request for an unknown key ID only wakes the thread, at most once per
+    `min_refresh_interval_s`, so the callers never wait for the JWKS endpoint. After a failed fetch,
+    the previous keys are kept and the fetch is repeated after the `min_refresh_interval_s`.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        refresh_period_s: float = 300.0,
+        timeout_s: float = 5.0,
+        jitter_s: float = 30.0,
+        min_refresh_interval_s: float = 10.0,
+        on_keys_removed: Callable[[], None] | None = None,
+    ) -> None:
+        if refresh_period_s <= 0 or timeout_s <= 0:
+            raise ValueError(
+                "JWKS refresh period and timeout must be positive, "
+                f"got {refresh_period_s}, {timeout_s}."
+            )
+        if jitter_s < 0 or min_refresh_interval_s < 0:
+            raise ValueError(
+                "JWKS refresh jitter and minimum refresh interval must be non-negative, "
+                f"got {jitter_s}, {min_refresh_interval_s}."
+            )
+        self._url = url
+        self._refresh_period_s = refresh_period_s
+        self._timeout_s = timeout_s
+        self._jitter_s = jitter_s
+        self._min_refresh_interval_s = min_refresh_interval_s
+        self._on_keys_removed = on_keys_removed
+        self._keys: dict[str, Any] = dict()
+        self._last_fetch_s: float | None = None
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def key(self, kid: str) -> Any | None:
+        """Return the key with the key ID or None, if there is no such key.
+
+        For an unknown key ID, the keys are refreshed in the background.
+        """
+        key = self._keys.get(kid)
+        if key is None:
+            self.request_refresh()
+        return key
+
+    def kids(self) -> list[str]:
+        return list(self._keys)
+
+    def request_refresh(self) -> None:
+        """Wake the background thread to refresh the keys, unless they were fetched recently."""
+        last_fetch_s = self._last_fetch_s
+        if last_fetch_s is None or time.monotonic() - last_fetch_s >= self._min_refresh_interval_s:
+            self._wake.set()
+
+    def refresh(self) -> bool:
+        """Fetch the keys from the JWKS endpoint and return True, if succeeded.
+
+        Keys not usable for verifying the signatures are skipped. The current keys are kept,
+        if the fetch fails or no usable key is found.
+        """
+        self._last_fetch_s = time.monotonic()
+        try:
+            response = requests.get(self._url, timeout=self._timeout_s)
+            response.raise_for_status()
+            keys = _signing_keys(response.json()["keys"])
+        except Exception as e:
+            _logger.warning(f"Failed to retrieve keys from '{self._url}'. Error: {e}")
+            return False
+        if not keys:
+            _logger.warning(f"No signing key retrieved from '{self._url}'.")
+            return False
+        removed = self._keys.keys() - keys.keys()
+        self._keys = keys
+        _logger.debug(f"Retrieved {len(keys)} signing keys from '{self._url}'.")
+        if removed and self._on_keys_removed is not None:
+            self._on_keys_removed()
+        return True
+
+    def start(self) -> None:
+        """Start refreshing the keys in the background, starting immediately."""
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._refresh_periodically, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _refresh_periodically(self) -> None:
+        while not self._stopped.is_set():
+            self._wake.clear()
+            if self.refresh():
+                delay = self._refresh_period_s + random.uniform(-self._jitter_s, self._jitter_s)
+            else:
+                delay = self._min_refresh_interval_s
+            self._wake.wait(max(delay, self._min_refresh_interval_s))
+            # the refresh requested shortly after the previous one is postponed
+            assert self._last_fetch_s is not None
+            since_last_fetch = time.monotonic() - self._last_fetch_s
+            if since_last_fetch < self._min_refresh_interval_s:
+                self._stopped.wait(self._min_refresh_interval_s - since_last_fetch)
+
+
+def _signing_keys(jwks: list[dict[str, Any]]) -> dict[str, Any]:
+    keys: dict[str, Any] = dict()
+    for jwk in jwks:
+        if "kid" not in jwk or jwk.get("use", "sig") != "sig":
+            continue
+        try:
+            keys[jwk["kid"]] = jwt.PyJWK(jwk).key
+        except jwt.exceptions.PyJWTError as e:
+            _logger.debug(f"Skipping key '{jwk['kid']}'. Error: {e}")
+    return keys
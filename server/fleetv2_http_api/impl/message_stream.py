@@ -0,0 +1,151 @@
+from __future__ import annotations
+from typing import Optional, Sequence, TYPE_CHECKING
+import collections
+import threading
+
+if TYPE_CHECKING:  # pragma: no cover
+    from server.database.database_controller import MessageDB  # type: ignore
+
+
+# A message published to the subscribers: the car name, the position of the message in the request
+# it was sent in (its 'sent_order') and the message.
+PublishedMessage = tuple[str, int, "MessageDB"]
+
+
+class MessageStreamManager:
+    """Publishes the messages sent to the cars to the subscribed event streams.
+
+    The subscriptions are kept by the company and car name, or by the company only, if the car
+    name is None. Each subscription queues at most `max_queued_messages` messages; when it would
+    exceed the limit, the queued messages are dropped and the subscription is marked as overflowed,
+    so that the stream is closed and resumed by the client from the last received message.
+    """
+
+    _default_max_queued_messages: int = 10000
+
+    def __init__(self, max_queued_messages: int = _default_max_queued_messages) -> None:
+        MessageStreamManager._check_positive_max_queued_messages(max_queued_messages)
+        self._max_queued_messages = max_queued_messages
+        self._lock = threading.Lock()
+        self._subscriptions: dict[tuple[str, Optional[str]], dict[MessageSubscription, None]] = (
+            dict()
+        )
+
+    def set_max_queued_messages(self, max_queued_messages: int) -> None:
+        """Set the maximum number of messages queued by the new subscriptions."""
+        self._check_positive_max_queued_messages(max_queued_messages)
+        self._max_queued_messages = max_queued_messages
+
+    def subscribe(self, company: str, car: Optional[str]) -> MessageSubscription:
+        """Subscribe to the messages of the car, or of any car of the company, if car is None."""
+        subscription = MessageSubscription(company, car, self._max_queued_messages)
+        with self._lock:
+            self._subscriptions.setdefault((company, car), dict())[subscription] = None
+        return subscription
+
+    def unsubscribe(self, subscription: MessageSubscription) -> None:
+        """Stop publishing to the subscription and close it, waking up the waiting `take`."""
+        subscription.close()
+        key = (subscription.company, subscription.car_name)
+        with self._lock:
+            subscriptions = self._subscriptions.get(key)
+            if subscriptions is not None:
+                subscriptions.pop(subscription, None)
+                if not subscriptions:
+                    self._subscriptions.pop(key)
+
+    def publish(self, company: str, car: str, messages: Sequence[MessageDB]) -> None:
+        """Queue the messages sent in a single request for all the subscriptions of the car
+        and of its company."""
+        with self._lock:
+            subscriptions = [
+                subscription
+                for key in ((company, car), (company, None))
+                for subscription in self._subscriptions.get(key, ())
+            ]
+        if not subscriptions:
+            return
+        published = [(car, order, message) for order, message in enumerate(messages)]
+        for subscription in subscriptions:
+            subscription.put(published)
+
+    def n_subscriptions(self) -> int:
+        with self._lock:
+            return sum(len(subscriptions) for subscriptions in self._subscriptions.values())
+
+    @staticmethod
+    def _check_positive_max_queued_messages(max_queued_messages: int) -> None:
+        if max_queued_messages <= 0:
+            raise ValueError(
+                f"Maximum number of queued messages must be positive, got {max_queued_messages}."
+            )
+
+
+class MessageSubscription:
+    """A queue of the messages published for a car or a company, until they are taken."""
+
+    __slots__ = (
+        "_company",
+        "_car_name",
+        "_max_queued_messages",
+        "_queue",
+        "_condition",
+        "_overflowed",
+        "_closed",
+    )
+
+    def __init__(self, company: str, car: Optional[str], max_queued_messages: int) -> None:
+        self._company = company
+        self._car_name = car
+        self._max_queued_messages = max_queued_messages
+        self._queue: collections.deque[PublishedMessage] = collections.deque()
+        self._condition = threading.Condition()
+        self._overflowed = False
+        self._closed = False
+
+    @property
+    def company(self) -> str:
+        return self._company
+
+    @property
+    def car_name(self) -> Optional[str]:
+        return self._car_name
+
+    @property
+    def overflowed(self) -> bool:
+        return self._overflowed
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def close(self) -> None:
+        with self._condition:
+            self._closed = True
+            self._queue.clear()
+            self._condition.notify_all()
+
+    def put(self, messages: list[PublishedMessage]) -> None:
+        with self._condition:
+            if self._overflowed or self._closed:
+                return
+            if len(self._queue) + len(messages) > self._max_queued_messages:
+                self._overflowed = True
+                self._queue.clear()
+            else:
+                self._queue.extend(messages)
+            self._condition.notify_all()
+
+    def take(self, timeout_s: float) -> list[PublishedMessage]:
+        """Return all the queued messages, waiting at most `timeout_s` for some to be published.
+
+        An empty list is returned after the timeout or if the subscription has overflowed
+        or has been closed.
+        """
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self._queue or self._overflowed or self._closed, timeout=timeout_s
+            )
+            messages = list(self._queue)
+            self._queue.clear()
+            return messages
@@ -1,4 +1,5 @@
 from __future__ import annotations
+from typing import Iterable, Optional
 import time
 import threading
 
@@ -7,13 +8,26 @@ from server.database.time import timestamp as _timestamp  # type: ignore
 
 
 class MessageWaitObjManager:
+    """Manages the wait objects waiting for messages of a given car.
+
+    The wait objects are split into stripes by the company and car name, each stripe protected
+    by its own lock, so that the requests for different cars do not compete for a single lock.
+
+    A single wait object of the `MultiCarWaitObj` can wait for messages of any of multiple cars.
+    It is queued for each of the cars, or for the whole company, if the car name is None.
+    """
 
     _default_timeout_ms: int = 5000
+    _default_n_stripes: int = 64
 
-    def __init__(self, timeout_ms: int = _default_timeout_ms) -> None:
+    def __init__(
+        self, timeout_ms: int = _default_timeout_ms, n_stripes: int = _default_n_stripes
+    ) -> None:
         MessageWaitObjManager._check_nonnegative_timeout(timeout_ms)
+        if n_stripes <= 0:
+            raise ValueError(f"Number of stripes must be positive, got {n_stripes}.")
         self._timeout_ms = timeout_ms
-        self._wait_dict: dict[str, dict[str, list[MessageWaitObj]]] = dict()
+        self._stripes = tuple(_WaitStripe() for _ in range(n_stripes))
 
     @property
     def timeout_ms(self) -> int:
@@ -22,35 +36,54 @@ class MessageWaitObjManager:
     def add_response_content_and_stop_waiting(
         self, company: str, car: str, reponse_content: list[Message]
     ) -> None:
-        """Make the next wait object in the queue to respond with specified 'reponse_content' and remove it from the queue."""
-        wait_objs = self._get_wait_objects_for_given_car(company, car)
-        if wait_objs:
-            self._send_content_to_all_wait_objs(wait_objs, reponse_content)
-            self._remove_wait_obj_list(company, car)
+        """Make all wait objects for given company and car respond with specified 'reponse_content' and remove them from the queue."""
+        for key in ((company, car), (company, None)):
+            stripe = self._stripe(*key)
+            with stripe.lock:
+                wait_objs = stripe.wait_objs.pop(key, None)
+            if wait_objs:
+                self._send_content_to_all_wait_objs(wait_objs, company, car, reponse_content)
 
     def new_wait_obj(self, company: str, car_name: str) -> MessageWaitObj:
         """Create a new wait object and adds it to the wait queue for given company and car."""
         wait_obj = MessageWaitObj(company, car_name, self._timeout_ms)
+        stripe = self._stripe(company, car_name)
+        with stripe.lock:
+            stripe.wait_objs.setdefault((company, car_name), dict())[wait_obj] = None
+        return wait_obj
 
-        if company not in self._wait_dict:
-            self._wait_dict[company] = dict()
-        if car_name not in self._wait_dict[company]:
-            self._wait_dict[company][car_name] = list()
-
-        self._wait_dict[company][car_name].append(wait_obj)
+    def new_multi_car_wait_obj(self, cars: Iterable[tuple[str, Optional[str]]]) -> MultiCarWaitObj:
+        """Create a new wait object and add it to the wait queues for the given company and car
+        pairs. If the car name is None, the wait object is added to the queue for the company."""
+        wait_obj = MultiCarWaitObj(cars, self._timeout_ms)
+        for key in wait_obj.cars:
+            stripe = self._stripe(*key)
+            with stripe.lock:
+                stripe.wait_objs.setdefault(key, dict())[wait_obj] = None
         return wait_obj
 
-    def remove_wait_obj(self, wait_obj: MessageWaitObj) -> None:
+    def remove_wait_obj(self, wait_obj: MessageWaitObj | MultiCarWaitObj) -> None:
         """Remove the wait object from the wait queue."""
-        company, car = wait_obj.company, wait_obj.car_name
-        if company in self._wait_dict:
-            if car in self._wait_dict[company]:
-                if wait_obj in self._wait_dict[company][car]:
-                    self._wait_dict[company][car].remove(wait_obj)
-                if not self._wait_dict[company][car]:
-                    self._wait_dict[company].pop(car)
-            if not self._wait_dict[company]:
-                self._wait_dict.pop(company)
+        if isinstance(wait_obj, MultiCarWaitObj):
+            keys: tuple[tuple[str, Optional[str]], ...] = wait_obj.cars
+        else:
+            keys = ((wait_obj.company, wait_obj.car_name),)
+        for key in keys:
+            stripe = self._stripe(*key)
+            with stripe.lock:
+                wait_objs = stripe.wait_objs.get(key)
+                if wait_objs is not None:
+                    wait_objs.pop(wait_obj, None)
+                    if not wait_objs:
+                        stripe.wait_objs.pop(key)
+
+    def n_waiting(self) -> int:
+        """Return the number of wait objects in all the wait queues."""
+        n = 0
+        for stripe in self._stripes:
+            with stripe.lock:
+                n += sum(len(wait_objs) for wait_objs in stripe.wait_objs.values())
+        return n
 
     def set_timeout(self, timeout_ms: int) -> None:
         """Set the timeout for wait objects in milliseconds."""
@@ -61,29 +94,47 @@ class MessageWaitObjManager:
         """Wait for the next wait object in queue to respond and returns the response content.
         The queue is identified by given company and car."""
         wait_obj = self.new_wait_obj(company, car_name)
-        msgs = wait_obj.wait_and_get_response()
-        self.remove_wait_obj(wait_obj)
+        try:
+            msgs = wait_obj.wait_and_get_response()
+        finally:
+            self.remove_wait_obj(wait_obj)
         for msg in msgs:
             if msg.timestamp is None:
                 msg.timestamp = _timestamp()
 
         return msgs
 
+    def wait_for_cars_and_get_response(
+        self, cars: Iterable[tuple[str, Optional[str]]]
+    ) -> dict[tuple[str, str], list[Message]]:
+        """Wait until any of the cars receives messages and return the messages by the company
+        and car name of the cars. If the car name is None, any car of the company is waited for."""
+        wait_obj = self.new_multi_car_wait_obj(cars)
+        try:
+            msgs_by_car = wait_obj.wait_and_get_response()
+        finally:
+            self.remove_wait_obj(wait_obj)
+        for msgs in msgs_by_car.values():
+            for msg in msgs:
+                if msg.timestamp is None:
+                    msg.timestamp = _timestamp()
+        return msgs_by_car
+
     def _send_content_to_all_wait_objs(
-        self, wait_objs: list[MessageWaitObj], reponse_content: list[Message]
+        self,
+        wait_objs: dict[MessageWaitObj | MultiCarWaitObj, None],
+        company: str,
+        car: str,
+        reponse_content: list[Message],
     ) -> None:
         for wait_obj in wait_objs:
-            wait_obj.add_reponse_content_and_stop_waiting(reponse_content)
+            if isinstance(wait_obj, MultiCarWaitObj):
+                wait_obj.add_car_response_content_and_stop_waiting(company, car, reponse_content)
+            else:
+                wait_obj.add_reponse_content_and_stop_waiting(reponse_content)
 
-    def _get_wait_objects_for_given_car(self, company: str, car: str) -> list[MessageWaitObj]:
-        if company in self._wait_dict and car in self._wait_dict[company]:
-            return self._wait_dict[company][car]
-        return list()
-
-    def _remove_wait_obj_list(self, company: str, car: str) -> None:
-        self._wait_dict[company].pop(car)
-        if not self._wait_dict[company]:
-            self._wait_dict.pop(company)
+    def _stripe(self, company: str, car: Optional[str]) -> _WaitStripe:
+        return self._stripes[hash((company, car)) % len(self._stripes)]
 
     @staticmethod
     def _check_nonnegative_timeout(timeout_ms: int) -> None:
@@ -91,13 +142,32 @@ class MessageWaitObjManager:
             raise ValueError(f"Timeout must be non-negative, got {timeout_ms}.")
 
 
+class _WaitStripe:
+    """Wait queues of a subset of cars. The queues are dictionaries used as ordered sets."""
+
+    __slots__ = ("lock", "wait_objs")
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.wait_objs: dict[
+            tuple[str, Optional[str]], dict[MessageWaitObj | MultiCarWaitObj, None]
+        ] = dict()
+
+
 class MessageWaitObj:
+    """A wait object that waits for a response to be set and then returns it.
+
+    The response set before the waiting has started is not lost; the waiting then ends immediately.
+    """
+
+    __slots__ = ("_company", "_car_name", "_response_content", "_timeout_ms", "_responded")
+
     def __init__(self, company: str, car: str, timeout_ms: int) -> None:
         self._company = company
         self._car_name = car
         self._response_content: list[Message] = list()
         self._timeout_ms = timeout_ms
-        self._condition = threading.Condition()
+        self._responded = threading.Event()
 
     @property
     def company(self) -> str:
@@ -108,17 +178,51 @@ class MessageWaitObj:
         return self._car_name
 
     def add_reponse_content_and_stop_waiting(self, content: list[Message]) -> None:
+        """Set the response content of this wait object and stop waiting."""
         self._response_content = content.copy()
-        with self._condition:
-            self._condition.notify()
+        self._responded.set()
 
     def wait_and_get_response(self) -> list[Message]:
         """Wait for the response object to be set and then return it."""
-        with self._condition:
-            self._condition.wait(timeout=self._timeout_ms / 1000)
+        self._responded.wait(timeout=self._timeout_ms / 1000)
         return self._response_content
 
     @staticmethod
     def timestamp() -> int:
         """Unix timestamp in milliseconds."""
         return int(time.time() * 1000)
+
+
+class MultiCarWaitObj:
+    """A wait object waiting for messages of any of multiple cars.
+
+    The waiting ends with the first messages received. The messages received by other cars
+    before the wait object is removed from the queues are added to the response.
+    """
+
+    __slots__ = ("_cars", "_response_content", "_timeout_ms", "_responded", "_lock")
+
+    def __init__(self, cars: Iterable[tuple[str, Optional[str]]], timeout_ms: int) -> None:
+        self._cars = tuple(dict.fromkeys(cars))
+        self._response_content: dict[tuple[str, str], list[Message]] = dict()
+        self._timeout_ms = timeout_ms
+        self._responded = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def cars(self) -> tuple[tuple[str, Optional[str]], ...]:
+        return self._cars
+
+    def add_car_response_content_and_stop_waiting(
+        self, company: str, car: str, content: list[Message]
+    ) -> None:
+        """Add the messages of the car to the response content and stop waiting."""
+        with self._lock:
+            self._response_content.setdefault((company, car), []).extend(content)
+        self._responded.set()
+
+    def wait_and_get_response(self) -> dict[tuple[str, str], list[Message]]:
+        """Wait for the response content to be set and then return a copy of it."""
+        self._responded.wait(timeout=self._timeout_ms / 1000)
+        with self._lock:
+            return {car: msgs.copy() for car, msgs in self._response_content.items()}
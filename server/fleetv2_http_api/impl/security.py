@@ -34,6 +34,10 @@ class SecurityConfig(pydantic.BaseModel):
     client_secret_key: str
     scope: str
     realm: str
+    verified_token_cache_size: pydantic.NonNegativeInt = 1000
+    jwks_refresh_period_in_seconds: pydantic.PositiveFloat = 300
+    jwks_refresh_jitter_in_seconds: pydantic.NonNegativeFloat = 30
+    jwks_timeout_in_seconds: pydantic.PositiveFloat = 5
 
 
 class SecurityObj(abc.ABC):
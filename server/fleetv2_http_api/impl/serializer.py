@@ -0,0 +1,98 @@
+from __future__ import annotations
+from typing import Any, Callable
+import json
+
+import orjson
+
+from server.fleetv2_http_api.encoder import JSONEncoder
+from server.fleetv2_http_api.models.base_model import Model
+
+# import all the models, so that their encoders are compiled at startup
+import server.fleetv2_http_api.models  # noqa: F401
+
+
+# Functions converting a model to a dictionary, one for each model class.
+_ModelEncoder = Callable[[Model], dict[str, Any]]
+_model_encoders: dict[type, _ModelEncoder] = dict()
+
+
+def _compile_model_encoder(model_class: type[Model]) -> _ModelEncoder:
+    """Return a function converting the model of the given class to a dictionary.
+
+    The attributes, their JSON keys and the encoders of the nested models are looked up only once.
+    The attributes equal to None are omitted, as by the `JSONEncoder`.
+    """
+    # the attribute types and names are set by the model's constructor
+    model = model_class()
+    fields: list[tuple[str, str, _ModelEncoder | None, type | None]] = list()
+    for attr, attr_type in model.openapi_types.items():
+        if isinstance(attr_type, type) and issubclass(attr_type, Model):
+            fields.append((attr, model.attribute_map[attr], _model_encoder(attr_type), attr_type))
+        else:
+            fields.append((attr, model.attribute_map[attr], None, None))
+
+    def encode(o: Model) -> dict[str, Any]:
+        dikt = {}
+        for attr, key, nested_encoder, nested_class in fields:
+            value = getattr(o, attr)
+            if value is None:
+                continue
+            # the value not matching the declared type (e.g., payload data) is left to `default`
+            if nested_encoder is not None and value.__class__ is nested_class:
+                value = nested_encoder(value)
+            dikt[key] = value
+        return dikt
+
+    return encode
+
+
+def _model_encoder(model_class: type[Model]) -> _ModelEncoder:
+    encoder = _model_encoders.get(model_class)
+    if encoder is None:
+        encoder = _compile_model_encoder(model_class)
+        _model_encoders[model_class] = encoder
+    return encoder
+
+
+def _default(o: Any) -> Any:
+    """Convert objects not supported by orjson to supported ones."""
+    if isinstance(o, Model):
+        return _model_encoder(o.__class__)(o)
+    return JSONEncoder().default(o)
+
+
+def dumps(o: Any, indent: bool = False, sort_keys: bool = False) -> bytes:
+    """Serialize the object, possibly containing the models, to JSON encoded as UTF-8 bytes.
+
+    The object that cannot be serialized by orjson (e.g., containing an integer exceeding 64 bits)
+    is serialized by the `JSONEncoder`.
+    """
+    # the dates are formatted by the Flask's encoder, the same way as by the `JSONEncoder`
+    option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+    if indent:
+        option |= orjson.OPT_INDENT_2
+    if sort_keys:
+        option |= orjson.OPT_SORT_KEYS
+    try:
+        return orjson.dumps(o, default=_default, option=option)
+    except orjson.JSONEncodeError:
+        indent_size = 2 if indent else None
+        return json.dumps(
+            o, cls=JSONEncoder, ensure_ascii=False, indent=indent_size, sort_keys=sort_keys
+        ).encode()
+
+
+class FastJSONEncoder(JSONEncoder):
+    """Drop-in replacement of the `JSONEncoder` serializing the responses with orjson.
+
+    Non-ASCII characters are written as UTF-8 instead of being escaped.
+    """
+
+    def encode(self, o: Any) -> str:
+        if self.indent not in (None, 2) or self.skipkeys:
+            return super().encode(o)
+        return dumps(o, indent=self.indent == 2, sort_keys=self.sort_keys).decode()
+
+
+for _model_class in Model.__subclasses__():
+    _model_encoder(_model_class)
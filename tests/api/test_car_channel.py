@@ -0,0 +1,246 @@
+import os
+import sys
+import json
+import queue
+import threading
+import unittest
+from unittest.mock import patch, Mock
+
+sys.path.append(".")
+
+import flask
+from connexion.spec import Specification  # type: ignore
+from simple_websocket import ConnectionClosed  # type: ignore
+
+from server.enums import MessageType, EncodingType  # type: ignore
+from server.database.cache import clear_connected_cars  # type: ignore
+from server.database.database_controller import (  # type: ignore
+    send_messages_to_database,
+    set_test_db_connection,
+)
+from server.fleetv2_http_api.impl.controllers import (  # type: ignore
+    CAR_CHANNEL_PATH,
+    authorize_car_channel,
+    car_channel,
+    send_commands,
+    list_statuses,
+    set_car_channel_schema,
+    set_event_stream_params,
+    _max_publishing_delay_ms,
+    _message_db_list,
+    _message_stream_manager,
+    _push_commands,
+    _stored_and_published_messages,
+)
+from server.fleetv2_http_api.impl.message_stream import MessageStreamManager  # type: ignore
+from server.fleetv2_http_api.models import DeviceId, Payload, Message  # type: ignore
+from tests._utils.logs import clear_logs  # type: ignore
+
+
+def _statuses_schema() -> dict:
+    spec = Specification.load("server/fleetv2_http_api/openapi/openapi.yaml")
+    request_body = spec["paths"]["/status/{company_name}/{car_name}"]["post"]["requestBody"]
+    return request_body["content"]["application/json"]["schema"]
+
+
+_STATUSES_SCHEMA = _statuses_schema()
+
+
+class _WebSocket:
+    """WebSocket connection with the messages received from the car put into the `incoming`
+    and the messages sent to the car taken from the `outgoing`."""
+
+    def __init__(self) -> None:
+        self.incoming: queue.Queue = queue.Queue()
+        self.outgoing: queue.Queue = queue.Queue()
+        self.close_reason: int | None = None
+
+    def receive(self) -> str:
+        data = self.incoming.get()
+        if data is None:
+            raise ConnectionClosed()
+        return data
+
+    def send(self, data: str) -> None:
+        self.outgoing.put(json.loads(data))
+
+    def close(self, reason: int | None = None, message: str | None = None) -> None:
+        self.close_reason = reason
+        self.incoming.put(None)
+
+
+class Test_Authorizing_Car_Channel(unittest.TestCase):
+    def setUp(self) -> None:
+        clear_logs()
+        self.app = flask.Flask(__name__)
+        self.app.add_url_rule(CAR_CHANNEL_PATH, view_func=lambda **kwargs: "")
+
+    @patch("server.fleetv2_http_api.impl.controllers._info_from_request")
+    def test_authenticated_request_is_accepted(self, mock_info: Mock):
+        mock_info.return_value = {"id": 1, "name": "admin"}
+        with self.app.test_request_context("/channel/company/car"):
+            self.assertIsNone(authorize_car_channel())
+
+    @patch("server.fleetv2_http_api.impl.controllers._info_from_request")
+    def test_not_authenticated_request_is_rejected(self, mock_info: Mock):
+        mock_info.return_value = None
+        with self.app.test_request_context("/channel/company/car"):
+            self.assertEqual(authorize_car_channel()[1], 401)
+
+    @patch("server.fleetv2_http_api.impl.controllers._info_from_request")
+    def test_request_with_invalid_car_name_is_rejected(self, mock_info: Mock):
+        mock_info.return_value = {"id": 1, "name": "admin"}
+        with self.app.test_request_context("/channel/company/Car"):
+            self.assertEqual(authorize_car_channel()[1], 400)
+
+
+class Test_Exchanging_Messages_Over_Car_Channel(unittest.TestCase):
+    def setUp(self) -> None:
+        clear_logs()
+        clear_connected_cars()
+        if os.path.exists("./example.db"):
+            os.remove("./example.db")
+        set_test_db_connection("/example.db")
+        set_event_stream_params(keepalive_s=0.01, max_queued_messages=100)
+        set_car_channel_schema(_STATUSES_SCHEMA)
+        self.device_id = DeviceId(module_id=2, type=5, role="test_device", name="Test Device")
+        self.app = flask.Flask(__name__)
+        self.channels: list[tuple[_WebSocket, threading.Thread]] = []
+
+    def _open(self, query: str = "") -> _WebSocket:
+        ws = _WebSocket()
+
+        def run_channel() -> None:
+            with self.app.test_request_context("/channel/company/car?" + query):
+                try:
+                    car_channel(ws, "company", "car")
+                except ConnectionClosed:
+                    pass
+
+        thread = threading.Thread(target=run_channel)
+        thread.start()
+        self.channels.append((ws, thread))
+        return ws
+
+    def _message(self, message_type: str) -> dict:
+        return {
+            "device_id": self.device_id.to_dict(),
+            "payload": {"message_type": message_type, "encoding": EncodingType.JSON, "data": {}},
+        }
+
+    def _send_command(self) -> None:
+        payload = Payload(message_type=MessageType.COMMAND, encoding=EncodingType.JSON, data={})
+        send_commands("company", "car", [Message(device_id=self.device_id, payload=payload)])
+
+    def test_statuses_are_stored_and_answered(self):
+        ws = self._open()
+        ws.incoming.put(json.dumps([self._message(MessageType.STATUS)]))
+        response = ws.outgoing.get(timeout=2)
+        self.assertEqual(response["type"], "status_response")
+        self.assertEqual(response["code"], 200)
+        statuses, code = list_statuses("company", "car")
+        self.assertEqual(code, 200)
+        self.assertEqual(len(statuses), 1)
+
+    def test_invalid_statuses_are_rejected(self):
+        ws = self._open()
+        ws.incoming.put("not a json")
+        ws.incoming.put(json.dumps([{"device_id": self.device_id.to_dict()}]))
+        ws.incoming.put(json.dumps([self._message(MessageType.COMMAND)]))
+        self.assertEqual([ws.outgoing.get(timeout=2)["code"] for _ in range(3)], [400, 400, 400])
+        self.assertEqual(list_statuses("company", "car")[1], 404)
+
+    def test_sent_commands_are_pushed_to_the_car(self):
+        ws = self._open()
+        ws.incoming.put(json.dumps([self._message(MessageType.STATUS)]))
+        ws.outgoing.get(timeout=2)
+        self._send_command()
+        pushed = ws.outgoing.get(timeout=2)
+        self.assertEqual(pushed["type"], "commands")
+        self.assertEqual(
+            [c["payload"]["message_type"] for c in pushed["messages"]], [MessageType.COMMAND]
+        )
+
+    def test_stored_commands_are_pushed_first_if_since_is_given(self):
+        ws = self._open()
+        ws.incoming.put(json.dumps([self._message(MessageType.STATUS)]))
+        ws.outgoing.get(timeout=2)
+        self._send_command()
+        ws.outgoing.get(timeout=2)
+        resumed = self._open("since=0")
+        pushed = resumed.outgoing.get(timeout=2)
+        self.assertEqual(pushed["type"], "commands")
+        self.assertEqual(len(pushed["messages"]), 1)
+        self.assertTrue(resumed.outgoing.empty())
+
+    def test_channel_not_taking_commands_is_closed(self):
+        manager = MessageStreamManager(max_queued_messages=1)
+        subscription = manager.subscribe("company", "car")
+        payload = Payload(message_type=MessageType.COMMAND, encoding=EncodingType.JSON, data={})
+        commands = _message_db_list([Message(device_id=self.device_id, payload=payload)] * 2)
+        manager.publish("company", "car", commands)
+        ws = _WebSocket()
+        _push_commands(ws, threading.Lock(), subscription, 0, None)
+        self.assertEqual(ws.close_reason, 1013)
+        self.assertTrue(ws.outgoing.empty())
+
+    @patch("server.fleetv2_http_api.impl.controllers.send_statuses")
+    def test_statuses_not_stored_due_to_inaccessible_database_are_answered(self, mock_send: Mock):
+        mock_send.return_value = None
+        ws = self._open()
+        ws.incoming.put(json.dumps([self._message(MessageType.STATUS)]))
+        response = ws.outgoing.get(timeout=2)
+        self.assertEqual(response["type"], "status_response")
+        self.assertEqual(response["code"], 503)
+
+    def test_pushing_commands_stops_when_channel_is_closed(self):
+        set_event_stream_params(keepalive_s=10, max_queued_messages=100)
+        manager = MessageStreamManager()
+        subscription = manager.subscribe("company", "car")
+        ws = _WebSocket()
+        pusher = threading.Thread(
+            target=_push_commands, args=(ws, threading.Lock(), subscription, 0, None)
+        )
+        pusher.start()
+        manager.unsubscribe(subscription)
+        pusher.join(timeout=2)
+        self.assertFalse(pusher.is_alive())
+        self.assertIsNone(ws.close_reason)
+
+    def test_replaying_old_commands_keeps_no_keys_of_them(self):
+        payload = Payload(message_type=MessageType.COMMAND, encoding=EncodingType.JSON, data={})
+        commands = _message_db_list([Message(device_id=self.device_id, payload=payload)])
+        for timestamp in range(0, 3000, 10):
+            commands[0].timestamp = timestamp
+            send_messages_to_database("company", "car", *commands)
+        subscription = _message_stream_manager.subscribe("company", "car")
+        pushed = _stored_and_published_messages(
+            subscription, 3000 + _max_publishing_delay_ms, (MessageType.COMMAND,), 0, None
+        )
+        try:
+            self.assertEqual(len(next(pushed)), 300)
+            self.assertEqual(len(pushed.gi_frame.f_locals["sent_keys"]), 0)
+        finally:
+            pushed.close()
+            _message_stream_manager.unsubscribe(subscription)
+
+    def test_closed_channel_is_unsubscribed(self):
+        ws = self._open()
+        ws.incoming.put(json.dumps([self._message(MessageType.STATUS)]))
+        ws.outgoing.get(timeout=2)
+        self.assertEqual(_message_stream_manager.n_subscriptions(), 1)
+        ws.incoming.put(None)
+        self.channels[-1][1].join(timeout=2)
+        self.assertEqual(_message_stream_manager.n_subscriptions(), 0)
+
+    def tearDown(self) -> None:
+        for ws, thread in self.channels:
+            ws.incoming.put(None)
+            thread.join(timeout=2)
+        set_event_stream_params(keepalive_s=15, max_queued_messages=10000)
+        if os.path.exists("./example.db"):
+            os.remove("./example.db")
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -1,3 +1,4 @@
+import json
 import os
 import sys
 import unittest
@@ -5,27 +6,37 @@ from unittest.mock import patch, Mock
 
 sys.path.append(".")
 
-from sqlalchemy import insert
+from flask import Response
+from sqlalchemy import insert, delete
+from sqlalchemy.exc import OperationalError
 
 from server.enums import MessageType, EncodingType  # type: ignore
 from server.database.cache import clear_connected_cars, serialized_device_id  # type: ignore
+from server.database.message_buffer import set_buffer_size  # type: ignore
 from server.database.connection import get_connection_source  # type: ignore
+import server.database.connection as connection  # type: ignore
+import server.fleetv2_http_api.impl.controllers as controllers  # type: ignore
 from server.database.database_controller import (  # type: ignore
     set_test_db_connection,
     MessageBase,
     remove_old_messages,
     future_command_warning,
     get_available_devices_from_database,
+    _message_rows,
 )
 from server.fleetv2_http_api.impl.controllers import (  # type: ignore
+    NEXT_CURSOR_HEADER,
     available_devices,
     available_cars,
     send_statuses,
     send_commands,
     list_statuses,
+    list_company_statuses,
     list_commands,
     _message_db_list,
+    set_streaming_batch_size,
 )
+from server.fleetv2_http_api.encoder import JSONEncoder  # type: ignore
 from server.fleetv2_http_api.models import DeviceId, Payload, Message, Module, Car  # type: ignore
 from tests._utils.logs import clear_logs  # type: ignore
 
@@ -70,17 +81,17 @@ class Test_Sending_Status(unittest.TestCase):
         )
         clear_connected_cars()
 
-    def test_convert_status_to_messagebase_preserves_device_name(self):
+    def test_convert_status_to_message_row_preserves_device_name(self):
         msg_db_list = _message_db_list([self.status_example])
         msg_db = msg_db_list[0]
         self.assertEqual(msg_db.device_name, self.status_example.device_id.name)
-        msg_base = MessageBase.from_message("test_company", "test_car", msg_db)
-        self.assertEqual(msg_base.device_name, self.status_example.device_id.name)
+        row = _message_rows("test_company", "test_car", msg_db_list)[0]
+        self.assertEqual(row["device_name"], self.status_example.device_id.name)
 
     def test_status_sent_to_and_retrieved_from_database_has_unchanged_attributes(self):
         send_statuses("test_company", "test_car", body=[self.status_example])
         status = list_statuses("test_company", "test_car")[0][0]
-        self.assertEqual(status.device_id.name, self.status_example.device_id.name)
+        self.assertEqual(status["device_id"]["name"], self.status_example.device_id.name)
 
 
 class Test_Sending_Status_Error(unittest.TestCase):
@@ -99,17 +110,17 @@ class Test_Sending_Status_Error(unittest.TestCase):
         )
         clear_connected_cars()
 
-    def test_convert_status_error_to_messagebase_preserves_device_name(self):
+    def test_convert_status_error_to_message_row_preserves_device_name(self):
         msg_db_list = _message_db_list([self.status_error])
         msg_db = msg_db_list[0]
         self.assertEqual(msg_db.device_name, self.status_error.device_id.name)
-        msg_base = MessageBase.from_message("test_company", "test_car", msg_db)
-        self.assertEqual(msg_base.device_name, self.status_error.device_id.name)
+        row = _message_rows("test_company", "test_car", msg_db_list)[0]
+        self.assertEqual(row["device_name"], self.status_error.device_id.name)
 
     def test_status_error_sent_to_and_retrieved_from_database_has_unchanged_attributes(self):
         send_statuses("test_company", "test_car", body=[self.status_error])
         status_error = list_statuses("test_company", "test_car")[0][0]
-        self.assertEqual(status_error.device_id.name, self.status_error.device_id.name)
+        self.assertEqual(status_error["device_id"]["name"], self.status_error.device_id.name)
 
     def test_status_and_status_error_can_be_send_and_returned_from_common_endpoint(self):
         status_payload = Payload(
@@ -122,12 +133,12 @@ class Test_Sending_Status_Error(unittest.TestCase):
         statuses, code = list_statuses("test_company", "test_car")
         self.assertEqual(code, 200)
         self.assertEqual(len(statuses), 2)
-        self.assertEqual(statuses[0].device_id.name, self.device_id.name)
-        self.assertEqual(statuses[1].device_id.name, self.device_id.name)
-        self.assertEqual(statuses[0].payload.data["message"], "Device is running")
-        self.assertEqual(statuses[1].payload.data["message"], "Device was not running")
-        self.assertEqual(statuses[0].payload.message_type, MessageType.STATUS)
-        self.assertEqual(statuses[1].payload.message_type, MessageType.STATUS_ERROR)
+        self.assertEqual(statuses[0]["device_id"]["name"], self.device_id.name)
+        self.assertEqual(statuses[1]["device_id"]["name"], self.device_id.name)
+        self.assertEqual(statuses[0]["payload"]["data"]["message"], "Device is running")
+        self.assertEqual(statuses[1]["payload"]["data"]["message"], "Device was not running")
+        self.assertEqual(statuses[0]["payload"]["message_type"], MessageType.STATUS)
+        self.assertEqual(statuses[1]["payload"]["message_type"], MessageType.STATUS_ERROR)
 
 
 class Test_Listing_Available_Devices_And_Cars(unittest.TestCase):
@@ -257,10 +268,10 @@ class Test_Sending_And_listing_Multiple_Messages(unittest.TestCase):
         self.assertEqual(len(statuses), 1)
         self.assertEqual(code, 200)
         status = statuses[0]
-        self.assertEqual(status.device_id.module_id, self.status_example.device_id.module_id)
-        self.assertEqual(status.device_id.type, self.status_example.device_id.type)
-        self.assertEqual(status.device_id.role, self.status_example.device_id.role)
-        self.assertEqual(status.payload, self.status_example.payload)
+        self.assertEqual(status["device_id"]["module_id"], self.status_example.device_id.module_id)
+        self.assertEqual(status["device_id"]["type"], self.status_example.device_id.type)
+        self.assertEqual(status["device_id"]["role"], self.status_example.device_id.role)
+        self.assertEqual(status["payload"], self.status_example.payload.to_dict())
 
     def test_sending_empty_list_of_statuses_does_not_affect_list_of_statuses_returned_from_database(
         self,
@@ -278,10 +289,10 @@ class Test_Sending_And_listing_Multiple_Messages(unittest.TestCase):
         self.assertEqual(code, 200)
         self.assertEqual(len(commands), 1)
         cmd = commands[0]
-        self.assertEqual(cmd.device_id.module_id, self.command_example.device_id.module_id)
-        self.assertEqual(cmd.device_id.type, self.command_example.device_id.type)
-        self.assertEqual(cmd.device_id.role, self.command_example.device_id.role)
-        self.assertEqual(cmd.payload, self.command_example.payload)
+        self.assertEqual(cmd["device_id"]["module_id"], self.command_example.device_id.module_id)
+        self.assertEqual(cmd["device_id"]["type"], self.command_example.device_id.type)
+        self.assertEqual(cmd["device_id"]["role"], self.command_example.device_id.role)
+        self.assertEqual(cmd["payload"], self.command_example.payload.to_dict())
 
     def test_sending_commands_to_unavailable_module_car_or_company_returns_code_404(self) -> None:
         send_statuses(company_name="test_company", car_name="test_car", body=[self.status_example])
@@ -346,7 +357,7 @@ class Test_Timestamp_Of_A_Sent_Message_Is_Set_To_Time_Of_Its_Sending(unittest.Te
         mock_time_ms.return_value = 25
         send_statuses("test_company", "test_car", body=[message_1])
         statuses, code = list_statuses("test_company", "test_car")
-        self.assertEqual(statuses[0].timestamp, 25)
+        self.assertEqual(statuses[0]["timestamp"], 25)
 
 
 class Test_Options_For_listing_Multiple_Statuses(unittest.TestCase):
@@ -387,14 +398,14 @@ class Test_Options_For_listing_Multiple_Statuses(unittest.TestCase):
     def test_by_default_all_statuses_are_returned_sorted_by_timestamp_in_ascending_order(self):
         statuses, _ = list_statuses("company", "car")
         self.assertEqual(len(statuses), 5)
-        self.assertEqual(statuses[0].timestamp, 10)
-        self.assertEqual(statuses[-1].timestamp, 40)
+        self.assertEqual(statuses[0]["timestamp"], 10)
+        self.assertEqual(statuses[-1]["timestamp"], 40)
 
     def test_since_parameter_equal_to_newest_status_timestamp_yields_the_newest_status(self):
         statuses, _ = list_statuses("company", "car", since=40)
         self.assertEqual(len(statuses), 1)
-        self.assertEqual(statuses[-1].timestamp, 40)
-        self.assertEqual(statuses[-1].payload.message_type, MessageType.STATUS_ERROR)
+        self.assertEqual(statuses[-1]["timestamp"], 40)
+        self.assertEqual(statuses[-1]["payload"]["message_type"], MessageType.STATUS_ERROR)
 
     def test_since_parameter_larger_to_newest_status_timestamp_yields_empty_status_list(self):
         statuses, _ = list_statuses("company", "car", since=41)
@@ -402,9 +413,9 @@ class Test_Options_For_listing_Multiple_Statuses(unittest.TestCase):
 
     def test_since_option_returns_all_statuses_inclusivelly_newer_than_the_specified_time(self):
         statuses, _ = list_statuses("company", "car", since=30)
-        self.assertEqual(statuses[0].timestamp, 30)
-        self.assertEqual(statuses[1].timestamp, 37)
-        self.assertEqual(statuses[2].timestamp, 40)
+        self.assertEqual(statuses[0]["timestamp"], 30)
+        self.assertEqual(statuses[1]["timestamp"], 37)
+        self.assertEqual(statuses[2]["timestamp"], 40)
 
 
 class Test_Options_For_listing_Multiple_Commands(unittest.TestCase):
@@ -441,12 +452,12 @@ class Test_Options_For_listing_Multiple_Commands(unittest.TestCase):
     def test_by_default_all_commands_are_returned(self):
         commands, code = list_commands("company", "car")
         self.assertEqual(len(commands), 3)
-        self.assertEqual(commands[-1].timestamp, 45)
+        self.assertEqual(commands[-1]["timestamp"], 45)
 
     def test_since_parameter_equal_to_newest_command_timestamp_yields_the_newest_command(self):
         commands, code = list_commands("company", "car", since=45)
         self.assertEqual(len(commands), 1)
-        self.assertEqual(commands[0].timestamp, 45)
+        self.assertEqual(commands[0]["timestamp"], 45)
 
     def test_since_parameter_greater_than_newest_command_timestamp_yields_empty_command_list(self):
         commands, code = list_commands("company", "car", since=46)
@@ -455,8 +466,8 @@ class Test_Options_For_listing_Multiple_Commands(unittest.TestCase):
     def test_since_option_returns_all_commands_inclusivelly_newer_than_the_specified_time(self):
         commands, code = list_commands("company", "car", since=30)
         self.assertEqual(len(commands), 2)
-        self.assertEqual(commands[0].timestamp, 30)
-        self.assertEqual(commands[1].timestamp, 45)
+        self.assertEqual(commands[0]["timestamp"], 30)
+        self.assertEqual(commands[1]["timestamp"], 45)
 
 
 class Test_Cleaning_Up_Commands(unittest.TestCase):
@@ -731,7 +742,8 @@ class Test_Sending_Messages_To_Multiple_Devices_In_A_Single_Request(unittest.Tes
         commands, code = list_commands("the_company", "the_car")
         self.assertEqual(code, 200)
         self.assertEqual(len(commands), 4)
-        self.assertEqual(commands, [command_1, command_2, command_3, command_4])
+        expected = [c.to_dict() for c in (command_1, command_2, command_3, command_4)]
+        self.assertEqual(commands, expected)
 
     def test_no_commands_are_sent_if_some_of_these_are_being_sent_to_a_unavailable_device(self):
         command_1_payload = Payload(
@@ -755,5 +767,255 @@ class Test_Sending_Messages_To_Multiple_Devices_In_A_Single_Request(unittest.Tes
         self.assertEqual(len(commands), 0)
 
 
+class Test_Listing_Buffered_Messages(unittest.TestCase):
+    @patch("server.database.time._time_in_ms")
+    def setUp(self, mock_time_in_ms: Mock) -> None:
+        clear_logs()
+        clear_connected_cars()
+        set_test_db_connection("/:memory:")
+        set_buffer_size(2)
+        device_id = DeviceId(module_id=2, type=5, role="test_device", name="Test Device")
+        status_payload = Payload(
+            message_type=MessageType.STATUS, encoding=EncodingType.JSON, data={"message": "OK"}
+        )
+        command_payload = Payload(
+            message_type=MessageType.COMMAND, encoding=EncodingType.JSON, data={"message": "Beep"}
+        )
+        for timestamp in (10, 20, 30):
+            mock_time_in_ms.return_value = timestamp
+            send_statuses("company", "car", [Message(device_id=device_id, payload=status_payload)])
+            send_commands("company", "car", [Message(device_id=device_id, payload=command_payload)])
+
+    def _delete_all_messages_from_database(self) -> None:
+        with get_connection_source().begin() as conn:
+            conn.execute(delete(MessageBase.__table__))  # type: ignore
+
+    def test_recent_messages_are_listed_without_querying_database(self):
+        self._delete_all_messages_from_database()
+        statuses, code = list_statuses("company", "car", since=20)
+        self.assertEqual(code, 200)
+        self.assertEqual([s["timestamp"] for s in statuses], [20, 30])
+        self.assertEqual(statuses[0]["payload"]["data"], {"message": "OK"})
+        commands, code = list_commands("company", "car", since=25)
+        self.assertEqual(code, 200)
+        self.assertEqual([c["timestamp"] for c in commands], [30])
+
+    def test_messages_older_than_buffered_ones_are_read_from_database(self):
+        statuses, _ = list_statuses("company", "car", since=10)
+        self.assertEqual([s["timestamp"] for s in statuses], [10, 20, 30])
+        self._delete_all_messages_from_database()
+        statuses, _ = list_statuses("company", "car", since=10)
+        self.assertEqual(statuses, [])
+
+    def test_buffered_messages_are_removed_with_old_messages(self):
+        remove_old_messages(MessageBase.data_retention_period_ms() + 25)
+        self._delete_all_messages_from_database()
+        self.assertEqual(len(list_statuses("company", "car", since=30)[0]), 1)
+        self.assertEqual(list_statuses("company", "car", since=20)[0], [])
+
+    def test_connecting_to_database_clears_buffer(self):
+        set_test_db_connection("/:memory:")
+        self.assertEqual(list_statuses("company", "car", since=20)[0], [])
+
+    def tearDown(self) -> None:
+        set_buffer_size(0)
+
+
+class Test_Paginating_Listed_Messages(unittest.TestCase):
+    @patch("server.database.time._time_in_ms")
+    def setUp(self, mock_time_in_ms: Mock) -> None:
+        clear_logs()
+        clear_connected_cars()
+        set_test_db_connection("/:memory:")
+        self.device_ids = [
+            DeviceId(module_id=2, type=5, role=f"device_{k}", name="Test Device") for k in range(3)
+        ]
+        for timestamp in (10, 20, 30):
+            mock_time_in_ms.return_value = timestamp
+            statuses = [self._message(MessageType.STATUS, d, timestamp) for d in self.device_ids]
+            send_statuses("company", "car", statuses)
+            commands = [self._message(MessageType.COMMAND, d, timestamp) for d in self.device_ids]
+            send_commands("company", "car", commands)
+
+    def _message(self, message_type: str, device_id: DeviceId, timestamp: int) -> Message:
+        payload = Payload(
+            message_type=message_type, encoding=EncodingType.JSON, data={"t": timestamp}
+        )
+        return Message(device_id=device_id, payload=payload)
+
+    def _all_pages(self, list_func, limit: int, since: int = 0) -> list[list[dict]]:
+        pages: list[list[dict]] = list()
+        cursor = None
+        while True:
+            response = list_func("company", "car", since=since, limit=limit, cursor=cursor)
+            self.assertEqual(response[1], 200)
+            pages.append(response[0])
+            if len(response) < 3:
+                return pages
+            cursor = response[2][NEXT_CURSOR_HEADER]
+
+    def test_statuses_are_listed_in_pages_in_the_order_of_sending(self):
+        pages = self._all_pages(list_statuses, limit=4)
+        self.assertEqual([len(page) for page in pages], [4, 4, 1])
+        statuses = [status for page in pages for status in page]
+        self.assertEqual([s["timestamp"] for s in statuses], [10, 10, 10, 20, 20, 20, 30, 30, 30])
+        roles = [s["device_id"]["role"] for s in statuses]
+        self.assertEqual(roles, ["device_0", "device_1", "device_2"] * 3)
+
+    def test_commands_are_listed_in_pages(self):
+        pages = self._all_pages(list_commands, limit=3, since=20)
+        self.assertEqual([len(page) for page in pages], [3, 3, 0])
+        self.assertEqual([c["timestamp"] for c in pages[1]], [30, 30, 30])
+
+    def test_no_cursor_is_returned_without_limit(self):
+        response = list_statuses("company", "car", since=0)
+        self.assertEqual(len(response), 2)
+        self.assertEqual(len(response[0]), 9)
+
+    def test_invalid_cursor_is_rejected(self):
+        for cursor in ("not a cursor", "WzEsIDJd", ""):
+            self.assertEqual(list_statuses("company", "car", cursor=cursor)[1], 400)
+            self.assertEqual(list_commands("company", "car", cursor=cursor)[1], 400)
+
+
+class Test_Streaming_Listed_Messages(unittest.TestCase):
+    @patch("server.database.time._time_in_ms")
+    def setUp(self, mock_time_in_ms: Mock) -> None:
+        clear_logs()
+        clear_connected_cars()
+        set_test_db_connection("/:memory:")
+        set_streaming_batch_size(2)
+        device_id = DeviceId(module_id=2, type=5, role="test_device", name="Test Device")
+        for timestamp in (10, 20, 30, 40, 50):
+            mock_time_in_ms.return_value = timestamp
+            payload = Payload(
+                message_type=MessageType.STATUS, encoding=EncodingType.JSON, data={"t": timestamp}
+            )
+            send_statuses("company", "car", [Message(device_id=device_id, payload=payload)])
+
+    def test_messages_exceeding_the_batch_size_are_streamed_in_order(self):
+        response = list_statuses("company", "car", since=0)
+        self.assertIsInstance(response, Response)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, "application/json")
+        statuses = json.loads(response.get_data(as_text=True))
+        self.assertEqual([s["timestamp"] for s in statuses], [10, 20, 30, 40, 50])
+        self.assertEqual(statuses[0]["payload"]["data"], {"t": 10})
+        self.assertEqual(statuses[0]["device_id"]["role"], "test_device")
+
+    def test_streamed_messages_are_equal_to_messages_listed_at_once(self):
+        streamed = json.loads(list_statuses("company", "car", since=20).get_data(as_text=True))
+        set_streaming_batch_size(1000)
+        statuses, code = list_statuses("company", "car", since=20)
+        self.assertEqual(code, 200)
+        self.assertEqual(streamed, json.loads(json.dumps(statuses, cls=JSONEncoder)))
+
+    def test_messages_fitting_into_a_single_batch_are_returned_as_a_list(self):
+        statuses, code = list_statuses("company", "car", since=50)
+        self.assertEqual(code, 200)
+        self.assertEqual([s["timestamp"] for s in statuses], [50])
+        self.assertEqual(list_statuses("company", "car", since=60), ([], 200))
+
+    def test_paginated_messages_are_not_streamed(self):
+        response = list_statuses("company", "car", since=0, limit=3)
+        self.assertEqual(len(response), 3)
+        self.assertEqual([s["timestamp"] for s in response[0]], [10, 20, 30])
+
+    def test_lost_database_connection_during_streaming_is_reported(self):
+        stream_message_rows = controllers._stream_message_rows
+
+        def losing_connection(*args):
+            batches = stream_message_rows(*args)
+            yield next(batches)
+            batches.close()
+            error = Exception("connection lost")
+            raise OperationalError("SELECT", None, error, connection_invalidated=True)
+
+        with patch(
+            "server.fleetv2_http_api.impl.controllers._stream_message_rows",
+            side_effect=losing_connection,
+        ):
+            response = list_statuses("company", "car", since=0)
+        with self.assertRaises(OperationalError):
+            response.get_data()
+        self.assertFalse(connection._database_accessible)
+
+    def test_batch_size_must_be_positive(self):
+        with self.assertRaises(ValueError):
+            set_streaming_batch_size(0)
+
+    def tearDown(self) -> None:
+        set_streaming_batch_size(1000)
+        connection._database_accessible = True
+
+
+class Test_Listing_Statuses_Of_Multiple_Cars(unittest.TestCase):
+    @patch("server.database.time._time_in_ms")
+    def setUp(self, mock_time_in_ms: Mock) -> None:
+        clear_logs()
+        clear_connected_cars()
+        set_test_db_connection("/:memory:")
+        device_id = DeviceId(module_id=2, type=5, role="test_device", name="Test Device")
+        for timestamp, car_name in ((10, "car_a"), (20, "car_b"), (30, "car_a"), (40, "car_c")):
+            mock_time_in_ms.return_value = timestamp
+            payload = Payload(
+                message_type=MessageType.STATUS, encoding=EncodingType.JSON, data={"t": timestamp}
+            )
+            send_statuses("company", car_name, [Message(device_id=device_id, payload=payload)])
+        command = Message(
+            device_id=device_id,
+            payload=Payload(message_type=MessageType.COMMAND, encoding=EncodingType.JSON, data={}),
+        )
+        send_commands("company", "car_a", [command])
+        send_statuses("other_company", "car_a", [Message(device_id=device_id, payload=payload)])
+
+    def _timestamps(self, statuses: dict) -> dict[str, list[int]]:
+        return {car: [s["timestamp"] for s in messages] for car, messages in statuses.items()}
+
+    def test_statuses_of_all_cars_of_the_company_are_returned_by_car_name(self):
+        statuses, code = list_company_statuses("company")
+        self.assertEqual(code, 200)
+        self.assertEqual(
+            self._timestamps(statuses), {"car_a": [10, 30], "car_b": [20], "car_c": [40]}
+        )
+
+    def test_statuses_are_equal_to_statuses_listed_for_single_car(self):
+        statuses, _ = list_company_statuses("company", ["car_a"])
+        car_statuses, _ = list_statuses("company", "car_a")
+        expected = json.loads(json.dumps(car_statuses, cls=JSONEncoder))
+        self.assertEqual(statuses, {"car_a": expected})
+
+    def test_single_since_is_applied_to_all_cars(self):
+        statuses, _ = list_company_statuses("company", ["car_a", "car_b"], since=[20])
+        self.assertEqual(self._timestamps(statuses), {"car_a": [30], "car_b": [20]})
+
+    def test_since_is_applied_to_car_at_the_same_position(self):
+        statuses, _ = list_company_statuses("company", ["car_a", "car_c"], since=[0, 41])
+        self.assertEqual(self._timestamps(statuses), {"car_a": [10, 30], "car_c": []})
+
+    def test_unavailable_cars_are_left_out(self):
+        statuses, code = list_company_statuses("company", ["car_b", "nonexistent"], since=[0, 0])
+        self.assertEqual(code, 200)
+        self.assertEqual(self._timestamps(statuses), {"car_b": [20]})
+
+    def test_statuses_are_read_by_a_single_query(self):
+        with patch(
+            "server.database.database_controller._get_connection_source",
+            wraps=get_connection_source,
+        ) as connection_source:
+            list_company_statuses("company", ["car_a", "car_b", "car_c"], since=[0, 10, 20])
+            self.assertEqual(connection_source.call_count, 1)
+
+    def test_number_of_since_values_must_match_the_cars(self):
+        self.assertEqual(list_company_statuses("company", ["car_a", "car_b"], [0, 1, 2])[1], 400)
+        self.assertEqual(list_company_statuses("company", since=[0, 1])[1], 400)
+
+    def test_company_without_available_cars_yields_404(self):
+        self.assertEqual(list_company_statuses("nonexistent_company")[1], 404)
+
+    def test_requesting_only_unavailable_cars_yields_404(self):
+        self.assertEqual(list_company_statuses("company", ["nonexistent"]), ({}, 404))
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,64 @@
+import json
+import sys
+import unittest
+
+sys.path.append(".")
+
+from server.fleetv2_http_api.encoder import JSONEncoder  # type: ignore
+from server.fleetv2_http_api.impl.deserializer import model_deserializer  # type: ignore
+from server.fleetv2_http_api.models import Message, Module  # type: ignore
+
+
+def _device_id(**kwargs) -> dict:
+    return {"module_id": 1, "type": 2, "role": "front_light", "name": "Light"} | kwargs
+
+
+def _message(**kwargs) -> dict:
+    message = {
+        "timestamp": 123,
+        "device_id": _device_id(),
+        "payload": {"message_type": "STATUS", "encoding": "JSON", "data": {"speed": 1.5}},
+    }
+    return message | kwargs
+
+
+class Test_Compiled_Model_Deserializer(unittest.TestCase):
+    def _assert_deserialized_equally(self, model_class, data) -> None:
+        expected = json.dumps(model_class.from_dict(data), cls=JSONEncoder)
+        deserialized = model_deserializer(model_class)(data)
+        self.assertIsInstance(deserialized, model_class)
+        self.assertEqual(json.dumps(deserialized, cls=JSONEncoder), expected)
+
+    def _assert_rejected_equally(self, model_class, data) -> None:
+        with self.assertRaises(ValueError) as expected:
+            model_class.from_dict(data)
+        with self.assertRaises(ValueError) as raised:
+            model_deserializer(model_class)(data)
+        self.assertEqual(str(raised.exception), str(expected.exception))
+
+    def test_deserializer_is_created_once_for_each_class(self):
+        self.assertIs(model_deserializer(Message), model_deserializer(Message))
+
+    def test_valid_messages_are_deserialized_equally_to_generic_deserialization(self):
+        self._assert_deserialized_equally(Message, _message())
+        self._assert_deserialized_equally(Message, _message(timestamp="456"))
+        command = {"message_type": "COMMAND", "encoding": "BASE64", "data": "A"}
+        self._assert_deserialized_equally(Message, _message(payload=command))
+        self._assert_deserialized_equally(Message, {"device_id": _device_id()})
+
+    def test_lists_of_models_are_deserialized_equally_to_generic_deserialization(self):
+        module = {"module_id": 1, "device_list": [_device_id(), _device_id(module_id=2), None]}
+        self._assert_deserialized_equally(Module, module)
+
+    def test_invalid_messages_are_rejected_equally_to_generic_deserialization(self):
+        self._assert_rejected_equally(Message, _message(device_id=_device_id(role="Role")))
+        self._assert_rejected_equally(Message, _message(device_id=_device_id(module_id=None)))
+        self._assert_rejected_equally(Message, _message(device_id=_device_id(type="one")))
+        self._assert_rejected_equally(
+            Message, _message(payload={"message_type": "UNKNOWN", "encoding": "JSON", "data": {}})
+        )
+        self._assert_rejected_equally(Message, _message(payload=None))
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -0,0 +1,261 @@
+import sys
+import json
+import itertools
+import threading
+import unittest
+from unittest.mock import patch, Mock
+
+sys.path.append(".")
+
+import flask
+
+from server.enums import MessageType, EncodingType  # type: ignore
+from server.database.cache import clear_connected_cars  # type: ignore
+from server.database.database_controller import (  # type: ignore
+    MessageDB,
+    send_messages_to_database,
+    set_test_db_connection,
+)
+from server.fleetv2_http_api.impl.message_stream import MessageStreamManager  # type: ignore
+from server.fleetv2_http_api.impl.controllers import (  # type: ignore
+    send_statuses,
+    send_commands,
+    stream_car_messages,
+    stream_company_messages,
+    set_event_stream_params,
+    _max_publishing_delay_ms,
+    _message_stream_manager,
+    _stored_and_published_messages,
+)
+from server.fleetv2_http_api.models import DeviceId, Payload, Message  # type: ignore
+from tests._utils.logs import clear_logs  # type: ignore
+
+
+def _message_db(timestamp: int) -> MessageDB:
+    return MessageDB(
+        timestamp=timestamp,
+        serialized_device_id="1_2_device",
+        module_id=1,
+        device_type=2,
+        device_role="device",
+        device_name="Device",
+        message_type=MessageType.STATUS,
+        payload_encoding=EncodingType.JSON,
+        payload_data={},
+    )
+
+
+class Test_Message_Stream_Manager(unittest.TestCase):
+    def setUp(self) -> None:
+        self.manager = MessageStreamManager(max_queued_messages=3)
+
+    def test_messages_are_delivered_to_subscriptions_of_the_car_and_of_its_company(self):
+        car = self.manager.subscribe("company", "car")
+        company = self.manager.subscribe("company", None)
+        other_car = self.manager.subscribe("company", "other_car")
+        messages = [_message_db(10), _message_db(11)]
+        self.manager.publish("company", "car", messages)
+        expected = [("car", 0, messages[0]), ("car", 1, messages[1])]
+        self.assertEqual(car.take(0), expected)
+        self.assertEqual(company.take(0), expected)
+        self.assertEqual(other_car.take(0), [])
+
+    def test_taking_messages_waits_until_some_are_published(self):
+        subscription = self.manager.subscribe("company", "car")
+        message = _message_db(10)
+        threading.Timer(0.05, self.manager.publish, ("company", "car", [message])).start()
+        self.assertEqual(subscription.take(2), [("car", 0, message)])
+
+    def test_subscription_overflows_when_messages_are_not_taken(self):
+        subscription = self.manager.subscribe("company", "car")
+        self.manager.publish("company", "car", [_message_db(10), _message_db(11)])
+        self.assertFalse(subscription.overflowed)
+        self.manager.publish("company", "car", [_message_db(12), _message_db(13)])
+        self.assertTrue(subscription.overflowed)
+        self.assertEqual(subscription.take(0), [])
+
+    def test_unsubscribed_subscription_receives_no_messages(self):
+        subscription = self.manager.subscribe("company", "car")
+        self.assertEqual(self.manager.n_subscriptions(), 1)
+        self.manager.unsubscribe(subscription)
+        self.assertEqual(self.manager.n_subscriptions(), 0)
+        self.manager.publish("company", "car", [_message_db(10)])
+        self.assertEqual(subscription.take(0), [])
+
+    def test_unsubscribing_wakes_up_taking_messages(self):
+        subscription = self.manager.subscribe("company", "car")
+        threading.Timer(0.05, self.manager.unsubscribe, (subscription,)).start()
+        self.assertEqual(subscription.take(10), [])
+        self.assertTrue(subscription.closed)
+
+    def test_nonpositive_max_queued_messages_is_rejected(self):
+        with self.assertRaises(ValueError):
+            MessageStreamManager(max_queued_messages=0)
+
+
+class Test_Streaming_Messages_As_Events(unittest.TestCase):
+    def setUp(self) -> None:
+        clear_logs()
+        clear_connected_cars()
+        set_test_db_connection("/:memory:")
+        set_event_stream_params(keepalive_s=0.01, max_queued_messages=100)
+        self.device_id = DeviceId(module_id=2, type=5, role="test_device", name="Test Device")
+        self.app = flask.Flask(__name__)
+        self.time_patch = patch("server.database.time._time_in_ms")
+        self.mock_time_in_ms: Mock = self.time_patch.start()
+        self.mock_time_in_ms.return_value = 10
+        self.streams: list = []
+
+    def _send_status(self, car_name: str, timestamp: int) -> None:
+        self.mock_time_in_ms.return_value = timestamp
+        payload = Payload(
+            message_type=MessageType.STATUS, encoding=EncodingType.JSON, data={"t": timestamp}
+        )
+        send_statuses("company", car_name, [Message(device_id=self.device_id, payload=payload)])
+
+    def _send_command(self, car_name: str, timestamp: int) -> None:
+        self.mock_time_in_ms.return_value = timestamp
+        payload = Payload(
+            message_type=MessageType.COMMAND, encoding=EncodingType.JSON, data={"t": timestamp}
+        )
+        send_commands("company", car_name, [Message(device_id=self.device_id, payload=payload)])
+
+    def _stream(self, stream_function, *args, last_event_id: str | None = None, **kwargs):
+        headers = {"Last-Event-ID": last_event_id} if last_event_id is not None else {}
+        with self.app.test_request_context("/", headers=headers):
+            response = stream_function(*args, **kwargs)
+        if not isinstance(response, flask.Response):
+            return response
+        self.assertEqual(response.mimetype, "text/event-stream")
+        stream = iter(response.response)
+        self.streams.append(stream)
+        self.assertEqual(next(stream), b": stream started\n\n")
+        return stream
+
+    def _events_until_keepalive(self, stream) -> list[dict]:
+        events = []
+        for chunk in stream:
+            if chunk == b": keep-alive\n\n":
+                return events
+            for event in chunk.decode().strip().split("\n\n"):
+                fields = dict(line.split(": ", 1) for line in event.split("\n"))
+                fields["data"] = json.loads(fields["data"])
+                events.append(fields)
+        return events
+
+    def _timestamps(self, events: list[dict]) -> list[tuple[str, str, int]]:
+        return [
+            (e["event"], e["data"]["car_name"], e["data"]["message"]["timestamp"]) for e in events
+        ]
+
+    def test_stored_messages_newer_than_since_are_streamed_first(self):
+        self._send_status("car_a", 10)
+        self._send_command("car_a", 20)
+        self._send_status("car_a", 30)
+        stream = self._stream(stream_car_messages, "company", "car_a", since=20)
+        self.assertEqual(
+            self._timestamps(self._events_until_keepalive(stream)),
+            [("command", "car_a", 20), ("status", "car_a", 30)],
+        )
+
+    def test_messages_are_streamed_as_they_are_sent(self):
+        stream = self._stream(stream_car_messages, "company", "car_a")
+        self.assertEqual(self._events_until_keepalive(stream), [])
+        self._send_status("car_a", 10)
+        self._send_status("car_b", 20)
+        self._send_command("car_a", 30)
+        self.assertEqual(
+            self._timestamps(self._events_until_keepalive(stream)),
+            [("status", "car_a", 10), ("command", "car_a", 30)],
+        )
+
+    def test_company_stream_contains_messages_of_all_its_cars(self):
+        stream = self._stream(stream_company_messages, "company")
+        self._send_status("car_a", 10)
+        self._send_status("car_b", 20)
+        self.assertEqual(
+            self._timestamps(self._events_until_keepalive(stream)),
+            [("status", "car_a", 10), ("status", "car_b", 20)],
+        )
+
+    def test_stream_is_resumed_after_the_last_event(self):
+        self._send_status("car_a", 10)
+        self._send_status("car_b", 10)
+        self._send_status("car_a", 20)
+        events = self._events_until_keepalive(
+            self._stream(stream_company_messages, "company", since=0)
+        )
+        resumed = self._stream(stream_company_messages, "company", last_event_id=events[0]["id"])
+        self.assertEqual(
+            self._timestamps(self._events_until_keepalive(resumed)),
+            [("status", "car_b", 10), ("status", "car_a", 20)],
+        )
+
+    def test_message_sent_while_reading_stored_messages_is_streamed_once(self):
+        stream = self._stream(stream_car_messages, "company", "car_a", since=0)
+        self._send_status("car_a", 10)
+        self.assertEqual(
+            self._timestamps(self._events_until_keepalive(stream)), [("status", "car_a", 10)]
+        )
+
+    def test_message_sent_before_subscribing_and_published_after_it_is_streamed_once(self):
+        with patch(
+            "server.fleetv2_http_api.impl.controllers._message_stream_manager.publish"
+        ) as mock_publish:
+            self._send_status("car_a", 10)
+        self.mock_time_in_ms.return_value = 20
+        stream = self._stream(stream_car_messages, "company", "car_a", since=0)
+        _message_stream_manager.publish(*mock_publish.call_args.args)
+        self._send_status("car_a", 30)
+        self.assertEqual(
+            self._timestamps(self._events_until_keepalive(stream)),
+            [("status", "car_a", 10), ("status", "car_a", 30)],
+        )
+
+    def test_only_keys_of_replayed_messages_possibly_published_again_are_kept(self):
+        history = [_message_db(timestamp) for timestamp in range(5000)]
+        send_messages_to_database("company", "car_a", *history)
+        subscribed_at = 4000 + _max_publishing_delay_ms
+        self.mock_time_in_ms.return_value = subscribed_at
+        subscription = _message_stream_manager.subscribe("company", "car_a")
+        messages = _stored_and_published_messages(
+            subscription, subscribed_at, (MessageType.STATUS,), 0, None
+        )
+        try:
+            self.assertEqual(sum(len(batch) for batch in itertools.islice(messages, 5)), 5000)
+            self.assertEqual(next(messages), [])
+            self.assertEqual(len(messages.gi_frame.f_locals["sent_keys"]), 1000)
+            self.mock_time_in_ms.return_value = subscribed_at + _max_publishing_delay_ms + 1
+            self.assertEqual(next(messages), [])
+            self.assertEqual(len(messages.gi_frame.f_locals["sent_keys"]), 0)
+        finally:
+            messages.close()
+            _message_stream_manager.unsubscribe(subscription)
+
+    def test_invalid_last_event_id_is_rejected(self):
+        _, code = self._stream(stream_car_messages, "company", "car_a", last_event_id="invalid")
+        self.assertEqual(code, 400)
+
+    def test_stream_not_taking_messages_is_closed(self):
+        set_event_stream_params(keepalive_s=0.01, max_queued_messages=1)
+        stream = self._stream(stream_car_messages, "company", "car_a")
+        self._send_status("car_a", 10)
+        self._send_status("car_a", 20)
+        self.assertEqual(list(stream), [])
+        self.assertEqual(_message_stream_manager.n_subscriptions(), 0)
+
+    def test_closed_stream_is_unsubscribed(self):
+        stream = self._stream(stream_car_messages, "company", "car_a")
+        self.assertEqual(_message_stream_manager.n_subscriptions(), 1)
+        stream.close()
+        self.assertEqual(_message_stream_manager.n_subscriptions(), 0)
+
+    def tearDown(self) -> None:
+        for stream in self.streams:
+            stream.close()
+        self.time_patch.stop()
+        set_event_stream_params(keepalive_s=15, max_queued_messages=10000)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
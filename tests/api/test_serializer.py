@@ -0,0 +1,52 @@
+import datetime
+import json
+import sys
+import unittest
+
+sys.path.append(".")
+
+from server.enums import MessageType, EncodingType  # type: ignore
+from server.fleetv2_http_api.encoder import JSONEncoder  # type: ignore
+from server.fleetv2_http_api.impl.serializer import FastJSONEncoder, dumps  # type: ignore
+from server.fleetv2_http_api.models import DeviceId, Payload, Message, Module, Car  # type: ignore
+
+
+def _message(data: dict | str) -> Message:
+    return Message(
+        timestamp=123,
+        device_id=DeviceId(module_id=1, type=2, role="front_light", name="Světlo"),
+        payload=Payload(message_type=MessageType.STATUS, encoding=EncodingType.JSON, data=data),
+    )
+
+
+class Test_Fast_JSON_Encoder(unittest.TestCase):
+    def _assert_serialized_equally(self, o) -> None:
+        # the arguments used by the server to serialize the responses
+        expected = json.dumps(o, cls=JSONEncoder, indent=2, sort_keys=True, ensure_ascii=False)
+        self.assertEqual(json.dumps(o, cls=FastJSONEncoder, indent=2, sort_keys=True), expected)
+        compact = json.dumps(o, cls=FastJSONEncoder)
+        self.assertEqual(json.loads(compact), json.loads(json.dumps(o, cls=JSONEncoder)))
+
+    def test_messages_are_serialized_equally_to_the_generated_encoder(self):
+        self._assert_serialized_equally([_message({"speed": 1.5, "lights": [True, None]})])
+        self._assert_serialized_equally([_message("base64 data"), _message({})])
+
+    def test_other_models_are_serialized_equally_to_the_generated_encoder(self):
+        device_id = DeviceId(module_id=1, type=2, role="role", name="name")
+        self._assert_serialized_equally(Module(module_id=1, device_list=[device_id, device_id]))
+        self._assert_serialized_equally([Car(company_name="company", car_name="car")])
+
+    def test_attributes_equal_to_none_are_omitted(self):
+        self.assertEqual(dumps(Car(company_name="company")), b'{"company_name":"company"}')
+
+    def test_objects_unsupported_by_orjson_are_serialized_by_generated_encoder(self):
+        self._assert_serialized_equally([datetime.datetime(2024, 1, 2, 3, 4, 5)])
+        self._assert_serialized_equally([_message({"big_number": 2**70})])
+
+    def test_objects_not_serializable_by_any_encoder_raise_type_error(self):
+        with self.assertRaises(TypeError):
+            json.dumps([object()], cls=FastJSONEncoder)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -13,6 +13,7 @@ from server.fleetv2_http_api.impl.controllers import (  # type: ignore
     list_statuses,
     send_commands,
     list_commands,
+    list_company_statuses,
 )
 from server.fleetv2_http_api.models import Car, DeviceId, Payload, Message  # type: ignore
 from server.fleetv2_http_api.impl.controllers import (  # type: ignore
@@ -528,5 +529,70 @@ class Test_Waiting_For_Messsages_From_Multiple_Cars(unittest.TestCase):
             os.remove("./example.db")
 
 
+class Test_Waiting_For_Statuses_Of_Any_Of_Multiple_Cars(unittest.TestCase):
+    def setUp(self) -> None:
+        clear_logs()
+        if os.path.exists("./example.db"):
+            os.remove("./example.db")
+        set_test_db_connection("/example.db")
+        clear_connected_cars()
+        device_id = DeviceId(module_id=42, type=7, role="test_device_1", name="Left light")
+        payload = Payload(message_type="STATUS", encoding="JSON", data={})
+        self.status = Message(device_id=device_id, payload=payload)
+        set_status_wait_timeout_s(1)
+        self.responses: list[tuple[dict, int]] = []
+
+    def _list_statuses(self, *args, **kwargs) -> None:
+        self.responses.append(list_company_statuses("company", *args, wait=True, **kwargs))
+
+    def _send_statuses(self, *car_names: str) -> None:
+        time.sleep(0.05)
+        for car_name in car_names:
+            send_statuses("company", car_name, [self.status.to_dict()])
+
+    def test_request_returns_statuses_of_the_car_ending_the_waiting(self):
+        run_in_threads(
+            lambda: self._list_statuses(["car_1", "car_2"]),
+            lambda: self._send_statuses("car_3", "car_2"),
+        )
+        statuses, code = self.responses[0]
+        self.assertEqual(code, 200)
+        self.assertEqual(list(statuses), ["car_2"])
+        self.assertEqual(len(statuses["car_2"]), 1)
+
+    def test_request_for_company_returns_statuses_of_any_car_of_the_company(self):
+        run_in_threads(self._list_statuses, lambda: self._send_statuses("new_car"))
+        statuses, code = self.responses[0]
+        self.assertEqual(code, 200)
+        self.assertEqual(list(statuses), ["new_car"])
+
+    def test_available_statuses_are_returned_without_waiting(self):
+        self._send_statuses("car_1")
+        start = time.monotonic()
+        self._list_statuses(["car_1", "car_2"])
+        self.assertLess(time.monotonic() - start, 0.5)
+        statuses, code = self.responses[0]
+        self.assertEqual(code, 200)
+        self.assertEqual(len(statuses["car_1"]), 1)
+
+    def test_statuses_older_than_since_of_their_car_are_not_returned(self):
+        future = timestamp() + 60000
+        run_in_threads(
+            lambda: self._list_statuses(["car_1", "car_2"], since=[future, 0]),
+            lambda: self._send_statuses("car_1"),
+        )
+        self.assertEqual(self.responses[0], ({}, 200))
+
+    def test_waiting_without_statuses_yields_404_after_timeout(self):
+        set_status_wait_timeout_s(0.01)
+        self._list_statuses(["car_1"])
+        self.assertEqual(self.responses[0], ({}, 404))
+
+    def tearDown(self) -> None:
+        set_status_wait_timeout_s(1)
+        if os.path.exists("./example.db"):
+            os.remove("./example.db")
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,195 @@
+import sys
+import threading
+import time
+import unittest
+
+sys.path.append(".")
+
+from server.fleetv2_http_api.impl.message_wait import MessageWaitObjManager  # type: ignore
+from server.fleetv2_http_api.impl.car_wait import CarWaitObjManager  # type: ignore
+from server.fleetv2_http_api.models import Car, DeviceId, Payload, Message  # type: ignore
+from tests._utils.logs import clear_logs  # type: ignore
+
+
+def _message(timestamp: int) -> Message:
+    return Message(
+        timestamp=timestamp,
+        device_id=DeviceId(module_id=1, type=1, role="role", name="device"),
+        payload=Payload(message_type="STATUS", encoding="JSON", data={}),
+    )
+
+
+class Test_Message_Wait_Obj(unittest.TestCase):
+    def setUp(self) -> None:
+        clear_logs()
+        self.manager = MessageWaitObjManager(timeout_ms=2000)
+
+    def test_response_set_before_waiting_is_not_lost(self):
+        wait_obj = self.manager.new_wait_obj("company", "car")
+        self.manager.add_response_content_and_stop_waiting("company", "car", [_message(1)])
+        start = time.monotonic()
+        response = wait_obj.wait_and_get_response()
+        self.assertLess(time.monotonic() - start, 0.5)
+        self.assertEqual([msg.timestamp for msg in response], [1])
+
+    def test_response_is_sent_only_to_wait_objects_of_given_car(self):
+        wait_obj_1 = self.manager.new_wait_obj("company", "car_1")
+        wait_obj_2 = self.manager.new_wait_obj("company", "car_2")
+        self.manager.add_response_content_and_stop_waiting("company", "car_1", [_message(1)])
+        self.assertEqual(self.manager.n_waiting(), 1)
+        self.manager.remove_wait_obj(wait_obj_2)
+        self.assertEqual(self.manager.n_waiting(), 0)
+        self.assertEqual(len(wait_obj_1.wait_and_get_response()), 1)
+
+    def test_removing_wait_obj_not_in_queue_has_no_effect(self):
+        wait_obj = self.manager.new_wait_obj("company", "car")
+        self.manager.remove_wait_obj(wait_obj)
+        self.manager.remove_wait_obj(wait_obj)
+        self.assertEqual(self.manager.n_waiting(), 0)
+
+    def test_number_of_stripes_must_be_positive(self):
+        with self.assertRaises(ValueError):
+            MessageWaitObjManager(n_stripes=0)
+
+
+class Test_Multi_Car_Wait_Obj(unittest.TestCase):
+    def setUp(self) -> None:
+        clear_logs()
+        self.manager = MessageWaitObjManager(timeout_ms=2000)
+
+    def test_wait_obj_responds_with_messages_of_any_of_the_cars(self):
+        wait_obj = self.manager.new_multi_car_wait_obj([("company", "car_1"), ("company", "car_2")])
+        self.manager.add_response_content_and_stop_waiting("company", "car_3", [_message(3)])
+        self.manager.add_response_content_and_stop_waiting("company", "car_2", [_message(2)])
+        response = wait_obj.wait_and_get_response()
+        self.assertEqual(list(response), [("company", "car_2")])
+        self.assertEqual([msg.timestamp for msg in response[("company", "car_2")]], [2])
+
+    def test_wait_obj_reports_all_cars_responding_before_its_removal(self):
+        wait_obj = self.manager.new_multi_car_wait_obj([("company", "car_1"), ("company", "car_2")])
+        self.manager.add_response_content_and_stop_waiting("company", "car_1", [_message(1)])
+        self.manager.add_response_content_and_stop_waiting("company", "car_2", [_message(2)])
+        self.assertEqual(
+            sorted(wait_obj.wait_and_get_response()), [("company", "car_1"), ("company", "car_2")]
+        )
+
+    def test_wait_obj_for_company_responds_with_messages_of_any_of_its_cars(self):
+        wait_obj = self.manager.new_multi_car_wait_obj([("company", None)])
+        self.manager.add_response_content_and_stop_waiting("other", "car", [_message(1)])
+        self.manager.add_response_content_and_stop_waiting("company", "new_car", [_message(2)])
+        self.assertEqual(list(wait_obj.wait_and_get_response()), [("company", "new_car")])
+
+    def test_removed_wait_obj_is_removed_from_queues_of_all_cars(self):
+        wait_obj = self.manager.new_multi_car_wait_obj(
+            [("company", "car_1"), ("company", "car_2"), ("company", None)]
+        )
+        self.assertEqual(self.manager.n_waiting(), 3)
+        self.manager.remove_wait_obj(wait_obj)
+        self.assertEqual(self.manager.n_waiting(), 0)
+
+    def test_waiting_for_cars_times_out_with_empty_response(self):
+        self.manager.set_timeout(10)
+        self.assertEqual(self.manager.wait_for_cars_and_get_response([("company", "car")]), {})
+        self.assertEqual(self.manager.n_waiting(), 0)
+
+    def test_single_car_and_multi_car_wait_objs_receive_the_same_messages(self):
+        single = self.manager.new_wait_obj("company", "car")
+        multi = self.manager.new_multi_car_wait_obj([("company", "car")])
+        self.manager.add_response_content_and_stop_waiting("company", "car", [_message(1)])
+        multi_response = multi.wait_and_get_response()
+        self.assertEqual(single.wait_and_get_response(), multi_response[("company", "car")])
+
+
+class Test_Many_Concurrent_Message_Wait_Objs(unittest.TestCase):
+    N_CARS = 50
+    N_WAITING_PER_CAR = 40
+
+    def setUp(self) -> None:
+        clear_logs()
+        self.manager = MessageWaitObjManager(timeout_ms=10000)
+
+    def test_all_waiting_requests_receive_messages_of_their_car(self):
+        responses: dict[tuple[int, int], list[Message]] = dict()
+        all_waiting = threading.Event()
+        lock = threading.Lock()
+
+        def wait(car: int, k: int) -> None:
+            response = self.manager.wait_and_get_reponse("company", f"car_{car}")
+            with lock:
+                responses[(car, k)] = response
+
+        def notify(car: int) -> None:
+            all_waiting.wait()
+            self.manager.add_response_content_and_stop_waiting(
+                "company", f"car_{car}", [_message(car)]
+            )
+
+        threads = [
+            threading.Thread(target=wait, args=(car, k))
+            for car in range(self.N_CARS)
+            for k in range(self.N_WAITING_PER_CAR)
+        ]
+        threads.extend(threading.Thread(target=notify, args=(car,)) for car in range(self.N_CARS))
+        start = time.monotonic()
+        for t in threads:
+            t.start()
+        while self.manager.n_waiting() < self.N_CARS * self.N_WAITING_PER_CAR:
+            time.sleep(0.01)
+        all_waiting.set()
+        for t in threads:
+            t.join()
+
+        # no waiting request sits out the whole timeout
+        self.assertLess(time.monotonic() - start, 10)
+        self.assertEqual(len(responses), self.N_CARS * self.N_WAITING_PER_CAR)
+        for (car, _), response in responses.items():
+            self.assertEqual([msg.timestamp for msg in response], [car])
+        self.assertEqual(self.manager.n_waiting(), 0)
+
+    def test_waiting_and_notifying_concurrently_leaves_no_wait_objects(self):
+        self.manager.set_timeout(50)
+
+        def wait_and_notify(car: int) -> None:
+            for _ in range(20):
+                self.manager.add_response_content_and_stop_waiting("company", f"car_{car}", [])
+                self.manager.wait_and_get_reponse("company", f"car_{car % 5}")
+
+        threads = [threading.Thread(target=wait_and_notify, args=(car,)) for car in range(100)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(self.manager.n_waiting(), 0)
+
+
+class Test_Many_Concurrent_Car_Wait_Objs(unittest.TestCase):
+    def setUp(self) -> None:
+        clear_logs()
+        self.manager = CarWaitObjManager(timeout_ms=10000)
+
+    def test_all_waiting_requests_receive_new_car(self):
+        n_waiting = 1000
+        responses: list[list[Car]] = list()
+        lock = threading.Lock()
+
+        def wait() -> None:
+            response = self.manager.wait_and_get_reponse()
+            with lock:
+                responses.append(response)
+
+        threads = [threading.Thread(target=wait) for _ in range(n_waiting)]
+        for t in threads:
+            t.start()
+        while self.manager.n_waiting() < n_waiting:
+            time.sleep(0.01)
+        self.manager.add_response_content_and_stop_waiting([Car("company", "car")])
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len(responses), n_waiting)
+        self.assertTrue(all(response == [Car("company", "car")] for response in responses))
+        self.assertEqual(self.manager.n_waiting(), 0)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -0,0 +1,208 @@
+import unittest
+import sys
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append(".")
+
+import jwt
+import flask
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from server.fleetv2_http_api.impl.jwks import JWKSKeyStore, keycloak_jwks_url
+from server.fleetv2_http_api.controllers.security_controller import (
+    info_from_oAuth2AuthCode,
+    set_auth_params,
+    set_key_store,
+    verified_token_cache_stats,
+)
+
+
+_KEY_A = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+_KEY_B = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+def _jwk(private_key: rsa.RSAPrivateKey, kid: str, use: str = "sig") -> dict:
+    jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(private_key.public_key()))
+    jwk.update({"kid": kid, "use": use, "alg": "RS256"})
+    return jwk
+
+
+def _token(private_key: rsa.RSAPrivateKey, kid: str) -> str:
+    payload = {"exp": time.time() + 60, "aud": "account", "allowed-origins": ["client"]}
+    return jwt.encode(payload, private_key, algorithm="RS256", headers={"kid": kid})
+
+
+class _StubJWKSServer(ThreadingHTTPServer):
+    """Local HTTP server responding with the `jwks` after the `delay_s`."""
+
+    daemon_threads = True
+    block_on_close = False
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), _StubJWKSHandler)
+        self.jwks: dict = {"keys": []}
+        self.status = 200
+        self.delay_s = 0.0
+        self.n_requests = 0
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+
+    @property
+    def url(self) -> str:
+        return keycloak_jwks_url(f"http://127.0.0.1:{self.server_address[1]}", "test")
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+class _StubJWKSHandler(BaseHTTPRequestHandler):
+    server: _StubJWKSServer
+
+    def do_GET(self) -> None:
+        self.server.n_requests += 1
+        time.sleep(self.server.delay_s)
+        body = json.dumps(self.server.jwks).encode()
+        self.send_response(self.server.status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+def _wait_until(condition, timeout_s: float = 2.0) -> bool:
+    end = time.monotonic() + timeout_s
+    while time.monotonic() < end:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+class Test_JWKS_Key_Store(unittest.TestCase):
+    def setUp(self) -> None:
+        self.server = _StubJWKSServer()
+        self.key_a, self.key_b = _KEY_A, _KEY_B
+
+    def test_jwks_url_of_keycloak_realm(self):
+        self.assertEqual(
+            keycloak_jwks_url("https://keycloak.com/", "realm"),
+            "https://keycloak.com/realms/realm/protocol/openid-connect/certs",
+        )
+
+    def test_signing_keys_are_stored_by_key_id(self):
+        self.server.jwks = {"keys": [_jwk(self.key_a, "a"), _jwk(self.key_b, "b", use="enc")]}
+        store = JWKSKeyStore(self.server.url)
+        self.assertTrue(store.refresh())
+        self.assertEqual(store.kids(), ["a"])
+        self.assertEqual(store.key("a").public_numbers(), self.key_a.public_key().public_numbers())
+
+    def test_failed_refresh_keeps_previous_keys(self):
+        self.server.jwks = {"keys": [_jwk(self.key_a, "a")]}
+        store = JWKSKeyStore(self.server.url)
+        store.refresh()
+        self.server.status = 500
+        self.assertFalse(store.refresh())
+        self.server.status = 200
+        self.server.jwks = {"keys": []}
+        self.assertFalse(store.refresh())
+        self.assertEqual(store.kids(), ["a"])
+
+    def test_refresh_is_limited_by_timeout(self):
+        self.server.delay_s = 0.5
+        store = JWKSKeyStore(self.server.url, timeout_s=0.1)
+        start = time.monotonic()
+        self.assertFalse(store.refresh())
+        self.assertLess(time.monotonic() - start, 0.4)
+
+    def test_starting_the_store_does_not_wait_for_the_keys(self):
+        self.server.delay_s = 0.5
+        self.server.jwks = {"keys": [_jwk(self.key_a, "a")]}
+        store = JWKSKeyStore(self.server.url, min_refresh_interval_s=0)
+        start = time.monotonic()
+        store.start()
+        self.assertIsNone(store.key("a"))
+        self.assertLess(time.monotonic() - start, 0.2)
+        self.assertTrue(_wait_until(lambda: store.kids() == ["a"]))
+        store.stop()
+
+    def test_unknown_key_id_triggers_background_refresh(self):
+        self.server.jwks = {"keys": [_jwk(self.key_a, "a")]}
+        store = JWKSKeyStore(self.server.url, refresh_period_s=60, min_refresh_interval_s=0)
+        store.start()
+        self.assertTrue(_wait_until(lambda: store.kids() == ["a"]))
+        self.server.jwks = {"keys": [_jwk(self.key_a, "a"), _jwk(self.key_b, "b")]}
+        self.assertIsNone(store.key("b"))
+        self.assertTrue(_wait_until(lambda: store.key("b") is not None))
+        store.stop()
+
+    def test_refresh_for_unknown_key_ids_is_rate_limited(self):
+        self.server.jwks = {"keys": [_jwk(self.key_a, "a")]}
+        store = JWKSKeyStore(self.server.url, refresh_period_s=60, min_refresh_interval_s=60)
+        store.start()
+        self.assertTrue(_wait_until(lambda: store.kids() == ["a"]))
+        for _ in range(10):
+            store.key("unknown")
+        time.sleep(0.1)
+        self.assertEqual(self.server.n_requests, 1)
+        store.stop()
+
+    def test_removed_key_triggers_callback(self):
+        removed = []
+        store = JWKSKeyStore(self.server.url, on_keys_removed=lambda: removed.append(True))
+        self.server.jwks = {"keys": [_jwk(self.key_a, "a")]}
+        store.refresh()
+        self.server.jwks = {"keys": [_jwk(self.key_a, "a"), _jwk(self.key_b, "b")]}
+        store.refresh()
+        self.assertEqual(removed, [])
+        self.server.jwks = {"keys": [_jwk(self.key_b, "b")]}
+        store.refresh()
+        self.assertEqual(removed, [True])
+
+    def test_invalid_parameters_are_rejected(self):
+        with self.assertRaises(ValueError):
+            JWKSKeyStore(self.server.url, refresh_period_s=0)
+        with self.assertRaises(ValueError):
+            JWKSKeyStore(self.server.url, jitter_s=-1)
+
+    def tearDown(self) -> None:
+        self.server.stop()
+
+
+class Test_Verifying_Tokens_By_Key_Id(unittest.TestCase):
+    def setUp(self) -> None:
+        self.server = _StubJWKSServer()
+        self.key_a, self.key_b = _KEY_A, _KEY_B
+        self.server.jwks = {"keys": [_jwk(self.key_a, "a"), _jwk(self.key_b, "b")]}
+        self.store = JWKSKeyStore(self.server.url)
+        self.store.refresh()
+        set_auth_params(public_key="", client_id="client")
+        set_key_store(self.store)
+        self.app = flask.Flask(__name__)
+
+    def _info(self, token: str) -> dict | None:
+        with self.app.test_request_context("/", headers={"Authorization": f"Bearer {token}"}):
+            return info_from_oAuth2AuthCode(token)
+
+    def test_token_is_verified_by_key_with_its_key_id(self):
+        self.assertIsNotNone(self._info(_token(self.key_a, "a")))
+        self.assertIsNotNone(self._info(_token(self.key_b, "b")))
+
+    def test_token_signed_by_other_key_is_rejected(self):
+        self.assertIsNone(self._info(_token(self.key_a, "b")))
+        self.assertIsNone(self._info(_token(self.key_a, "unknown")))
+        self.assertEqual(verified_token_cache_stats()["size"], 0)
+
+    def tearDown(self) -> None:
+        set_key_store(None)
+        self.server.stop()
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
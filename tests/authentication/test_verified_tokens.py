@@ -0,0 +1,104 @@
+import unittest
+import sys
+import time
+from unittest.mock import patch
+
+sys.path.append(".")
+
+import jwt
+import flask
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from server.fleetv2_http_api.controllers.security_controller import (
+    info_from_oAuth2AuthCode,
+    set_auth_params,
+    set_max_verified_tokens,
+    verified_token_cache_stats,
+)
+
+
+_private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+_public_key = (
+    _private_key.public_key()
+    .public_bytes(serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo)
+    .decode()
+)
+# the public key is passed to the server without the PEM header and footer
+_public_key_body = "".join(_public_key.strip().split("\n")[1:-1])
+
+
+def _token(expires_in_s: float, origin: str = "client", subject: str = "") -> str:
+    payload = {
+        "exp": time.time() + expires_in_s,
+        "aud": "account",
+        "sub": subject,
+        "allowed-origins": [origin],
+    }
+    return jwt.encode(payload, _private_key, algorithm="RS256")
+
+
+class Test_Caching_Verified_Tokens(unittest.TestCase):
+    def setUp(self) -> None:
+        set_max_verified_tokens(2)
+        set_auth_params(public_key=_public_key_body, client_id="client")
+        self.app = flask.Flask(__name__)
+
+    def _info(self, token: str) -> dict | None:
+        with self.app.test_request_context("/", headers={"Authorization": f"Bearer {token}"}):
+            return info_from_oAuth2AuthCode(token)
+
+    def test_valid_token_is_verified_only_once(self):
+        token = _token(expires_in_s=60)
+        with patch("jwt.decode", wraps=jwt.decode) as decode:
+            for _ in range(3):
+                self.assertEqual(self._info(token), {"scopes": {}, "uid": ""})
+            self.assertEqual(decode.call_count, 1)
+        self.assertEqual(verified_token_cache_stats(), {"hits": 2, "misses": 1, "size": 1})
+
+    def test_token_of_other_client_is_rejected_from_cache(self):
+        token = _token(expires_in_s=60, origin="other_client")
+        self.assertIsNone(self._info(token))
+        self.assertIsNone(self._info(token))
+        self.assertEqual(verified_token_cache_stats(), {"hits": 1, "misses": 1, "size": 1})
+
+    def test_token_is_verified_again_after_its_expiration(self):
+        token = _token(expires_in_s=60)
+        with patch("jwt.decode", wraps=jwt.decode) as decode:
+            self._info(token)
+            with patch("time.time", return_value=time.time() + 61):
+                self._info(token)
+            self.assertEqual(decode.call_count, 2)
+        self.assertEqual(verified_token_cache_stats()["hits"], 0)
+
+    def test_invalid_token_is_not_cached(self):
+        token = _token(expires_in_s=60)[:-4] + "AAAA"
+        self.assertIsNone(self._info(token))
+        self.assertIsNone(self._info(token))
+        self.assertEqual(verified_token_cache_stats(), {"hits": 0, "misses": 2, "size": 0})
+
+    def test_least_recently_used_token_is_dropped_when_cache_is_full(self):
+        tokens = [_token(expires_in_s=60, subject=str(k)) for k in range(3)]
+        self._info(tokens[0])
+        self._info(tokens[1])
+        self._info(tokens[0])
+        self._info(tokens[2])
+        self.assertEqual(verified_token_cache_stats()["size"], 2)
+        with patch("jwt.decode", wraps=jwt.decode) as decode:
+            self._info(tokens[0])
+            self.assertEqual(decode.call_count, 0)
+            self._info(tokens[1])
+            self.assertEqual(decode.call_count, 1)
+
+    def test_changing_public_key_clears_the_cache(self):
+        token = _token(expires_in_s=60)
+        self._info(token)
+        set_auth_params(public_key="", client_id="client")
+        self.assertIsNone(self._info(token))
+
+    def tearDown(self) -> None:
+        set_max_verified_tokens(1000)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
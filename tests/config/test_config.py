@@ -18,6 +18,32 @@ class Test_Config(unittest.TestCase):
     def test_config(self):
         APIConfig(**self.config_dict)
 
+    def test_flask_server_is_used_by_default(self):
+        config = APIConfig(**self.config_dict)
+        self.assertEqual(config.http_server.server, "flask")
+
+    def test_only_supported_servers_are_accepted(self):
+        self.config_dict["http_server"]["server"] = "gevent"
+        self.assertEqual(APIConfig(**self.config_dict).http_server.server, "gevent")
+        self.config_dict["http_server"]["server"] = "tornado"
+        with self.assertRaises(ValueError):
+            APIConfig(**self.config_dict)
+
+    def test_default_connection_pool_is_used_if_not_specified(self):
+        self.config_dict["database"]["server"] = {
+            "username": "postgres",
+            "password": "1234",
+            "location": "localhost",
+            "port": 5432,
+            "database_name": "protocol_api",
+        }
+        pool = APIConfig(**self.config_dict).database.server.pool
+        self.assertEqual(pool.size, 5)
+        self.assertTrue(pool.pre_ping)
+        self.config_dict["database"]["server"]["pool"] = {"size": 0}
+        with self.assertRaises(ValueError):
+            APIConfig(**self.config_dict)
+
 
 if __name__ == "__main__":  # pragma: no cover
     unittest.main()
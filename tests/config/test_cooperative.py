@@ -0,0 +1,43 @@
+import unittest
+import sys
+import os
+import json
+import tempfile
+
+sys.path.append(".")
+
+from server.cooperative import configured_server
+
+
+class Test_Server_Configured_Before_Patching(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.config_path = os.path.join(self.dir.name, "config.json")
+
+    def _write_config(self, http_server: dict) -> None:
+        with open(self.config_path, "w") as config_file:
+            json.dump({"http_server": http_server}, config_file)
+
+    def test_server_is_read_from_config_file_given_as_first_positional_argument(self):
+        self._write_config({"port": 8080, "server": "gevent"})
+        self.assertEqual(configured_server([self.config_path]), "gevent")
+        args = ["-usr", "user", self.config_path, "-p", "5432"]
+        self.assertEqual(configured_server(args), "gevent")
+        self.assertEqual(configured_server(["--port=5432", self.config_path]), "gevent")
+
+    def test_flask_server_is_used_if_server_is_not_set(self):
+        self._write_config({"port": 8080})
+        self.assertEqual(configured_server([self.config_path]), "flask")
+
+    def test_flask_server_is_used_if_config_file_cannot_be_read(self):
+        self.assertEqual(configured_server([os.path.join(self.dir.name, "missing.json")]), "flask")
+        with open(self.config_path, "w") as config_file:
+            config_file.write("not a json")
+        self.assertEqual(configured_server([self.config_path]), "flask")
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -0,0 +1,101 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.append(".")
+
+from server.enums import EncodingType, MessageType  # type: ignore
+from server.fleetv2_http_api.models.device_id import DeviceId  # type: ignore
+from server.database.cache import clear_connected_cars, connected_cars  # type: ignore
+from server.database.cache_snapshot import (  # type: ignore
+    SNAPSHOT_VERSION,
+    load_connected_cars_snapshot,
+    save_connected_cars_snapshot,
+)
+from server.database.database_controller import (  # type: ignore
+    MessageDB,
+    load_available_devices_from_database,
+    send_messages_to_database,
+    set_test_db_connection,
+)
+from tests._utils.logs import clear_logs  # type: ignore
+
+
+def _status(timestamp: int, module_id: int, role: str) -> MessageDB:
+    return MessageDB(
+        timestamp=timestamp,
+        serialized_device_id=f"{module_id}_2_{role}",
+        module_id=module_id,
+        device_type=2,
+        device_role=role,
+        device_name=f"Device {role}",
+        message_type=MessageType.STATUS,
+        payload_encoding=EncodingType.JSON,
+        payload_data={},
+    )
+
+
+def _device_roles(company_name: str, car_name: str) -> list[str]:
+    car = connected_cars()[company_name][car_name]
+    return sorted(d.role for m in car.modules.values() for d in m.device_ids.values())
+
+
+class Test_Connected_Cars_Snapshot(unittest.TestCase):
+    def setUp(self) -> None:
+        clear_logs()
+        clear_connected_cars()
+        set_test_db_connection("/:memory:")
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "connected_cars.json")
+        statuses = (_status(10, 1, "left"), _status(20, 2, "lidar"))
+        send_messages_to_database("company", "car_a", *statuses)
+        send_messages_to_database("company", "car_b", _status(30, 1, "left"))
+        load_available_devices_from_database()
+
+    def test_saved_snapshot_restores_connected_cars_and_returns_newest_status_timestamp(self):
+        save_connected_cars_snapshot(self.path)
+        expected = connected_cars()
+        clear_connected_cars()
+        self.assertEqual(load_connected_cars_snapshot(self.path, min_timestamp=0), 30)
+        self.assertEqual(connected_cars(), expected)
+        device_id = connected_cars()["company"]["car_a"].modules[2].device_ids["2_2_lidar"]
+        expected_id = DeviceId(module_id=2, type=2, role="lidar", name="Device lidar")
+        self.assertEqual(device_id, expected_id)
+
+    def test_statuses_newer_than_snapshot_are_replayed(self):
+        save_connected_cars_snapshot(self.path)
+        send_messages_to_database("company", "car_a", _status(40, 1, "right"))
+        send_messages_to_database("company", "car_c", _status(50, 1, "left"))
+        clear_connected_cars()
+        stamp = load_connected_cars_snapshot(self.path, min_timestamp=0)
+        load_available_devices_from_database(since=stamp)
+        self.assertEqual(sorted(connected_cars()["company"]), ["car_a", "car_b", "car_c"])
+        self.assertEqual(_device_roles("company", "car_a"), ["left", "lidar", "right"])
+        self.assertEqual(connected_cars()["company"]["car_a"].timestamp, 10)
+        self.assertEqual(connected_cars()["company"]["car_c"].timestamp, 50)
+
+    def test_missing_outdated_and_invalid_snapshots_are_ignored(self):
+        self.assertIsNone(load_connected_cars_snapshot(self.path, min_timestamp=0))
+        save_connected_cars_snapshot(self.path)
+        clear_connected_cars()
+        self.assertIsNone(load_connected_cars_snapshot(self.path, min_timestamp=31))
+        with open(self.path, "w") as f:
+            json.dump({"version": SNAPSHOT_VERSION + 1, "max_timestamp": 30, "cars": []}, f)
+        self.assertIsNone(load_connected_cars_snapshot(self.path, min_timestamp=0))
+        with open(self.path, "w") as f:
+            json.dump({"version": SNAPSHOT_VERSION, "max_timestamp": 30, "cars": [["c"]]}, f)
+        self.assertIsNone(load_connected_cars_snapshot(self.path, min_timestamp=0))
+        with open(self.path, "w") as f:
+            f.write("not a snapshot")
+        self.assertIsNone(load_connected_cars_snapshot(self.path, min_timestamp=0))
+        self.assertEqual(connected_cars(), {})
+
+    def tearDown(self) -> None:
+        clear_connected_cars()
+        self.directory.cleanup()
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -1,34 +1,54 @@
 import os
 import sys
-from unittest.mock import patch, Mock
+from unittest.mock import patch, Mock, MagicMock
 import unittest
 
 sys.path.append(".")
 
+import psycopg
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+
 from server.enums import EncodingType, MessageType
 from server.fleetv2_http_api.models.device_id import DeviceId
-from server.database.cache import serialized_device_id
+from server.database.cache import (
+    serialized_device_id,
+    add_car,
+    add_device,
+    clear_connected_cars,
+    connected_cars,
+)
 from server.database.connection import (
     set_test_db_connection,
     unset_connection_source,
     ConnectionSourceNotSet,
     get_connection_source,
     set_test_db_connection,
+    check_database_health,
+    set_connection_pool,
 )
+import server.database.connection as connection
+import server.database.database_controller as database_controller
 from server.database.database_controller import (
     set_message_retention_period,
     send_messages_to_database,
     list_messages,
     cleanup_device_commands_and_warn_before_future_commands,
     remove_old_messages,
+    clean_up_disconnected_cars,
+    set_message_deletion_batching,
+    stream_message_rows,
+    load_available_devices_from_database,
     MessageDB,
     MessageBase,
+    _copy_rows,
+    _message_rows,
 )
 from tests._utils.logs import clear_logs
 
 
 class Test_Creating_And_Reading_MessageBase_Objects(unittest.TestCase):
-    def test_creating_message_base_object_from_message(self):
+    def test_creating_message_row_from_message(self):
         clear_logs()
         company_name = "test_company"
         car_name = "test_car"
@@ -45,17 +65,17 @@ class Test_Creating_And_Reading_MessageBase_Objects(unittest.TestCase):
             payload_encoding=EncodingType.JSON,
             payload_data={"content": "..."},
         )
-        message_base = MessageBase.from_message(company_name, car_name, message_db)
-        self.assertEqual(message_base.company_name, company_name)
-        self.assertEqual(message_base.car_name, car_name)
-        self.assertEqual(message_base.timestamp, 100)
-        self.assertEqual(message_base.module_id, device_id.module_id)
-        self.assertEqual(message_base.device_type, device_id.type)
-        self.assertEqual(message_base.device_role, device_id.role)
-        self.assertEqual(message_base.device_name, device_id.name)
-        self.assertEqual(message_base.message_type, MessageType.STATUS)
-        self.assertEqual(message_base.payload_encoding, EncodingType.JSON)
-        self.assertEqual(message_base.payload_data, {"content": "..."})
+        row = _message_rows(company_name, car_name, [message_db])[0]
+        self.assertEqual(row["company_name"], company_name)
+        self.assertEqual(row["car_name"], car_name)
+        self.assertEqual(row["timestamp"], 100)
+        self.assertEqual(row["module_id"], device_id.module_id)
+        self.assertEqual(row["device_type"], device_id.type)
+        self.assertEqual(row["device_role"], device_id.role)
+        self.assertEqual(row["device_name"], device_id.name)
+        self.assertEqual(row["message_type"], MessageType.STATUS)
+        self.assertEqual(row["payload_encoding"], EncodingType.JSON)
+        self.assertEqual(row["payload_data"], {"content": "..."})
 
     def test_creating_message_from_base_object(self):
         clear_logs()
@@ -92,6 +112,53 @@ class Test_Specifying_Database_Name(unittest.TestCase):
             os.remove("test_db.db")
 
 
+class Test_Database_Health_Check(unittest.TestCase):
+    def setUp(self):
+        clear_logs()
+        set_test_db_connection("/:memory:")
+
+    @patch("server.database.connection._test_connection_engine")
+    def test_connection_is_not_tested_on_access_if_database_is_accessible(self, mock_test: Mock):
+        check_database_health()
+        get_connection_source()
+        mock_test.assert_not_called()
+
+    @patch("server.database.connection._test_connection_engine")
+    def test_connection_is_tested_on_access_after_failed_health_check(self, mock_test: Mock):
+        with patch.object(
+            connection.Engine, "connect", side_effect=OperationalError("", None, Exception())
+        ):
+            check_database_health()
+        source = get_connection_source()
+        mock_test.assert_called_once_with(source)
+        check_database_health()
+        get_connection_source()
+        mock_test.assert_called_once()
+
+    def test_connection_pool_options(self):
+        set_connection_pool(
+            size=3, max_overflow=0, recycle_in_seconds=0, pre_ping=True, statement_timeout_in_ms=0
+        )
+        self.assertEqual(
+            connection._pool_options,
+            {"pool_size": 3, "max_overflow": 0, "pool_recycle": -1, "pool_pre_ping": True},
+        )
+        set_connection_pool(
+            size=3,
+            max_overflow=0,
+            recycle_in_seconds=60,
+            pre_ping=False,
+            statement_timeout_in_ms=500,
+        )
+        self.assertEqual(connection._pool_options["pool_recycle"], 60)
+        self.assertEqual(
+            connection._pool_options["connect_args"], {"options": "-c statement_timeout=500"}
+        )
+
+    def tearDown(self):
+        connection._pool_options = dict()
+
+
 class Test_Sending_And_Clearing_Messages(unittest.TestCase):
     def setUp(self):
         # Set up the database connection before running the tests
@@ -258,6 +325,163 @@ class Test_Sending_And_Clearing_Messages(unittest.TestCase):
         self.assertEqual(len(messages), 1)
 
 
+class Test_Sending_Large_Batch_Of_Messages(unittest.TestCase):
+    def setUp(self):
+        set_test_db_connection("/:memory:")
+        clear_logs()
+
+    def _message(self, k: int) -> MessageDB:
+        return MessageDB(
+            timestamp=100,
+            serialized_device_id=f"{k}_2_role",
+            module_id=k,
+            device_type=2,
+            device_role="role",
+            device_name=f"device_{k}",
+            message_type=MessageType.STATUS,
+            payload_encoding=EncodingType.JSON,
+            payload_data={"number": k},
+        )
+
+    def test_all_messages_are_stored_in_the_order_of_sending(self):
+        messages = [self._message(k) for k in range(200)]
+        msg, code = send_messages_to_database("company", "car", *messages)
+        self.assertEqual((msg, code), ("200 messages have been sent.", 200))
+        stored = list_messages("company", "car", (MessageType.STATUS,), since=0)
+        self.assertEqual(len(stored), 200)
+        self.assertEqual(sorted(m.payload_data["number"] for m in stored), list(range(200)))
+        with get_connection_source().connect() as conn:
+            orders = conn.execute(select(MessageBase.sent_order, MessageBase.module_id)).all()
+        self.assertTrue(all(order == module_id for order, module_id in orders))
+
+    def test_repeated_batch_is_rejected_as_a_whole(self):
+        messages = [self._message(k) for k in range(200)]
+        send_messages_to_database("company", "car", *messages)
+        _, code = send_messages_to_database("company", "car", *messages, self._message(200))
+        self.assertEqual(code, 400)
+        self.assertEqual(len(list_messages("company", "car", (MessageType.STATUS,), 0)), 200)
+
+    def test_lost_connection_during_copy_is_handled_as_by_sqlalchemy(self):
+        conn = MagicMock()
+        cursor = conn.connection.driver_connection.cursor.return_value.__enter__.return_value
+        cursor.copy.side_effect = psycopg.OperationalError("server closed the connection")
+        conn.dialect.is_disconnect.return_value = True
+        rows = _message_rows("company", "car", [self._message(k) for k in range(2)])
+        with self.assertRaises(OperationalError) as context:
+            _copy_rows(conn, rows)
+        self.assertTrue(context.exception.connection_invalidated)
+        conn.invalidate.assert_called_once()
+        self.assertFalse(connection._database_accessible)
+
+    def tearDown(self):
+        connection._database_accessible = True
+
+
+class Test_Streaming_Message_Rows(unittest.TestCase):
+    def setUp(self):
+        set_test_db_connection("/:memory:")
+        clear_logs()
+        messages = [
+            MessageDB(
+                timestamp=100 + 10 * (k % 3),
+                serialized_device_id=f"{k}_2_role",
+                module_id=k,
+                device_type=2,
+                device_role="role",
+                device_name=f"device_{k}",
+                message_type=MessageType.STATUS,
+                payload_encoding=EncodingType.JSON,
+                payload_data={"number": k},
+            )
+            for k in range(5)
+        ]
+        send_messages_to_database("company", "car", *messages)
+
+    def test_rows_are_yielded_in_batches_in_the_order_of_listed_messages(self):
+        batches = list(stream_message_rows("company", "car", (MessageType.STATUS,), 0, 2))
+        self.assertEqual([len(batch) for batch in batches], [2, 2, 1])
+        rows = [row for batch in batches for row in batch]
+        listed = list_messages("company", "car", (MessageType.STATUS,), 0)
+        self.assertEqual(
+            [tuple(row) for row in rows],
+            [
+                (
+                    m.timestamp,
+                    m.module_id,
+                    m.device_type,
+                    m.device_role,
+                    m.device_name,
+                    m.message_type,
+                    m.payload_encoding,
+                    m.payload_data,
+                )
+                for m in listed
+            ],
+        )
+
+    def test_only_rows_of_the_given_car_type_and_time_are_yielded(self):
+        commands = stream_message_rows("company", "car", (MessageType.COMMAND,), 0, 2)
+        self.assertEqual(list(commands), [])
+        other_car = stream_message_rows("company", "other_car", (MessageType.STATUS,), 0, 2)
+        self.assertEqual(list(other_car), [])
+        batches = list(stream_message_rows("company", "car", (MessageType.STATUS,), 120, 2))
+        self.assertEqual([row.timestamp for batch in batches for row in batch], [120])
+
+
+class Test_Loading_Available_Devices_From_Database(unittest.TestCase):
+    def setUp(self):
+        set_test_db_connection("/:memory:")
+        clear_logs()
+        clear_connected_cars()
+
+    def _message(self, timestamp: int, module_id: int, role: str, message_type: str) -> MessageDB:
+        return MessageDB(
+            timestamp=timestamp,
+            serialized_device_id=f"{module_id}_2_{role}",
+            module_id=module_id,
+            device_type=2,
+            device_role=role,
+            device_name=f"Device {role}",
+            message_type=message_type,
+            payload_encoding=EncodingType.JSON,
+            payload_data={},
+        )
+
+    def test_cars_and_devices_with_stored_statuses_are_loaded(self):
+        send_messages_to_database(
+            "company",
+            "car_a",
+            self._message(30, 1, "left", MessageType.STATUS),
+            self._message(30, 1, "right", MessageType.STATUS),
+        )
+        send_messages_to_database(
+            "company",
+            "car_a",
+            self._message(10, 1, "left", MessageType.STATUS),
+            self._message(20, 2, "lidar", MessageType.STATUS),
+        )
+        send_messages_to_database("company", "car_b", self._message(50, 1, "left", "STATUS"))
+        send_messages_to_database("company", "car_c", self._message(60, 1, "left", "COMMAND"))
+
+        load_available_devices_from_database()
+        cars = connected_cars()["company"]
+        self.assertEqual(sorted(cars.keys()), ["car_a", "car_b"])
+        self.assertEqual(cars["car_a"].timestamp, 10)
+        self.assertEqual(cars["car_b"].timestamp, 50)
+        self.assertEqual(sorted(cars["car_a"].modules[1].device_ids), ["1_2_left", "1_2_right"])
+        self.assertEqual(list(cars["car_a"].modules[2].device_ids), ["2_2_lidar"])
+        device_id = cars["car_a"].modules[2].device_ids["2_2_lidar"]
+        expected = DeviceId(module_id=2, type=2, role="lidar", name="Device lidar")
+        self.assertEqual(device_id, expected)
+
+    def test_loading_from_empty_database_connects_no_cars(self):
+        load_available_devices_from_database()
+        self.assertEqual(connected_cars(), {})
+
+    def tearDown(self):
+        clear_connected_cars()
+
+
 class Test_Database_Cleanup(unittest.TestCase):
     def setUp(self):
         clear_logs()
@@ -281,6 +505,122 @@ class Test_Database_Cleanup(unittest.TestCase):
         self.assertEqual(MessageBase.data_retention_period_ms(), 1000)
 
 
+class Test_Removing_Old_Messages_In_Batches(unittest.TestCase):
+    def setUp(self):
+        clear_logs()
+        set_test_db_connection(dblocation="/:memory:")
+        device_id = DeviceId(module_id=45, type=2, role="role1", name="device1")
+        self.messages = [
+            MessageDB(
+                timestamp=k,
+                serialized_device_id=serialized_device_id(device_id),
+                module_id=device_id.module_id,
+                device_type=device_id.type,
+                device_role=device_id.role,
+                device_name=device_id.name,
+                message_type=MessageType.STATUS,
+                payload_encoding=EncodingType.JSON,
+                payload_data={},
+            )
+            for k in range(25)
+        ]
+        send_messages_to_database("company1", "car1", *self.messages)
+
+    def tearDown(self):
+        set_message_deletion_batching(batch_size=5000, max_batches=20)
+
+    def test_messages_exceeding_max_number_of_batches_are_removed_in_next_cleanup(self):
+        set_message_deletion_batching(batch_size=10, max_batches=2)
+        current_timestamp = MessageBase.data_retention_period_ms() + 100
+        remove_old_messages(current_timestamp)
+        messages = list_messages("company1", "car1", (MessageType.STATUS,))
+        self.assertEqual([m.timestamp for m in messages], list(range(20, 25)))
+        remove_old_messages(current_timestamp)
+        self.assertEqual(list_messages("company1", "car1", (MessageType.STATUS,)), [])
+
+    def test_only_messages_older_than_retention_period_are_removed(self):
+        set_message_deletion_batching(batch_size=3, max_batches=100)
+        remove_old_messages(MessageBase.data_retention_period_ms() + 12)
+        messages = list_messages("company1", "car1", (MessageType.STATUS,))
+        self.assertEqual([m.timestamp for m in messages], list(range(12, 25)))
+
+    def test_setting_nonpositive_batching_raises_error(self):
+        with self.assertRaises(ValueError):
+            set_message_deletion_batching(batch_size=0, max_batches=1)
+        with self.assertRaises(ValueError):
+            set_message_deletion_batching(batch_size=1, max_batches=0)
+
+
+class Test_Cleaning_Up_Disconnected_Cars(unittest.TestCase):
+    def setUp(self):
+        clear_logs()
+        set_test_db_connection(dblocation="/:memory:")
+        clear_connected_cars()
+        self.device_a = DeviceId(module_id=45, type=2, role="role_a", name="device A")
+        self.device_b = DeviceId(module_id=45, type=3, role="role_b", name="device B")
+        self.device_c = DeviceId(module_id=46, type=2, role="role_a", name="device C")
+
+    def tearDown(self):
+        clear_connected_cars()
+
+    def _status(self, device_id: DeviceId, message_type: str = MessageType.STATUS) -> MessageDB:
+        return MessageDB(
+            timestamp=0,
+            serialized_device_id=serialized_device_id(device_id),
+            module_id=device_id.module_id,
+            device_type=device_id.type,
+            device_role=device_id.role,
+            device_name=device_id.name,
+            message_type=message_type,
+            payload_encoding=EncodingType.JSON,
+            payload_data={},
+        )
+
+    def test_only_devices_without_statuses_are_removed(self):
+        send_messages_to_database("company1", "car1", self._status(self.device_a))
+        send_messages_to_database(
+            "company1", "car1", self._status(self.device_b, MessageType.COMMAND)
+        )
+        add_car("company1", "car1", 0)
+        add_car("company1", "car2", 0)
+        for device_id in (self.device_a, self.device_b, self.device_c):
+            add_device("company1", "car1", device_id)
+        add_device("company1", "car2", self.device_a)
+
+        clean_up_disconnected_cars()
+        cars = connected_cars()
+        self.assertListEqual(list(cars["company1"].keys()), ["car1"])
+        car = cars["company1"]["car1"]
+        self.assertListEqual(list(car.modules.keys()), [45])
+        self.assertListEqual(list(car.modules[45].device_ids.values()), [self.device_a])
+
+    def test_device_connected_during_querying_statuses_is_kept(self):
+        add_car("company1", "car1", 0)
+        add_device("company1", "car1", self.device_a)
+        query = database_controller._devices_with_statuses
+
+        def connect_device_c():
+            devices = query()
+            send_messages_to_database("company1", "car1", self._status(self.device_c))
+            add_device("company1", "car1", self.device_c)
+            return devices
+
+        with patch(
+            "server.database.database_controller._devices_with_statuses",
+            side_effect=connect_device_c,
+        ):
+            clean_up_disconnected_cars()
+        car = connected_cars()["company1"]["car1"]
+        self.assertListEqual(list(car.modules[46].device_ids.values()), [self.device_c])
+        self.assertNotIn(45, car.modules)
+
+    def test_all_cars_are_removed_if_no_statuses_are_stored(self):
+        add_car("company1", "car1", 0)
+        add_device("company1", "car1", self.device_a)
+        clean_up_disconnected_cars()
+        self.assertDictEqual(connected_cars(), {})
+
+
 class Test_Send_And_Read_Message(unittest.TestCase):
     def setUp(self):
         # Set up the database connection before running the tests
@@ -1,4 +1,5 @@
 import sys
+import threading
 
 sys.path.append(".")
 import unittest
@@ -7,9 +8,11 @@ from server.fleetv2_http_api.models.device_id import DeviceId
 from server.database.cache import (
     add_car,
     add_device,
+    add_connected_cars,
     connected_cars,
     clean_up_disconnected_cars_and_modules,
     clear_connected_cars,
+    is_device_connected,
     remove_connected_device,
     serialized_device_id,
     ConnectedCar,
@@ -95,5 +98,86 @@ class TestDeviceIds(unittest.TestCase):
         self.assertDictEqual(connected_cars(), {})
 
 
+class Test_Connected_Cars_Snapshots(unittest.TestCase):
+    def setUp(self):
+        clear_logs()
+        clear_connected_cars()
+        self.device_1_id = DeviceId(module_id=45, type=2, role="role1", name="device1")
+        self.device_2_id = DeviceId(module_id=45, type=3, role="role2", name="device2")
+
+    def tearDown(self):
+        clear_connected_cars()
+
+    def test_snapshot_is_not_affected_by_later_changes(self):
+        add_car("company1", "car1", timestamp=0)
+        add_device("company1", "car1", self.device_1_id)
+        snapshot = connected_cars()
+        add_device("company1", "car1", self.device_2_id)
+        add_car("company1", "car2", timestamp=0)
+        remove_connected_device("company1", "car1", self.device_1_id)
+        clean_up_disconnected_cars_and_modules()
+
+        self.assertListEqual(list(snapshot["company1"].keys()), ["car1"])
+        module = snapshot["company1"]["car1"].modules[45]
+        self.assertListEqual(list(module.device_ids.values()), [self.device_1_id])
+        module = connected_cars()["company1"]["car1"].modules[45]
+        self.assertListEqual(list(module.device_ids.values()), [self.device_2_id])
+
+    def test_checking_device_connection(self):
+        self.assertFalse(is_device_connected("company1", "car1", self.device_1_id))
+        add_car("company1", "car1", timestamp=0)
+        self.assertFalse(is_device_connected("company1", "car1", self.device_1_id))
+        add_device("company1", "car1", self.device_1_id)
+        self.assertTrue(is_device_connected("company1", "car1", self.device_1_id))
+        self.assertFalse(is_device_connected("company1", "car1", self.device_2_id))
+        self.assertFalse(is_device_connected("company1", "car2", self.device_1_id))
+
+    def test_adding_device_to_disconnected_car_has_no_effect(self):
+        self.assertFalse(add_device("company1", "car1", self.device_1_id))
+        self.assertDictEqual(connected_cars(), {})
+
+    def test_adding_multiple_cars_at_once(self):
+        add_car("company1", "car1", timestamp=5)
+        add_device("company1", "car1", self.device_1_id)
+        snapshot = connected_cars()
+        module = ConnectedModule(45, {serialized_device_id(self.device_2_id): self.device_2_id})
+        add_connected_cars(
+            [
+                ConnectedCar("company1", "car1", 10, {45: module}),
+                ConnectedCar("company2", "car1", 10, {45: module}),
+            ]
+        )
+        self.assertListEqual(list(snapshot.keys()), ["company1"])
+        car = connected_cars()["company1"]["car1"]
+        # the already connected car keeps its timestamp and devices
+        self.assertEqual(car.timestamp, 5)
+        self.assertListEqual(
+            list(car.modules[45].device_ids.values()), [self.device_1_id, self.device_2_id]
+        )
+        self.assertEqual(connected_cars()["company2"]["car1"].timestamp, 10)
+        self.assertTrue(is_device_connected("company2", "car1", self.device_2_id))
+
+    def test_adding_devices_from_multiple_threads(self):
+        n_cars, n_devices = 20, 30
+
+        def connect_car(k: int) -> None:
+            add_car("company1", f"car{k}", timestamp=0)
+            for d in range(n_devices):
+                add_device(
+                    "company1", f"car{k}", DeviceId(module_id=d % 3, type=d, role="role", name="")
+                )
+
+        threads = [threading.Thread(target=connect_car, args=(k,)) for k in range(n_cars)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        cars = connected_cars()["company1"]
+        self.assertEqual(len(cars), n_cars)
+        for car in cars.values():
+            self.assertEqual(sum(len(m.device_ids) for m in car.modules.values()), n_devices)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,131 @@
+import sys
+import threading
+import unittest
+
+sys.path.append(".")
+
+from server.database.message_buffer import (  # type: ignore
+    set_buffer_size,
+    store_messages,
+    buffered_messages,
+    remove_buffered_messages,
+    remove_buffered_messages_older_than,
+    clear_message_buffer,
+)
+from server.database.database_controller import MessageDB  # type: ignore
+from tests._utils.logs import clear_logs  # type: ignore
+
+
+_STATUS_TYPES = ("STATUS", "STATUS_ERROR")
+
+
+def _status(timestamp: int) -> MessageDB:
+    return MessageDB(
+        timestamp=timestamp,
+        serialized_device_id="1_1_role",
+        module_id=1,
+        device_type=1,
+        device_role="role",
+        device_name="device",
+        message_type="STATUS",
+        payload_encoding="JSON",
+        payload_data={},
+    )
+
+
+def _timestamps(messages: list[MessageDB] | None) -> list[int] | None:
+    return None if messages is None else [m.timestamp for m in messages]
+
+
+class Test_Message_Buffer(unittest.TestCase):
+    def setUp(self) -> None:
+        clear_logs()
+        set_buffer_size(3)
+
+    def test_nothing_is_buffered_if_buffer_size_is_zero(self):
+        set_buffer_size(0)
+        store_messages("company", "car", _STATUS_TYPES, [_status(10)])
+        self.assertIsNone(buffered_messages("company", "car", _STATUS_TYPES, 10))
+
+    def test_negative_buffer_size_raises_error(self):
+        with self.assertRaises(ValueError):
+            set_buffer_size(-1)
+
+    def test_messages_older_than_the_first_buffered_message_are_not_covered(self):
+        store_messages("company", "car", _STATUS_TYPES, [_status(10), _status(10)])
+        store_messages("company", "car", _STATUS_TYPES, [_status(20)])
+        self.assertEqual(
+            _timestamps(buffered_messages("company", "car", _STATUS_TYPES, 10)), [10, 10, 20]
+        )
+        self.assertEqual(_timestamps(buffered_messages("company", "car", _STATUS_TYPES, 11)), [20])
+        self.assertEqual(_timestamps(buffered_messages("company", "car", _STATUS_TYPES, 21)), [])
+        self.assertIsNone(buffered_messages("company", "car", _STATUS_TYPES, 9))
+
+    def test_buffers_are_separate_for_cars_and_message_types(self):
+        store_messages("company", "car", _STATUS_TYPES, [_status(10)])
+        self.assertIsNone(buffered_messages("company", "other_car", _STATUS_TYPES, 10))
+        self.assertIsNone(buffered_messages("company", "car", ("COMMAND",), 10))
+
+    def test_oldest_messages_are_evicted_when_buffer_is_full(self):
+        for timestamp in (10, 20, 20, 30, 40):
+            store_messages("company", "car", _STATUS_TYPES, [_status(timestamp)])
+        # one of the messages with timestamp 20 was evicted, so the other cannot be returned alone
+        self.assertIsNone(buffered_messages("company", "car", _STATUS_TYPES, 20))
+        self.assertEqual(
+            _timestamps(buffered_messages("company", "car", _STATUS_TYPES, 21)), [30, 40]
+        )
+
+    def test_messages_stored_out_of_order_are_sorted_by_timestamp(self):
+        store_messages("company", "car", _STATUS_TYPES, [_status(10)])
+        store_messages("company", "car", _STATUS_TYPES, [_status(30)])
+        store_messages("company", "car", _STATUS_TYPES, [_status(20)])
+        self.assertEqual(
+            _timestamps(buffered_messages("company", "car", _STATUS_TYPES, 10)), [10, 20, 30]
+        )
+
+    def test_removing_messages_older_than_timestamp(self):
+        store_messages("company", "car", _STATUS_TYPES, [_status(10), _status(20)])
+        store_messages("company", "other_car", _STATUS_TYPES, [_status(10)])
+        remove_buffered_messages_older_than(15)
+        self.assertIsNone(buffered_messages("company", "car", _STATUS_TYPES, 10))
+        self.assertEqual(_timestamps(buffered_messages("company", "car", _STATUS_TYPES, 15)), [20])
+        self.assertIsNone(buffered_messages("company", "other_car", _STATUS_TYPES, 15))
+
+    def test_removed_and_cleared_buffers_cover_no_messages(self):
+        store_messages("company", "car", _STATUS_TYPES, [_status(10)])
+        store_messages("company", "other_car", _STATUS_TYPES, [_status(10)])
+        remove_buffered_messages("company", "car", _STATUS_TYPES)
+        self.assertIsNone(buffered_messages("company", "car", _STATUS_TYPES, 10))
+        self.assertIsNotNone(buffered_messages("company", "other_car", _STATUS_TYPES, 10))
+        clear_message_buffer()
+        self.assertIsNone(buffered_messages("company", "other_car", _STATUS_TYPES, 10))
+
+    def test_storing_messages_concurrently(self):
+        set_buffer_size(1000)
+
+        def store(k: int) -> None:
+            for i in range(100):
+                store_messages("company", "car", _STATUS_TYPES, [_status(1000 + 10 * i + k)])
+
+        threads = [threading.Thread(target=store, args=(k,)) for k in range(10)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        timestamps = _timestamps(buffered_messages("company", "car", _STATUS_TYPES, 1000))
+        self.assertEqual(timestamps, list(range(1000, 2000)))
+
+    def test_strings_repeated_in_buffered_messages_are_shared(self):
+        first, second = _status(10), _status(20)
+        first.device_name = "".join(["dev", "ice"])
+        store_messages("company", "car", _STATUS_TYPES, [first, second])
+        buffered = buffered_messages("company", "car", _STATUS_TYPES, 10)
+        assert buffered is not None
+        self.assertIs(buffered[0].device_name, buffered[1].device_name)
+
+    def tearDown(self) -> None:
+        set_buffer_size(0)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
@@ -0,0 +1,77 @@
+import sys
+import unittest
+
+sys.path.append(".")
+
+from sqlalchemy import inspect
+
+from server.database.connection import set_test_db_connection, get_connection_source, Base
+from server.database.database_controller import MessageBase, create_message_partitions
+from server.database.partitioning import (
+    set_partitioning,
+    unset_partitioning,
+    partition_bounds,
+    partition_name,
+    partition_period_ms,
+    partitioned_tables,
+    is_partitioning_used,
+)
+from tests._utils.logs import clear_logs
+
+
+class Test_Message_Table_Index(unittest.TestCase):
+    def setUp(self) -> None:
+        clear_logs()
+        set_test_db_connection(dblocation="/:memory:")
+
+    def test_message_table_has_index_for_car_message_queries(self):
+        indexes = inspect(get_connection_source()).get_indexes(MessageBase.__tablename__)
+        columns = [index["column_names"] for index in indexes]
+        self.assertIn(["company_name", "car_name", "message_type", "timestamp"], columns)
+
+
+class Test_Partition_Bounds(unittest.TestCase):
+    def test_timestamp_is_contained_in_partition_bounds(self):
+        self.assertEqual(partition_bounds(0, 1000), (0, 1000))
+        self.assertEqual(partition_bounds(999, 1000), (0, 1000))
+        self.assertEqual(partition_bounds(1000, 1000), (1000, 2000))
+        self.assertEqual(partition_bounds(123456, 1000), (123000, 124000))
+
+    def test_partition_name_contains_table_name_and_lower_bound(self):
+        self.assertEqual(partition_name("message", 123000), "message_p123000")
+
+
+class Test_Partitioning_Setting(unittest.TestCase):
+    def setUp(self) -> None:
+        clear_logs()
+        set_test_db_connection(dblocation="/:memory:")
+
+    def tearDown(self) -> None:
+        unset_partitioning()
+
+    def test_message_table_is_marked_for_partitioning(self):
+        self.assertIn(MessageBase.__table__, partitioned_tables(Base.metadata))
+
+    def test_setting_partitioning_period(self):
+        set_partitioning(60)
+        self.assertEqual(partition_period_ms(), 60000)
+        unset_partitioning()
+        self.assertEqual(partition_period_ms(), 0)
+
+    def test_negative_partitioning_period_raises_error(self):
+        with self.assertRaises(ValueError):
+            set_partitioning(-1)
+        with self.assertRaises(ValueError):
+            set_partitioning(60, premade_partitions=-1)
+
+    def test_partitioning_is_not_used_for_sqlite_database(self):
+        set_partitioning(60)
+        self.assertFalse(is_partitioning_used(get_connection_source()))
+        # creating the partitions has no effect
+        create_message_partitions(current_timestamp=0)
+        tables = inspect(get_connection_source()).get_table_names()
+        self.assertNotIn(partition_name(MessageBase.__tablename__, 0), tables)
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()
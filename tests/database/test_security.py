@@ -4,13 +4,13 @@ sys.path.append(".")
 
 import unittest
 from unittest.mock import patch, Mock
+from sqlalchemy.orm import Session
 from server.database.connection import set_test_db_connection
-from server.database.cache import clear_loaded_admins
+from server.database.cache import clear_loaded_admins, get_loaded_admins, set_admin_cache
 from server.database.security import (
     get_admin,
     add_admin_key,
     AdminDB,
-    get_loaded_admins,
     number_of_admin_keys,
 )
 from tests._utils.logs import clear_logs
@@ -56,5 +56,64 @@ class Test_Getting_Admin(unittest.TestCase):
         self.assertEqual(number_of_admin_keys(), 2)
 
 
+class Test_Caching_Api_Keys(unittest.TestCase):
+    def setUp(self) -> None:
+        clear_logs()
+        set_test_db_connection(dblocation="/:memory:")
+        set_admin_cache(admin_ttl_s=300, invalid_key_ttl_s=30, max_invalid_keys=2)
+        self.now = 1000.0
+        self.now_patch = patch("server.database.cache._now_s", side_effect=lambda: self.now)
+        self.now_patch.start()
+
+    @patch("server.database.security._generate_key")
+    def test_valid_key_is_loaded_again_after_its_time_to_live(self, mock_generate_key: Mock):
+        mock_generate_key.return_value = "abcdef"
+        add_admin_key("Alice")
+        with patch("server.database.security.Session", wraps=Session) as session:
+            get_admin("abcdef")
+            self.now += 299
+            get_admin("abcdef")
+            self.assertEqual(session.call_count, 1)
+            self.now += 1
+            self.assertEqual(get_admin("abcdef"), AdminDB(id=1, name="Alice", key="abcdef"))
+            self.assertEqual(session.call_count, 2)
+
+    def test_invalid_key_is_rejected_without_querying_database_until_it_expires(self):
+        with patch("server.database.security.Session", wraps=Session) as session:
+            for _ in range(5):
+                self.assertIsNone(get_admin("invalid"))
+            self.assertEqual(session.call_count, 1)
+            self.now += 30
+            self.assertIsNone(get_admin("invalid"))
+            self.assertEqual(session.call_count, 2)
+
+    def test_least_recently_used_invalid_key_is_dropped_when_cache_is_full(self):
+        with patch("server.database.security.Session", wraps=Session) as session:
+            get_admin("invalid_1")
+            get_admin("invalid_2")
+            get_admin("invalid_1")
+            get_admin("invalid_3")
+            self.assertEqual(session.call_count, 3)
+            get_admin("invalid_1")
+            self.assertEqual(session.call_count, 3)
+            get_admin("invalid_2")
+            self.assertEqual(session.call_count, 4)
+
+    @patch("server.database.security._generate_key")
+    def test_added_key_is_no_longer_rejected(self, mock_generate_key: Mock):
+        mock_generate_key.return_value = "abcdef"
+        self.assertIsNone(get_admin("abcdef"))
+        add_admin_key("Alice")
+        self.assertEqual(get_admin("abcdef"), AdminDB(id=1, name="Alice", key="abcdef"))
+
+    def test_negative_cache_parameters_are_rejected(self):
+        with self.assertRaises(ValueError):
+            set_admin_cache(admin_ttl_s=-1, invalid_key_ttl_s=30, max_invalid_keys=2)
+
+    def tearDown(self) -> None:
+        self.now_patch.stop()
+        set_admin_cache(admin_ttl_s=300, invalid_key_ttl_s=30, max_invalid_keys=10000)
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,164 @@
+import os
+import sys
+import threading
+import time
+import unittest
+from unittest.mock import Mock
+
+sys.path.append(".")
+
+from server.enums import EncodingType, MessageType  # type: ignore
+from server.database.connection import DatabaseNotAccessible, set_test_db_connection  # type: ignore
+from server.database.database_controller import MessageDB, list_messages  # type: ignore
+from server.database.write_behind import (  # type: ignore
+    WriteBehindQueue,
+    flush_queued_messages,
+    send_or_queue_messages,
+    start_write_behind,
+    stop_write_behind,
+)
+from server.fleetv2_http_api.impl.controllers import list_statuses, send_statuses  # type: ignore
+from server.fleetv2_http_api.models import DeviceId, Payload, Message  # type: ignore
+from server.database.cache import clear_connected_cars  # type: ignore
+from tests._utils.logs import clear_logs  # type: ignore
+
+
+def _message(timestamp: int, k: int = 0) -> MessageDB:
+    return MessageDB(
+        timestamp=timestamp,
+        serialized_device_id=f"{k}_1_role",
+        module_id=k,
+        device_type=1,
+        device_role="role",
+        device_name="device",
+        message_type=MessageType.STATUS,
+        payload_encoding=EncodingType.JSON,
+        payload_data={"k": k},
+    )
+
+
+def _n_stored(car_name: str) -> int:
+    return len(list_messages("company", car_name, (MessageType.STATUS,), since=0))
+
+
+class Test_Write_Behind_Queue(unittest.TestCase):
+    def setUp(self) -> None:
+        clear_logs()
+        if os.path.exists("./example.db"):
+            os.remove("./example.db")
+        set_test_db_connection("/example.db")
+
+    def test_queued_messages_are_stored_after_flush(self):
+        queue = WriteBehindQueue(max_queued_messages=10, max_batch_size=2, flush_period_ms=10000)
+        self.assertTrue(queue.put("company", "car_1", [_message(10, 0), _message(10, 1)]))
+        self.assertTrue(queue.put("company", "car_2", [_message(10)]))
+        self.assertTrue(queue.put("company", "car_2", [_message(20)]))
+        self.assertEqual(queue.n_queued(), 4)
+        self.assertEqual(_n_stored("car_1"), 0)
+        queue.flush()
+        self.assertEqual(queue.n_queued(), 0)
+        self.assertEqual(_n_stored("car_1"), 2)
+        self.assertEqual(_n_stored("car_2"), 2)
+
+    def test_messages_not_fitting_into_queue_are_rejected(self):
+        queue = WriteBehindQueue(max_queued_messages=2, max_batch_size=2, flush_period_ms=10000)
+        self.assertTrue(queue.put("company", "car", [_message(10)]))
+        self.assertFalse(queue.put("company", "car", [_message(20, 0), _message(20, 1)]))
+        self.assertEqual(queue.n_queued(), 1)
+
+    def test_messages_are_kept_in_queue_if_database_is_not_accessible(self):
+        store = Mock(side_effect=DatabaseNotAccessible())
+        queue = WriteBehindQueue(10, 10, 10000, store=store)
+        queue.put("company", "car", [_message(10)])
+        queue.flush()
+        self.assertEqual(queue.n_queued(), 1)
+        store.side_effect = None
+        queue.flush()
+        self.assertEqual(queue.n_queued(), 0)
+        self.assertEqual(store.call_count, 2)
+
+    def test_only_messages_identical_to_stored_ones_are_dropped(self):
+        queue = WriteBehindQueue(max_queued_messages=10, max_batch_size=10, flush_period_ms=10000)
+        queue.put("company", "car", [_message(10)])
+        queue.flush()
+        queue.put("company", "car", [_message(20)])
+        queue.put("company", "car", [_message(10)])
+        queue.put("company", "car", [_message(30)])
+        queue.flush()
+        self.assertEqual(queue.n_queued(), 0)
+        self.assertEqual(_n_stored("car"), 3)
+
+    def test_background_thread_stores_full_batch_without_waiting_for_flush_period(self):
+        queue = WriteBehindQueue(max_queued_messages=10, max_batch_size=2, flush_period_ms=10000)
+        queue.start()
+        queue.put("company", "car", [_message(10)])
+        queue.put("company", "car", [_message(20)])
+        start = time.monotonic()
+        while queue.n_queued() > 0 and time.monotonic() - start < 5:
+            time.sleep(0.01)
+        self.assertEqual(queue.n_queued(), 0)
+        queue.put("company", "car", [_message(30)])
+        queue.stop()
+        self.assertEqual(_n_stored("car"), 3)
+
+    def test_invalid_queue_parameters_raise_error(self):
+        with self.assertRaises(ValueError):
+            WriteBehindQueue(max_queued_messages=0, max_batch_size=1, flush_period_ms=1)
+
+    def tearDown(self) -> None:
+        if os.path.exists("./example.db"):
+            os.remove("./example.db")
+
+
+class Test_Sending_Statuses_With_Write_Behind(unittest.TestCase):
+    def setUp(self) -> None:
+        clear_logs()
+        clear_connected_cars()
+        if os.path.exists("./example.db"):
+            os.remove("./example.db")
+        set_test_db_connection("/example.db")
+        self.device_id = DeviceId(module_id=2, type=5, role="test_device", name="Test Device")
+        self.payload = Payload(
+            message_type=MessageType.STATUS, encoding=EncodingType.JSON, data={"message": "OK"}
+        )
+
+    def test_messages_are_sent_directly_if_write_behind_is_not_used(self):
+        msg, code = send_or_queue_messages("company", "car", _message(10))
+        self.assertEqual((msg, code), ("1 message has been sent.", 200))
+        self.assertEqual(_n_stored("car"), 1)
+
+    def test_messages_are_sent_directly_if_queue_is_full(self):
+        start_write_behind(max_queued_messages=1, max_batch_size=10, flush_period_ms=10000)
+        self.assertEqual(send_or_queue_messages("company", "car", _message(10))[1], 200)
+        msg, _ = send_or_queue_messages("company", "car", _message(20, 0), _message(20, 1))
+        self.assertEqual(msg, "2 messages have been sent.")
+        self.assertEqual(_n_stored("car"), 2)
+        flush_queued_messages()
+        self.assertEqual(_n_stored("car"), 3)
+
+    def test_waiting_request_receives_statuses_before_they_are_stored(self):
+        start_write_behind(max_queued_messages=100, max_batch_size=100, flush_period_ms=10000)
+        responses: list = list()
+        thread = threading.Thread(
+            target=lambda: responses.append(list_statuses("company", "car", wait=True))
+        )
+        thread.start()
+        time.sleep(0.1)
+        status = Message(device_id=self.device_id, payload=self.payload)
+        msg, code = send_statuses("company", "car", [status])
+        thread.join()
+        self.assertEqual(code, 200)
+        self.assertEqual(msg, "1 message has been queued.")
+        self.assertEqual(len(responses[0][0]), 1)
+        self.assertEqual(_n_stored("car"), 0)
+        stop_write_behind()
+        self.assertEqual(_n_stored("car"), 1)
+
+    def tearDown(self) -> None:
+        stop_write_behind()
+        if os.path.exists("./example.db"):
+            os.remove("./example.db")
+
+
+if __name__ == "__main__":  # pragma: no cover
+    unittest.main()